@@ -0,0 +1,184 @@
+# accounts/authentication.py
+"""
+JWT authentication from signed claims, without loading the user row.
+
+Tokens issued by ``/api/token/`` carry what nearly every request needs
+besides the user id:
+
+    org_id, biz_role, username, is_staff, is_superuser, ver
+
+``ClaimsJWTAuthentication`` rebuilds ``request.user`` from them as a
+``User`` instance whose other fields are deferred: ``request.user.biz_role``
+or ``.org_id`` costs nothing, ``.email`` or ``.org`` is loaded on first
+access, and the instance works in ORM filters and foreign keys as usual
+(saving it writes only the loaded fields).
+
+``ver`` is the user's ``token_version``. It is compared with the current
+version, which is cached for ``AUTH_CLAIMS_CACHE_TTL`` seconds (one small
+query on a miss). Changing a user's org, role, username, staff/superuser
+or active flag bumps the version and updates the cache straight away
+(see ``accounts.signals``), so access tokens with the old claims stop
+working; refreshing re-reads the user and issues one with current claims.
+Code that changes those fields with ``.update()`` must call
+``revoke_tokens`` itself.
+
+Tokens without claims (issued before this) are authenticated the old way,
+from the database.
+"""
+from typing import Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+
+# User fields carried as claims; changing any of them revokes issued access tokens
+CLAIM_FIELDS = ("org_id", "biz_role", "username", "is_staff", "is_superuser")
+VERSION_CLAIM = "ver"
+
+
+def _cache():
+    return caches[getattr(settings, "AUTH_CLAIMS_CACHE", "default")]
+
+
+def _version_key(user_id) -> str:
+    return f"auth:ver:{user_id}"
+
+
+def add_claims(token, user: User) -> None:
+    token["org_id"] = str(user.org_id) if user.org_id else None
+    token["biz_role"] = user.biz_role
+    token["username"] = user.username
+    token["is_staff"] = user.is_staff
+    token["is_superuser"] = user.is_superuser
+    token[VERSION_CLAIM] = user.token_version
+
+
+# ----------------------------------------------------------------------------
+# Token versions
+# ----------------------------------------------------------------------------
+def current_version(user_id) -> Optional[Tuple[int, bool]]:
+    """``(token_version, is_active)`` for a user, or None if there is no such user."""
+    key = _version_key(user_id)
+    state = _cache().get(key)
+    if state is None:
+        row = User.objects.filter(pk=user_id).values_list("token_version", "is_active").first()
+        if row is None:
+            return None
+        state = tuple(row)
+        _cache().set(key, state, getattr(settings, "AUTH_CLAIMS_CACHE_TTL", 60))
+    return state
+
+
+def remember_version(user: User) -> None:
+    _cache().set(
+        _version_key(user.pk), (user.token_version, user.is_active), getattr(settings, "AUTH_CLAIMS_CACHE_TTL", 60)
+    )
+
+
+def forget_version(user_id) -> None:
+    _cache().delete(_version_key(user_id))
+
+
+def revoke_tokens(user_ids: Iterable) -> None:
+    """Invalidate the access tokens already issued to these users."""
+    user_ids = list(user_ids)
+    User.objects.filter(pk__in=user_ids).update(token_version=F("token_version") + 1)
+    _cache().delete_many([_version_key(uid) for uid in user_ids])
+
+
+# ----------------------------------------------------------------------------
+# Authentication
+# ----------------------------------------------------------------------------
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if VERSION_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        state = current_version(user_id)
+        if state is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        version, is_active = state
+        if not is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if validated_token[VERSION_CLAIM] != version:
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+        return self.user_from_claims(validated_token, user_id)
+
+    @staticmethod
+    def user_from_claims(token, user_id) -> User:
+        loaded = {
+            "id": user_id,
+            "org_id": token.get("org_id"),
+            "biz_role": token.get("biz_role"),
+            "username": token.get("username"),
+            "is_staff": bool(token.get("is_staff")),
+            "is_superuser": bool(token.get("is_superuser")),
+            "is_active": True,
+            "token_version": token[VERSION_CLAIM],
+        }
+        fields = User._meta.concrete_fields
+        return User.from_db(
+            DEFAULT_DB_ALIAS,
+            [f.attname for f in fields if f.attname in loaded],
+            [User._meta.get_field(f.name).to_python(loaded[f.attname]) for f in fields if f.attname in loaded],
+        )
+
+
+class ClaimsJWTScheme(SimpleJWTScheme):
+    """Documents ``ClaimsJWTAuthentication`` as the usual bearer JWT scheme."""
+
+    target_class = ClaimsJWTAuthentication
+
+
+# ----------------------------------------------------------------------------
+# Token endpoints
+# ----------------------------------------------------------------------------
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        add_claims(token, user)
+        return token
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Issues the new access token with the user's current claims."""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        user = User.objects.filter(
+            **{api_settings.USER_ID_FIELD: refresh.payload.get(api_settings.USER_ID_CLAIM)}
+        ).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+
+        access = refresh.access_token
+        add_claims(access, user)
+        data = {"access": str(access)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:  # blacklist app not installed
+                    pass
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            add_claims(refresh, user)
+            refresh.outstand()
+            data["refresh"] = str(refresh)
+        return data
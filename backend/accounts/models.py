@@ -16,3 +16,5 @@ class User(AbstractUser):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     org = models.ForeignKey(Org, on_delete=models.CASCADE, null=True, blank=True)
     biz_role = models.CharField(max_length=20, default="employee")  # employee | manager | admin
+    # Bumped to revoke issued access tokens when claims change (accounts.authentication)
+    token_version = models.PositiveIntegerField(default=0)
@@ -0,0 +1,48 @@
+# accounts/signals.py
+"""
+Revoke issued access tokens when a user's claims change.
+
+Access tokens carry the fields in ``accounts.authentication.CLAIM_FIELDS``
+plus ``token_version``; saving a user with any of them (or ``is_active``)
+changed bumps the version, so the old tokens are refused and clients
+refresh to get current claims.
+"""
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .authentication import CLAIM_FIELDS, forget_version, remember_version
+from .models import User
+
+WATCHED_FIELDS = CLAIM_FIELDS + ("is_active",)
+
+
+@receiver(pre_save, sender=User)
+def detect_claim_change(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._claims_changed = False
+    if raw or instance._state.adding:
+        return
+    fields = [f for f in WATCHED_FIELDS if update_fields is None or f in update_fields]
+    # Fields that were never loaded (deferred) aren't saved, so they can't have changed
+    deferred = instance.get_deferred_fields()
+    fields = [f for f in fields if f not in deferred]
+    if not fields:
+        return
+    before = User.objects.filter(pk=instance.pk).values(*fields).first()
+    if before is not None and any(before[f] != getattr(instance, f) for f in fields):
+        instance._claims_changed = True
+
+
+@receiver(post_save, sender=User)
+def bump_token_version(sender, instance, created, raw=False, **kwargs):
+    if raw or not getattr(instance, "_claims_changed", False):
+        return
+    instance._claims_changed = False
+    User.objects.filter(pk=instance.pk).update(token_version=F("token_version") + 1)
+    instance.token_version = User.objects.values_list("token_version", flat=True).get(pk=instance.pk)
+    remember_version(instance)
+
+
+@receiver(post_delete, sender=User)
+def forget_deleted_user(sender, instance, **kwargs):
+    forget_version(instance.pk)
@@ -1,4 +1,10 @@
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import ClaimsJWTAuthentication, ClaimsTokenObtainPairSerializer, revoke_tokens
+from .models import Org, User
 
 
 class SmokeTests(TestCase):
@@ -6,4 +12,79 @@ class SmokeTests(TestCase):
         self.assertTrue(True)
 
 
-# Create your tests here.
+class ClaimsJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.org = Org.objects.create(name="Claims Org")
+        self.user = User.objects.create_user(username="claims", password="pw", org=self.org, biz_role="manager")
+        self.client = APIClient()
+
+    def _login(self):
+        resp = self.client.post("/api/token/", {"username": "claims", "password": "pw"}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        return resp.data
+
+    def _whoami(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        return self.client.get("/api/me/whoami/")
+
+    def test_token_carries_claims(self):
+        token = AccessToken(self._login()["access"])
+        self.assertEqual(token["org_id"], str(self.org.id))
+        self.assertEqual(token["biz_role"], "manager")
+        self.assertEqual(token["ver"], 0)
+
+    def test_authenticates_without_loading_user(self):
+        access = self._login()["access"]
+        self._whoami(access)  # warms the token version cache
+        with self.assertNumQueries(0):
+            resp = self._whoami(access)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data, {"username": "claims", "biz_role": "manager"})
+
+    def test_claims_user_loads_other_fields_lazily(self):
+        token = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+        self.user.email = "claims@example.com"
+        self.user.save(update_fields=["email"])
+        user = ClaimsJWTAuthentication().get_user(token)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.org_id, self.org.id)
+        self.assertEqual(user.email, "claims@example.com")
+        self.assertEqual(user.org, self.org)
+
+    def test_role_change_revokes_token_and_refresh_issues_new_claims(self):
+        tokens = self._login()
+        self.user.biz_role = "employee"
+        self.user.save()
+        self.assertEqual(self._whoami(tokens["access"]).status_code, 401)
+
+        self.client.credentials()
+        resp = self.client.post("/api/token/refresh/", {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(AccessToken(resp.data["access"])["biz_role"], "employee")
+        self.assertEqual(self._whoami(resp.data["access"]).data["biz_role"], "employee")
+
+    def test_unrelated_change_keeps_token(self):
+        access = self._login()["access"]
+        self.user.first_name = "Clara"
+        self.user.save()
+        self.assertEqual(self._whoami(access).status_code, 200)
+
+    def test_deactivated_user_rejected(self):
+        tokens = self._login()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self._whoami(tokens["access"]).status_code, 401)
+        self.client.credentials()
+        resp = self.client.post("/api/token/refresh/", {"refresh": tokens["refresh"]}, format="json")
+        self.assertEqual(resp.status_code, 401)
+
+    def test_revoke_tokens(self):
+        access = self._login()["access"]
+        revoke_tokens([self.user.pk])
+        self.assertEqual(self._whoami(access).status_code, 401)
+
+    def test_token_without_claims_still_accepted(self):
+        resp = self._whoami(str(AccessToken.for_user(self.user)))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["biz_role"], "manager")
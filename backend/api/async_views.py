@@ -0,0 +1,76 @@
+# api/async_views.py
+"""
+Async function views on top of DRF.
+
+DRF's ``APIView.dispatch`` is synchronous, so under ASGI Django runs every
+DRF view in a worker thread. ``async_api_view`` is ``api_view`` for
+``async def`` views: the view itself runs on the event loop and awaits the
+async ORM (``aget``, ``aaggregate``, ``async for`` ...), while the parts
+that are sync-only -- authentication, permission checks and throttling,
+which can hit the cache or the database -- run in a thread through
+``sync_to_async``. Code in the view that is still sync-only (the keyset
+paginator, the attempt session, the level table) must be wrapped the same
+way.
+
+The other ``api_view`` decorators (``permission_classes`` ...) and
+``extend_schema`` work as usual. Under WSGI (``runserver``, the test
+client) Django runs the async views through ``async_to_sync``, so both
+entry points serve the same URLs.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from rest_framework.decorators import api_view
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """An ``APIView`` whose HTTP handlers are coroutines."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            response = handler(request, *args, **kwargs)
+            if hasattr(response, "__await__"):  # OPTIONS and 405s are answered synchronously
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+def async_api_view(http_method_names=None):
+    """``api_view`` for ``async def`` function views."""
+
+    def decorator(func):
+        wrapped = api_view(http_method_names)(func).cls
+
+        async def handler(self, *args, **kwargs):
+            return await func(*args, **kwargs)
+
+        attrs = {name: value for name, value in vars(wrapped).items() if not name.startswith("__")}
+        attrs.update({method: handler for method in wrapped.http_method_names if method != "options"})
+        attrs.update(__doc__=func.__doc__, __module__=func.__module__)
+        return type(func.__name__, (AsyncAPIView,), attrs).as_view()
+
+    return decorator
+
+
+async def aget_object_or_404(queryset, **kwargs):
+    """``get_object_or_404`` for async views (a model or a queryset)."""
+    if hasattr(queryset, "_default_manager"):
+        queryset = queryset._default_manager.all()
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
@@ -0,0 +1,200 @@
+# api/fast_serializers.py
+"""
+Read-only serialisation straight from ``.values()`` rows.
+
+For big list responses most of the time goes into DRF itself: a field
+instance per column, ``get_attribute`` walking model instances and
+``to_representation`` per value. A ``FastSerializer`` declares the same
+output shape as its DRF counterpart, and on first use compiles it into
+a list of ``(key, column, converter)`` extractors picked from the model
+fields. After that a row is serialised by one pass over that list.
+
+    class XPEventFast(FastSerializer):
+        model = XPEvent
+        fields = ("id", "created_at", "user", "username", ...)
+        sources = {"username": "user__username"}     # other-table columns
+        nested = {"module": ModuleSummaryFast}       # FK -> nested object
+
+    XPEventFast.serialize(queryset)                  # list of dicts
+    rows = XPEventFast.values(queryset)              # or page a values queryset
+    XPEventFast.from_rows(rows)                      # ... and serialise the page
+
+Output renders to the same JSON as the DRF serializer (``tests`` compare
+the two): a forward FK is its pk, UUIDs are strings and datetimes use
+DRF's format. Only read paths use this; ``FastListMixin`` swaps it in for
+a viewset's ``list`` and everything that writes keeps the DRF serializer.
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.db import models
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from learning.models import Badge, Module, ModuleAttempt, UserBadge, XPEvent
+
+
+def _iso_datetime(value):
+    value = timezone.localtime(value) if timezone.is_aware(value) else value
+    value = value.isoformat()
+    return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+
+def _converter(field) -> Optional[Callable]:
+    """Value -> JSON-ready value for one model field (None = as is)."""
+    if field.is_relation:
+        return _converter(field.target_field)
+    if isinstance(field, models.UUIDField):
+        return str
+    if isinstance(field, models.DateTimeField):
+        if api_settings.DATETIME_FORMAT == ISO_8601:
+            return _iso_datetime
+        return serializers.DateTimeField().to_representation
+    if isinstance(field, (models.DateField, models.TimeField)):
+        return serializers.ModelSerializer.serializer_field_mapping[type(field)]().to_representation
+    if isinstance(field, models.DecimalField):
+        return serializers.DecimalField(field.max_digits, field.decimal_places).to_representation
+    return None
+
+
+def _resolve(model, lookup: str):
+    """
+    The model field at the end of a ``a__b__c`` lookup, and the column of
+    the first nullable FK on the way (DRF leaves the key out when it's null).
+    """
+    field, guard, path = None, None, []
+    for part in lookup.split("__")[:-1]:
+        field = model._meta.get_field(part)
+        if guard is None and field.null:
+            guard = "__".join(path + [field.attname])
+        path.append(part)
+        model = field.related_model
+    return model._meta.get_field(lookup.split("__")[-1]), guard
+
+
+class FastSerializer:
+    model = None
+    fields: Tuple[str, ...] = ()
+    sources: Dict[str, str] = {}
+    nested: Dict[str, type] = {}
+
+    _compiled = None  # per subclass: ([(key, column, converter, guard)], [(key, fk column, serializer)])
+
+    # ------------------------------------------------------------------
+    # Compilation
+    # ------------------------------------------------------------------
+    @classmethod
+    def compile(cls, prefix: str = ""):
+        """Extractors for this shape, with every column prefixed (for nesting)."""
+        if prefix:
+            return cls._compile(prefix)
+        if cls.__dict__.get("_compiled") is None:
+            cls._compiled = cls._compile("")
+        return cls._compiled
+
+    @classmethod
+    def _compile(cls, prefix: str):
+        plain, nested = [], []
+        for key in cls.fields:
+            if key in cls.nested:
+                nested.append((key, f"{prefix}{cls.model._meta.get_field(key).attname}", cls.nested[key]))
+                continue
+            lookup = cls.sources.get(key, key)
+            field, guard = _resolve(cls.model, lookup)
+            column = lookup if "__" in lookup or not field.is_relation else field.attname
+            plain.append((key, f"{prefix}{column}", _converter(field), guard and f"{prefix}{guard}"))
+        return plain, nested
+
+    @classmethod
+    def columns(cls, prefix: str = "") -> List[str]:
+        plain, nested = cls.compile(prefix)
+        columns = [column for _, column, _, _ in plain]
+        columns += [guard for _, _, _, guard in plain if guard and guard not in columns]
+        for key, fk_column, serializer in nested:
+            columns += [fk_column] + serializer.columns(f"{prefix}{key}__")
+        return columns
+
+    # ------------------------------------------------------------------
+    # Serialising
+    # ------------------------------------------------------------------
+    @classmethod
+    def values(cls, queryset):
+        return queryset.values(*cls.columns())
+
+    @classmethod
+    def serialize(cls, queryset) -> List[Dict]:
+        return cls.from_rows(cls.values(queryset))
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict], prefix: str = "") -> List[Dict]:
+        plain, nested = cls.compile(prefix)
+        rows = list(rows)
+        out = []
+        for row in rows:
+            data = {}
+            for key, column, conv, guard in plain:
+                if guard is not None and row[guard] is None:
+                    continue
+                value = row[column]
+                data[key] = value if conv is None or value is None else conv(value)
+            out.append(data)
+        for key, fk_column, serializer in nested:
+            objects = serializer.from_rows(rows, f"{prefix}{key}__")
+            for data, row, obj in zip(out, rows, objects):
+                data[key] = obj if row[fk_column] is not None else None
+        if cls.nested:
+            out = [{key: data[key] for key in cls.fields if key in data} for data in out]  # declared key order
+        return out
+
+
+class FastListMixin:
+    """
+    Serves ``list`` from ``fast_serializer_class`` (paginated as usual);
+    retrieve and every write go through ``serializer_class``.
+    """
+
+    fast_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        fast = self.fast_serializer_class
+        queryset = fast.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast.from_rows(page))
+        return Response(fast.from_rows(queryset))
+
+
+# -----------------------------------------------------------------------------
+# Shapes (mirror the DRF serializers of the same name in api.serializers)
+# -----------------------------------------------------------------------------
+class XPEventFast(FastSerializer):
+    model = XPEvent
+    fields = ("id", "created_at", "org", "user", "username", "skill", "skill_name", "source", "amount", "meta")
+    sources = {"username": "user__username", "skill_name": "skill__name"}
+
+
+class BadgeFast(FastSerializer):
+    model = Badge
+    fields = (
+        "id", "org", "code", "name", "description", "rule_type", "value",
+        "skill", "skill_name", "team", "team_name", "department", "department_name", "icon",
+    )
+    sources = {"skill_name": "skill__name", "team_name": "team__name", "department_name": "department__name"}
+
+
+class UserBadgeFast(FastSerializer):
+    model = UserBadge
+    fields = ("id", "user", "badge", "awarded_at", "meta")
+    nested = {"badge": BadgeFast}
+
+
+class ModuleSummaryFast(FastSerializer):
+    model = Module
+    fields = ("id", "title", "skill", "sop")
+
+
+class ModuleAttemptMeFast(FastSerializer):
+    model = ModuleAttempt
+    fields = ("id", "module", "created_at", "completed_at", "score", "passed")
+    nested = {"module": ModuleSummaryFast}
@@ -0,0 +1,163 @@
+# api/pagination.py
+"""
+Keyset ("cursor") pagination for per-user histories and leaderboards.
+
+A page is selected with a WHERE on the ordering columns of the last row of
+the previous page instead of an OFFSET, so the thousandth page costs the
+same as the first and rows added in between never shift or repeat:
+
+  ?cursor=<opaque>   continue after a previous page (the ``next`` link)
+  ?page_size=<n>     rows per page (default PAGE_SIZE, at most max_page_size)
+  ?count=1           also return ``count``, the total number of rows
+
+Without ``count`` no COUNT query is run. Responses look like
+``{"next": <url or null>, "results": [...]}``.
+
+The ordering must be unique and its columns non-null -- end it with the
+primary key. Set ``keyset_ordering`` on a view (or pass ``ordering``) to
+page by something other than newest first. Annotations work too, aggregate
+ones included (the cursor condition then goes into HAVING).
+
+``position`` is the number of rows before the current page, e.g. for
+leaderboard ranks.
+"""
+import base64
+import json
+import uuid
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import List, Optional, Sequence
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def _dump(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()  # full precision; DjangoJSONEncoder drops microseconds
+    if isinstance(value, (uuid.UUID, Decimal)):
+        return str(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    ordering: Sequence[str] = ("-created_at", "-id")
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    count_query_param = "count"
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, ordering: Optional[Sequence[str]] = None):
+        if ordering:
+            self.ordering = tuple(ordering)
+
+    # ------------------------------------------------------------------
+    # Paging
+    # ------------------------------------------------------------------
+    def paginate_queryset(self, queryset, request, view=None) -> List:
+        self.request = request
+        self.ordering = tuple(getattr(view, "keyset_ordering", None) or self.ordering)
+        self.page_size = self.get_page_size(request)
+        after, self.position = self.decode_cursor(request, queryset)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ("1", "true", "yes"):
+            self.count = queryset.count()
+
+        queryset = queryset.order_by(*self.ordering)
+        if after is not None:
+            queryset = queryset.filter(self.after(after))
+        rows = list(queryset[: self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[: self.page_size]
+        return self.page
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def after(self, values: Sequence) -> Q:
+        """Rows strictly after ``values`` in ``ordering``: (a > x) OR (a = x AND b > y) ..."""
+        condition = Q()
+        for i, field in enumerate(self.ordering):
+            name = field.lstrip("-")
+            term = Q(**{f"{name}__{'lt' if field.startswith('-') else 'gt'}": values[i]})
+            for prev, value in zip(self.ordering[:i], values):
+                term &= Q(**{prev.lstrip("-"): value})
+            condition |= term
+        return condition
+
+    # ------------------------------------------------------------------
+    # Cursor
+    # ------------------------------------------------------------------
+    def encode_cursor(self, row) -> str:
+        values = [
+            _dump(row[name] if isinstance(row, dict) else getattr(row, name))
+            for name in (f.lstrip("-") for f in self.ordering)
+        ]
+        raw = json.dumps({"v": values, "p": self.position + len(self.page)}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request, queryset):
+        """``(ordering values of the last row served or None, rows before this page)``."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, 0
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4)))
+            values, position = raw["v"], int(raw["p"])
+            if len(values) != len(self.ordering) or any(v is None for v in values):
+                raise ValueError
+            return [self._field(queryset, f.lstrip("-")).to_python(v) for f, v in zip(self.ordering, values)], position
+        except (TypeError, ValueError, KeyError, FieldDoesNotExist, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _field(queryset, name):
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return queryset.model._meta.get_field(name)
+
+    # ------------------------------------------------------------------
+    # Response
+    # ------------------------------------------------------------------
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        payload = {"next": self.get_next_link(), "results": data}
+        if self.count is not None:
+            payload = {"count": self.count, **payload}
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "count": {"type": "integer", "description": "Only with ?count=1"},
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {"name": self.cursor_query_param, "required": False, "in": "query", "schema": {"type": "string"}},
+            {"name": self.page_size_query_param, "required": False, "in": "query", "schema": {"type": "integer"}},
+            {"name": self.count_query_param, "required": False, "in": "query", "schema": {"type": "boolean"}},
+        ]
@@ -0,0 +1,86 @@
+# api/renderers.py
+"""
+orjson-backed JSON renderer and parser.
+
+Drop-in replacements for DRF's ``JSONRenderer`` / ``JSONParser`` (see
+``REST_FRAMEWORK`` in settings). orjson encodes str, int, dict, list,
+UUID and datetime/date/time natively; anything else (Decimal, lazy
+translation strings, timedelta, querysets ...) goes through DRF's own
+``JSONEncoder.default``, so the output decodes to the same values as
+before:
+
+  - datetimes are ISO 8601 with ``Z`` for UTC, as DRF writes them
+  - Decimals become numbers, lazy strings are forced, and so on
+  - U+2028 / U+2029 are escaped like DRF does
+  - floats may be spelled differently (``1e-5`` vs ``1e-05``)
+  - NaN / Infinity come out as null instead of failing to render
+
+Anything orjson refuses (e.g. integers over 64 bits) is rendered by DRF's
+renderer instead, and likewise for indented output other than 2 spaces
+(the browsable API), non-default ``UNICODE_JSON`` / ``COMPACT_JSON`` /
+``STRICT_JSON`` settings, or when orjson isn't installed. The parser falls
+back to DRF for non-UTF-8 bodies and for error messages.
+
+``EventStreamRenderer`` only lets ``text/event-stream`` requests through
+content negotiation (the stream itself is a ``StreamingHttpResponse``) and
+renders errors as an ``error`` event.
+"""
+import io
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+_default = JSONEncoder().default
+_LINE_SEPARATORS = ("\u2028".encode(), "\u2029".encode())
+
+
+class ORJSONRenderer(JSONRenderer):
+    options = 0 if orjson is None else orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or self.ensure_ascii or not self.compact or not self.strict or indent not in (None, 2):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        options = self.options | (orjson.OPT_INDENT_2 if indent == 2 else 0)
+        try:
+            ret = orjson.dumps(data, default=_default, option=options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if _LINE_SEPARATORS[0] in ret or _LINE_SEPARATORS[1] in ret:
+            ret = ret.replace(_LINE_SEPARATORS[0], b"\\u2028").replace(_LINE_SEPARATORS[1], b"\\u2029")
+        return ret
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace("-", "") != "utf8" or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read() if stream is not None else b""
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            # Let DRF report the error (or parse what orjson won't, e.g. huge integers)
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+
+
+class EventStreamRenderer(ORJSONRenderer):
+    media_type = "text/event-stream"
+    format = "sse"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b"event: error\ndata: " + super().render(data) + b"\n\n"
@@ -33,6 +33,7 @@ from learning.models import (
     UserBadge,
     XPEvent,
 )
+from learning import xp_history
 from rest_framework import serializers
 
 # --- SOPs (media + viewing) --------------------------------------------------
@@ -604,6 +605,82 @@ class SingleAnswerResponseSerializer(serializers.Serializer):
     max_points = serializers.FloatField(required=False)
     message = serializers.CharField(required=False, allow_blank=True)
 
+
+class BatchAnswerItemSerializer(serializers.Serializer):
+    """One answer replayed by an offline client."""
+    attempt_id = serializers.UUIDField()
+    question_id = serializers.UUIDField()
+    choice_ids = serializers.ListField(child=serializers.UUIDField())
+    time_taken = serializers.FloatField(required=False, default=0.0)
+    client_ts = serializers.DateTimeField()
+
+
+class BatchAnswerRequestSerializer(serializers.Serializer):
+    items = BatchAnswerItemSerializer(many=True, allow_empty=False, max_length=1000)
+
+
+class BatchAnswerResultSerializer(serializers.Serializer):
+    index = serializers.IntegerField()
+    attempt_id = serializers.UUIDField()
+    question_id = serializers.UUIDField()
+    status = serializers.ChoiceField(choices=["recorded", "duplicate", "error"])
+    error = serializers.CharField(required=False)
+
+    # Feedback fields (may be omitted based on feedback_mode)
+    correct = serializers.BooleanField(required=False)
+    earned = serializers.FloatField(required=False)
+    max_points = serializers.FloatField(required=False)
+    message = serializers.CharField(required=False, allow_blank=True)
+
+
+class BatchAttemptSummarySerializer(serializers.Serializer):
+    attempt_id = serializers.UUIDField()
+    completed = serializers.BooleanField()
+    remaining = serializers.IntegerField()
+    score = serializers.IntegerField(required=False)
+    passed = serializers.BooleanField(required=False)
+
+
+class BatchAnswerResponseSerializer(serializers.Serializer):
+    results = BatchAnswerResultSerializer(many=True)
+    attempts = BatchAttemptSummarySerializer(many=True)
+
+
+class XPHistoryQuerySerializer(serializers.Serializer):
+    """Query parameters for /me/xp-history/ and /manager/xp-history/."""
+
+    period = serializers.ChoiceField(choices=list(xp_history.PERIODS), default="day")
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    skill = serializers.UUIDField(required=False)
+    user = serializers.UUIDField(required=False)  # manager endpoint only
+
+    def validate(self, attrs):
+        default_start, default_end = xp_history.default_range(attrs["period"], attrs.get("end"))
+        attrs.setdefault("end", default_end)
+        attrs.setdefault("start", default_start)
+        if attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError("start must be on or before end.")
+        if (attrs["end"] - attrs["start"]) / xp_history.step(attrs["period"]) >= xp_history.MAX_BUCKETS:
+            raise serializers.ValidationError(f"At most {xp_history.MAX_BUCKETS} buckets per request.")
+        return attrs
+
+
+class XPHistoryBucketSerializer(serializers.Serializer):
+    start = serializers.DateField()
+    xp = serializers.IntegerField()
+    events = serializers.IntegerField()
+
+
+class XPHistorySerializer(serializers.Serializer):
+    period = serializers.ChoiceField(choices=list(xp_history.PERIODS))
+    start = serializers.DateField()
+    end = serializers.DateField()
+    user_id = serializers.UUIDField(allow_null=True)
+    skill_id = serializers.UUIDField(allow_null=True)
+    total_xp = serializers.IntegerField()
+    buckets = XPHistoryBucketSerializer(many=True)
+
 class ModuleStatsSerializer(serializers.Serializer):
     module_id = serializers.UUIDField()
     title = serializers.CharField()
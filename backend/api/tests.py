@@ -1,13 +1,59 @@
 # backend/api/tests.py
-from datetime import timedelta
+import asyncio
+import gzip
+import io
+import json
+import uuid
+from datetime import date, datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-from django.test import TestCase
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Sum
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 
+from accounts.authentication import ClaimsTokenObtainPairSerializer
 from accounts.models import Org, User
-from learning.models import Skill, RecertRequirement
+from api import fast_serializers, views
+from api.renderers import ORJSONParser, ORJSONRenderer
+from api.serializers import (
+    ModuleAttemptMeSerializer,
+    QuestionPublicSerializer,
+    UserBadgeSerializer,
+    XPEventSerializer,
+)
+from learning import analytics, answers as answer_log, events as live_events, question_bank, xp_history
+from learning.levels import level_for
+from learning.models import (
+    AttemptAnswer,
+    Badge,
+    Choice,
+    Module,
+    ModuleAttempt,
+    ModuleAttemptQuestion,
+    Question,
+    Skill,
+    RecertRequirement,
+    Team,
+    TeamMember,
+    TeamXPTotal,
+    UserBadge,
+    UserStreak,
+    XPEvent,
+    XPRollup,
+)
+from matrix import compression
+from sops.models import SOP, SOPView
 
 
 class SmokeTests(TestCase):
@@ -135,3 +181,768 @@ class OverdueSopsAPITests(TestCase):
         items = list(resp.data if isinstance(resp.data, list) else resp.data.get("results", []))
         self.assertEqual(len(items), 1)
         self.assertEqual(items[0]["id"], overdue_unresolved.id)
+
+
+class AttemptFlowTests(TestCase):
+    """
+    Attempts are served from the cached question bank and answers go to the answer log.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.org = Org.objects.create(name="Quiz Org")
+        self.user = User.objects.create_user(username="quizzer", password="password123", org=self.org)
+        skill = Skill.objects.create(org=self.org, name="Forklift")
+        self.module = Module.objects.create(
+            org=self.org, skill=skill, title="Forklift basics", question_pool_count=3, require_viewed=False,
+        )
+        for i in range(5):
+            q = Question.objects.create(module=self.module, text=f"Q{i}", order=i, points=2)
+            for j in range(4):
+                Choice.objects.create(question=q, text=f"Q{i} choice {j}", is_correct=j == 0)
+        self.client.force_authenticate(self.user)
+
+    def _start(self):
+        resp = self.client.post(f"/api/modules/{self.module.id}/start/")
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def _assert_served_in_order(self, payload, presented, choice_order):
+        self.assertEqual(len(payload["questions"]), 3)
+        self.assertEqual([q["id"] for q in payload["questions"]], presented)
+        for served in payload["questions"]:
+            self.assertEqual([c["id"] for c in served["choices"]], choice_order[served["id"]])
+            expected = QuestionPublicSerializer(Question.objects.get(id=served["id"])).data
+            expected["choices"] = sorted(expected["choices"], key=lambda c: choice_order[served["id"]].index(c["id"]))
+            self.assertEqual(served, expected)
+
+    @override_settings(QUIZ_SEEDED_ATTEMPTS=False)
+    def test_start_matches_public_serializer_and_stored_order(self):
+        payload = self._start()
+        attempt = ModuleAttempt.objects.get(id=payload["attempt_id"])
+        self.assertIsNone(attempt.seed)
+        self._assert_served_in_order(payload, attempt.presented_questions, attempt.choice_order)
+
+        nxt = self.client.get(f"/api/attempts/{attempt.id}/next/").json()
+        self.assertEqual(nxt["question"], payload["questions"][0])
+
+    def test_seeded_attempt_regenerates_served_order(self):
+        payload = self._start()
+        attempt = ModuleAttempt.objects.get(id=payload["attempt_id"])
+        self.assertIsNotNone(attempt.seed)
+        self.assertEqual(attempt.presented_questions, [])
+        self._assert_served_in_order(payload, *question_bank.presented_order(attempt))
+
+        nxt = self.client.get(f"/api/attempts/{attempt.id}/next/").json()
+        self.assertEqual(nxt["question"], payload["questions"][0])
+
+    def test_bank_rebuild_keeps_seeded_order_and_choice_masks(self):
+        Question.objects.filter(module=self.module).update(order=0)  # ties on order
+        question_bank.bump_version(self.module.id)
+        payload = self._start()
+        attempt = ModuleAttempt.objects.get(id=payload["attempt_id"])
+        presented, choice_order = question_bank.presented_order(attempt)
+        qid = presented[0]
+        served = answer_log.served_choices(attempt, choice_order, qid)
+        mask = answer_log.encode_choices(served, [served[2], served[3]])
+
+        cache.clear()
+        attempt = ModuleAttempt.objects.get(id=attempt.id)
+        bank = question_bank.get_bank(attempt.module)
+        questions = Question.objects.filter(module=self.module)
+        self.assertEqual([q["id"] for q in bank["questions"]], [str(i) for i in sorted(q.id for q in questions)])
+        for q in bank["questions"]:
+            choice_ids = Choice.objects.filter(question_id=q["id"]).values_list("id", flat=True)
+            self.assertEqual([c["id"] for c in q["choices"]], [str(i) for i in sorted(choice_ids)])
+
+        self.assertEqual(question_bank.presented_order(attempt), (presented, choice_order))
+        rebuilt = answer_log.served_choices(attempt, question_bank.presented_order(attempt)[1], qid)
+        self.assertEqual(answer_log.decode_choices(rebuilt, mask), [served[2], served[3]])
+
+    def test_content_change_pins_seeded_attempts(self):
+        payload = self._start()
+        served = [q["id"] for q in payload["questions"]]
+
+        Question.objects.filter(id=served[0]).update(text="edited")  # no signal; doesn't pin
+        Question.objects.create(module=self.module, text="New", order=99)  # signal pins first
+        attempt = ModuleAttempt.objects.get(id=payload["attempt_id"])
+        self.assertIsNone(attempt.seed)
+        self.assertEqual(attempt.presented_questions, served)
+        self.assertEqual(
+            attempt.choice_order, {q["id"]: [c["id"] for c in q["choices"]] for q in payload["questions"]}
+        )
+
+        # Changing draw settings pins too
+        second = ModuleAttempt.objects.get(id=self._start()["attempt_id"])
+        module = Module.objects.get(id=self.module.id)
+        module.question_pool_count = 2
+        module.save()
+        second.refresh_from_db()
+        self.assertIsNone(second.seed)
+        self.assertEqual(len(second.presented_questions), 3)
+
+    def test_editing_questions_invalidates_bank(self):
+        self._start()
+        version = Module.objects.get(id=self.module.id).content_version
+
+        Question.objects.filter(module=self.module).exclude(order=0).delete()
+        self.assertGreater(Module.objects.get(id=self.module.id).content_version, version)
+
+        payload = self._start()
+        self.assertEqual([q["text"] for q in payload["questions"]], ["Q0"])
+
+    def test_submits_append_to_answer_log(self):
+        payload = self._start()
+        attempt_id = payload["attempt_id"]
+        first, second = payload["questions"][:2]
+
+        for choice in (first["choices"][0], first["choices"][1]):
+            resp = self.client.post(
+                f"/api/attempts/{attempt_id}/submit/",
+                {"question_id": first["id"], "choice_ids": [choice["id"]]},
+                format="json",
+            )
+            self.assertEqual(resp.status_code, 200)
+
+        attempt = ModuleAttempt.objects.get(id=attempt_id)
+        self.assertEqual(attempt.answers, {})  # nothing rewritten on the attempt row
+        self.assertEqual(AttemptAnswer.objects.filter(attempt=attempt).count(), 2)
+        self.assertEqual(answer_log.answers_for(attempt), {first["id"]: [first["choices"][1]["id"]]})
+
+        nxt = self.client.get(f"/api/attempts/{attempt_id}/next/").json()
+        self.assertEqual(nxt["question"]["id"], second["id"])
+
+        # Per-question flow keeps ModuleAttemptQuestion; history comes from the log
+        for choice in (second["choices"][2], second["choices"][3]):
+            self.client.post(
+                f"/api/attempts/{attempt_id}/submit-all/",
+                {"question_id": second["id"], "choice_ids": [choice["id"]], "time_taken": 1.5},
+                format="json",
+            )
+        maq = ModuleAttemptQuestion.objects.get(attempt_id=attempt_id, question_id=second["id"])
+        self.assertTrue(maq.changed_answer)
+        self.assertEqual(maq.time_taken, 3.0)
+        history = answer_log.selection_history(maq)
+        self.assertEqual([h["choice_ids"] for h in history], [[second["choices"][2]["id"]], [second["choices"][3]["id"]]])
+
+    def test_batch_submit_scores_completes_and_is_idempotent(self):
+        payload = self._start()
+        attempt_id = payload["attempt_id"]
+        now = timezone.now()
+        items = [
+            {
+                "attempt_id": attempt_id,
+                "question_id": q["id"],
+                "choice_ids": [str(Choice.objects.get(question_id=q["id"], is_correct=True).id)],
+                "time_taken": 2.0,
+                "client_ts": (now + timedelta(seconds=i)).isoformat(),
+            }
+            for i, q in enumerate(payload["questions"])
+        ]
+        items.append({**items[0], "attempt_id": str(uuid.uuid4())})
+
+        resp = self.client.post("/api/answers/batch/", {"items": items}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        body = resp.json()
+        self.assertEqual([r["status"] for r in body["results"]], ["recorded"] * 3 + ["error"])
+        self.assertEqual(body["attempts"], [
+            {"attempt_id": attempt_id, "completed": True, "remaining": 0, "score": 100, "passed": True}
+        ])
+        attempt = ModuleAttempt.objects.get(id=attempt_id)
+        self.assertTrue(attempt.passed)
+        self.assertEqual(ModuleAttemptQuestion.objects.filter(attempt=attempt, correct=True).count(), 3)
+        xp_events = XPEvent.objects.filter(user=self.user).count()
+
+        # Replaying the same batch changes nothing
+        body = self.client.post("/api/answers/batch/", {"items": items[:3]}, format="json").json()
+        self.assertEqual([r["status"] for r in body["results"]], ["duplicate"] * 3)
+        self.assertEqual(AttemptAnswer.objects.filter(attempt=attempt).count(), 3)
+        self.assertEqual(ModuleAttemptQuestion.objects.get(attempt=attempt, question_id=items[0]["question_id"]).time_taken, 2.0)
+        self.assertEqual(XPEvent.objects.filter(user=self.user).count(), xp_events)
+
+        # New answers to the completed attempt are rejected and change nothing
+        wrong = str(Choice.objects.get(question_id=items[0]["question_id"], text__endswith="choice 1").id)
+        late = {**items[0], "choice_ids": [wrong], "client_ts": (now + timedelta(minutes=5)).isoformat()}
+        body = self.client.post("/api/answers/batch/", {"items": [late]}, format="json").json()
+        self.assertEqual(body["results"][0]["status"], "error")
+        self.assertEqual(body["results"][0]["error"], "Attempt already completed.")
+        self.assertEqual(AttemptAnswer.objects.filter(attempt=attempt).count(), 3)
+        maq = ModuleAttemptQuestion.objects.get(attempt=attempt, question_id=items[0]["question_id"])
+        self.assertTrue(maq.correct)
+        self.assertEqual(ModuleAttempt.objects.get(id=attempt_id).score, 100)
+
+    def test_session_serves_flow_from_cache(self):
+        payload = self._start()
+        attempt_id = payload["attempt_id"]
+        self.client.get(f"/api/attempts/{attempt_id}/next/")  # builds the session
+
+        for q in payload["questions"]:
+            correct = str(Choice.objects.get(question_id=q["id"], is_correct=True).id)
+            with self.assertNumQueries(0):
+                nxt = self.client.get(f"/api/attempts/{attempt_id}/next/").json()
+            self.assertEqual(nxt["question"]["id"], q["id"])
+            with self.assertNumQueries(1):  # the answer log insert
+                resp = self.client.post(
+                    f"/api/attempts/{attempt_id}/submit/",
+                    {"question_id": q["id"], "choice_ids": [correct]},
+                    format="json",
+                )
+            self.assertTrue(resp.json()["correct"])
+
+        self.assertTrue(self.client.get(f"/api/attempts/{attempt_id}/next/").json()["done"])
+        result = self.client.post(f"/api/attempts/{attempt_id}/finish/").json()
+        self.assertEqual((result["percent"], result["passed"]), (100, True))
+        self.assertTrue(ModuleAttempt.objects.get(id=attempt_id).passed)
+
+    def test_finish_scores_the_answer_log_not_the_cached_session(self):
+        payload = self._start()
+        attempt_id = payload["attempt_id"]
+        key = f"attempt-session:{attempt_id}"
+        self.client.get(f"/api/attempts/{attempt_id}/next/")  # builds the session
+        stale = cache.get(key)
+
+        for q in payload["questions"]:
+            correct = str(Choice.objects.get(question_id=q["id"], is_correct=True).id)
+            self.client.post(
+                f"/api/attempts/{attempt_id}/submit/", {"question_id": q["id"], "choice_ids": [correct]}, format="json"
+            )
+        cache.set(key, stale)  # a concurrent write put back the copy with no answers
+
+        result = self.client.post(f"/api/attempts/{attempt_id}/finish/").json()
+        self.assertEqual((result["percent"], result["passed"]), (100, True))
+        self.assertEqual(ModuleAttempt.objects.get(id=attempt_id).score, 100)
+        self.assertIsNone(cache.get(key))
+
+        # Reads and late submits on the completed attempt don't cache it again
+        self.client.get(f"/api/attempts/{attempt_id}/next/")
+        q = payload["questions"][0]
+        self.client.post(
+            f"/api/attempts/{attempt_id}/submit/",
+            {"question_id": q["id"], "choice_ids": [q["choices"][0]["id"]]},
+            format="json",
+        )
+        self.assertIsNone(cache.get(key))
+
+        cache.clear()  # evicted: the summary is still scored from the log
+        again = self.client.post(f"/api/attempts/{attempt_id}/finish/").json()
+        self.assertEqual(len(again["feedback"]), 3)
+
+    def test_module_analytics_reads_rolled_up_item_stats(self):
+        Module.objects.filter(id=self.module.id).update(question_pool_count=None)
+        questions = list(Question.objects.filter(module=self.module))
+        wrong_on = questions[0]
+        for attempt_no in range(2):
+            payload = self._start()
+            items = []
+            for i, q in enumerate(payload["questions"]):
+                wrong = attempt_no == 1 and q["id"] == str(wrong_on.id)
+                choice = Choice.objects.get(question_id=q["id"], text__endswith="choice 1" if wrong else "choice 0")
+                items.append({
+                    "attempt_id": payload["attempt_id"],
+                    "question_id": q["id"],
+                    "choice_ids": [str(choice.id)],
+                    "time_taken": 4.0 + attempt_no * 2,
+                    "client_ts": (timezone.now() + timedelta(seconds=i)).isoformat(),
+                })
+            self.client.post("/api/answers/batch/", {"items": items}, format="json")
+        self.assertEqual(sorted(ModuleAttempt.objects.values_list("score", flat=True)), [80, 100])
+
+        self.user.biz_role = "manager"
+        self.user.save()
+        url = f"/api/modules/{self.module.id}/analytics/"
+        self.assertEqual(self.client.get(url).json()["pending_attempts"], 2)
+
+        self.assertEqual(analytics.rollup(), 2)
+        self.assertEqual(analytics.rollup(), 0)  # already folded in
+
+        body = self.client.get(url).json()
+        self.assertEqual((body["pending_attempts"], body["analysed_attempts"], body["pass_count"]), (0, 2, 2))
+        stats = {q["question_id"]: q for q in body["questions"]}
+        hard = stats[str(wrong_on.id)]
+        self.assertEqual((hard["responses"], hard["p_value"], hard["discrimination"]), (2, 0.5, 1.0))
+        rates = {c["text"][-8:]: c["rate"] for c in hard["choices"]}
+        self.assertEqual(rates, {"choice 0": 0.5, "choice 1": 0.5, "choice 2": 0.0, "choice 3": 0.0})
+        self.assertEqual((hard["median_time"], hard["change_rate"]), (4, 0.0))
+        easy = stats[str(questions[1].id)]
+        self.assertEqual((easy["p_value"], easy["discrimination"]), (1.0, None))
+
+        self.user.biz_role = "employee"
+        self.user.save()
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+    def test_finish_runs_xp_side_effects_once_after_commit(self):
+        team = Team.objects.create(org=self.org, name="Quiz team")
+        TeamMember.objects.create(team=team, user=self.user)
+        payload = self._start()
+        attempt_id = payload["attempt_id"]
+        for q in payload["questions"]:
+            correct = str(Choice.objects.get(question_id=q["id"], is_correct=True).id)
+            self.client.post(
+                f"/api/attempts/{attempt_id}/submit/", {"question_id": q["id"], "choice_ids": [correct]}, format="json"
+            )
+
+        with mock.patch("learning.signals.auto_award_badges_for_user") as evaluate:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                self.client.post(f"/api/attempts/{attempt_id}/finish/")
+                self.assertFalse(evaluate.called)  # deferred until commit
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(XPEvent.objects.filter(user=self.user).count(), 2)  # pass + bonus
+        evaluate.assert_called_once_with(self.user, self.org)
+        xp = XPEvent.objects.filter(user=self.user).aggregate(s=Sum("amount"))["s"]
+        self.assertEqual(TeamXPTotal.objects.get(team=team).total_xp, xp)
+        self.assertEqual(XPRollup.objects.get(period="day", user=self.user, skill=None).events, 2)
+
+class XPHistoryTests(TestCase):
+    """
+    /me/xp-history/ and /manager/xp-history/ read the day/week XPRollup buckets.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.org = Org.objects.create(name="XP Org")
+        self.user = User.objects.create_user(username="earner", password="password123", org=self.org)
+        self.other = User.objects.create_user(username="other", password="password123", org=self.org)
+        self.skill = Skill.objects.create(org=self.org, name="Racking")
+        for user, skill, amount in ((self.user, self.skill, 30), (self.user, None, 5), (self.other, self.skill, 10)):
+            XPEvent.objects.create(user=user, org=self.org, skill=skill, source="quiz", amount=amount)
+
+    def test_me_history_buckets_by_day_and_week(self):
+        self.client.force_authenticate(self.user)
+        body = self.client.get("/api/me/xp-history/").json()
+        self.assertEqual(len(body["buckets"]), 30)
+        self.assertEqual(body["buckets"][-1], {"start": str(timezone.localdate()), "xp": 35, "events": 2})
+        self.assertEqual(body["total_xp"], 35)
+
+        body = self.client.get(f"/api/me/xp-history/?period=week&skill={self.skill.id}").json()
+        self.assertEqual((len(body["buckets"]), body["total_xp"]), (12, 30))
+        self.assertEqual(date.fromisoformat(body["buckets"][-1]["start"]).weekday(), 0)
+
+        self.assertEqual(self.client.get("/api/me/xp-history/?period=day&start=2000-01-01").status_code, 400)
+
+    def test_manager_history_and_rebuild(self):
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get("/api/manager/xp-history/").status_code, 403)
+
+        self.user.biz_role = "manager"
+        self.user.save()
+        self.assertEqual(self.client.get("/api/manager/xp-history/").json()["total_xp"], 45)
+        self.assertEqual(self.client.get(f"/api/manager/xp-history/?skill={self.skill.id}").json()["total_xp"], 40)
+        self.assertEqual(self.client.get(f"/api/manager/xp-history/?user={self.other.id}").json()["total_xp"], 10)
+
+        maintained = set(XPRollup.objects.values_list("period", "bucket", "user_id", "skill_id", "amount", "events"))
+        self.assertEqual(len(maintained), 12)  # 2 periods x (2 users + 2 user/skill + org + org/skill)
+        xp_history.rebuild()
+        rebuilt = set(XPRollup.objects.values_list("period", "bucket", "user_id", "skill_id", "amount", "events"))
+        self.assertEqual(rebuilt, maintained)
+
+    def test_deleted_xp_comes_off_history(self):
+        XPEvent.objects.filter(user=self.user, skill=self.skill).delete()
+        self.client.force_authenticate(self.user)
+        body = self.client.get("/api/me/xp-history/").json()
+        self.assertEqual(body["buckets"][-1], {"start": str(timezone.localdate()), "xp": 5, "events": 1})
+
+        rows = ("period", "bucket", "user_id", "skill_id", "amount", "events")
+        maintained = set(XPRollup.objects.exclude(amount=0, events=0).values_list(*rows))
+        xp_history.rebuild()
+        self.assertEqual(set(XPRollup.objects.values_list(*rows)), maintained)
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Per-user histories and leaderboards page by cursor, newest (or highest) first.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.org = Org.objects.create(name="Paging Org")
+        self.user = User.objects.create_user(username="veteran", password="password123", org=self.org)
+        self.skill = Skill.objects.create(org=self.org, name="Picking")
+        self.module = Module.objects.create(org=self.org, skill=self.skill, title="Picking 101")
+        self.client.force_authenticate(self.user)
+
+    def _walk(self, url):
+        pages, seen = 0, []
+        while url:
+            body = self.client.get(url).json()
+            seen += body["results"]
+            url = body["next"]
+            pages += 1
+        return pages, seen
+
+    def test_attempt_history_pages_without_gaps_or_repeats(self):
+        attempts = [ModuleAttempt.objects.create(user=self.user, module=self.module) for _ in range(7)]
+        # Ties on created_at fall back to id
+        ModuleAttempt.objects.filter(id__in=[a.id for a in attempts[2:5]]).update(created_at=attempts[2].created_at)
+        expected = list(
+            ModuleAttempt.objects.filter(user=self.user).order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+
+        first = self.client.get("/api/me/module-attempts/?page_size=3").json()
+        self.assertNotIn("count", first)
+        pages, seen = self._walk("/api/me/module-attempts/?page_size=3")
+        self.assertEqual(pages, 3)
+        self.assertEqual([row["id"] for row in seen], [str(i) for i in expected])
+
+        self.assertEqual(self.client.get("/api/me/module-attempts/?count=1").json()["count"], 7)
+        self.assertEqual(self.client.get("/api/me/module-attempts/?cursor=nonsense").status_code, 404)
+
+    def test_default_page_size_pages_past_first_page(self):
+        ModuleAttempt.objects.bulk_create(ModuleAttempt(user=self.user, module=self.module) for _ in range(30))
+        for i in range(30):
+            user = User.objects.create_user(username=f"packer{i}", password="password123", org=self.org)
+            XPEvent.objects.create(user=user, org=self.org, skill=self.skill, source="quiz", amount=i + 1)
+
+        first = self.client.get("/api/me/module-attempts/").json()
+        self.assertEqual(len(first["results"]), 25)
+        self.assertIsNotNone(first["next"])
+        pages, seen = self._walk("/api/me/module-attempts/")
+        self.assertEqual((pages, len({row["id"] for row in seen})), (2, 30))
+
+        pages, rows = self._walk("/api/leaderboard/")
+        self.assertEqual(pages, 2)
+        self.assertEqual([r["rank"] for r in rows], list(range(1, 31)))
+        self.assertEqual([r["overall_xp"] for r in rows], list(range(30, 0, -1)))
+
+        # An explicit page size returns everything at once
+        body = self.client.get("/api/me/module-attempts/?page_size=100").json()
+        self.assertEqual((len(body["results"]), body["next"]), (30, None))
+
+    def test_leaderboard_ranks_continue_across_pages(self):
+        for i in range(5):
+            user = User.objects.create_user(username=f"picker{i}", password="password123", org=self.org)
+            XPEvent.objects.create(user=user, org=self.org, skill=self.skill, source="quiz", amount=10 * (i % 3) + 5)
+
+        pages, rows = self._walk("/api/leaderboard/?page_size=2")
+        self.assertEqual(pages, 3)
+        self.assertEqual([r["rank"] for r in rows], [1, 2, 3, 4, 5])
+        self.assertEqual([r["overall_xp"] for r in rows], [25, 15, 15, 5, 5])
+        self.assertEqual(len({r["user_id"] for r in rows}), 5)
+
+
+class FastSerializerTests(TestCase):
+    """
+    The values()-based read serializers render the same JSON as their DRF counterparts.
+    """
+
+    def setUp(self):
+        self.org = Org.objects.create(name="Fast Org")
+        self.user = User.objects.create_user(username="reader", password="password123", org=self.org)
+        self.skill = Skill.objects.create(org=self.org, name="Loading")
+        self.module = Module.objects.create(org=self.org, skill=self.skill, title="Loading 101")
+        for skill in (self.skill, None):
+            XPEvent.objects.create(user=self.user, org=self.org, skill=skill, source="quiz", amount=7, meta={"a": 1})
+        for code, skill in (("first", self.skill), ("second", None)):
+            badge = Badge.objects.create(org=self.org, code=code, name=code, rule_type="xp_total", skill=skill)
+            UserBadge.objects.create(user=self.user, badge=badge)
+        ModuleAttempt.objects.create(user=self.user, module=self.module, score=90, passed=True, completed_at=timezone.now())
+        ModuleAttempt.objects.create(user=self.user, module=self.module)
+
+    def _assert_same(self, fast, drf, queryset):
+        rendered = JSONRenderer().render(drf(queryset, many=True).data)
+        self.assertEqual(json.loads(JSONRenderer().render(fast.serialize(queryset))), json.loads(rendered))
+
+    def test_shapes_match_drf(self):
+        self._assert_same(fast_serializers.XPEventFast, XPEventSerializer, XPEvent.objects.order_by("amount", "id"))
+        self._assert_same(fast_serializers.UserBadgeFast, UserBadgeSerializer, UserBadge.objects.order_by("id"))
+        self._assert_same(
+            fast_serializers.ModuleAttemptMeFast, ModuleAttemptMeSerializer, ModuleAttempt.objects.order_by("id")
+        )
+
+    def test_list_endpoints_use_fast_path(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch.object(XPEventSerializer, "to_representation") as drf:
+            body = client.get("/api/xp/").json()
+        drf.assert_not_called()
+        self.assertEqual(len(body["results"]), XPEvent.objects.count())
+        badges = client.get("/api/me/badges/").json()["results"]
+        self.assertEqual({b["badge"]["code"] for b in badges}, {"first", "second"})
+
+
+class ORJSONRendererTests(TestCase):
+    """
+    The orjson renderer/parser give the same bytes and values as DRF's JSON ones.
+    """
+
+    payload = {
+        "id": uuid.UUID("6f1c2b8e-1d2a-4c55-9c1e-0b8b7a6d5e4f"),
+        "at": datetime(2024, 3, 1, 12, 30, 5, 123456, tzinfo=dt_timezone.utc),
+        "plain_at": datetime(2024, 3, 1, 12, 30),
+        "day": date(2024, 3, 1),
+        "score": Decimal("87.50"),
+        "label": gettext_lazy("Passed"),
+        "took": timedelta(seconds=90),
+        "buckets": {1: "one", 2: [True, None, 3]},
+        "note": "line\u2028break \u00e9",
+        "errors": [ErrorDetail("Bad", code="invalid")],
+    }
+
+    def test_renders_like_drf(self):
+        self.assertEqual(ORJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+        # Indented output orjson can't do goes through DRF
+        self.assertEqual(
+            ORJSONRenderer().render(self.payload, "application/json; indent=4"),
+            JSONRenderer().render(self.payload, "application/json; indent=4"),
+        )
+        self.assertEqual(ORJSONRenderer().render({"n": 2 ** 70}), b'{"n":1180591620717411303424}')
+
+    def test_parses_like_drf(self):
+        body = JSONRenderer().render(self.payload)
+        self.assertEqual(ORJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+        with self.assertRaisesMessage(ParseError, "JSON parse error"):
+            ORJSONParser().parse(io.BytesIO(b'{"a": NaN}'))
+
+
+@mock.patch("matrix.compression.brotli", None)
+class CompressionMiddlewareTests(TestCase):
+    """
+    Responses are compressed when the client accepts it and they're big enough;
+    large bodies are compressed once and reused from the cache.
+    """
+
+    body = json.dumps([{"rank": i, "username": f"user{i}", "overall_xp": i * 10} for i in range(2000)]).encode()
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def _send(self, response, accept="gzip, deflate"):
+        request = self.factory.get("/api/leaderboard/", HTTP_ACCEPT_ENCODING=accept)
+        return compression.CompressionMiddleware(lambda r: response)(request)
+
+    def _json(self, body=None):
+        return HttpResponse(body or self.body, content_type="application/json")
+
+    def test_compresses_accepted_large_responses(self):
+        response = self._send(self._json())
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response["Content-Length"], str(len(response.content)))
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+        self.assertFalse(self._send(self._json(b'{"small": true}')).has_header("Content-Encoding"))
+        self.assertFalse(self._send(self._json(), accept="gzip;q=0, identity").has_header("Content-Encoding"))
+        image = HttpResponse(self.body, content_type="image/png")
+        self.assertFalse(self._send(image).has_header("Content-Encoding"))
+
+    def test_identical_bodies_compressed_once(self):
+        with mock.patch("matrix.compression.compress", wraps=compression.compress) as compress:
+            first = self._send(self._json())
+            second = self._send(self._json())
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(first.content, second.content)
+
+    def test_streaming_responses(self):
+        response = self._send(StreamingHttpResponse(iter([self.body[:5000], self.body[5000:]]),
+                                                    content_type="text/csv"))
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), self.body)
+
+    def test_negotiation(self):
+        self.assertEqual(compression.choose_encoding("br;q=1.0, gzip;q=0.8"), "gzip")
+        self.assertIsNone(compression.choose_encoding("identity"))
+        self.assertEqual(compression.choose_encoding("*"), "gzip")
+        with mock.patch("matrix.compression.brotli", object()):
+            self.assertEqual(compression.choose_encoding("gzip, br"), "br")
+            self.assertEqual(compression.choose_encoding("br;q=0.5, gzip"), "gzip")
+
+
+class AsyncViewTests(TestCase):
+    """
+    The hot read/heartbeat endpoints are async views: served through ASGI
+    (AsyncClient) and still through WSGI (APIClient).
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.org = Org.objects.create(name="Async Org")
+        self.user = User.objects.create_user(username="async", password="pw", org=self.org, biz_role="manager")
+        skill = Skill.objects.create(org=self.org, name="Async skill")
+        self.module = Module.objects.create(org=self.org, skill=skill, title="Async module", require_viewed=False)
+        for i in range(3):
+            q = Question.objects.create(module=self.module, text=f"Q{i}", order=i)
+            for j in range(2):
+                Choice.objects.create(question=q, text=f"C{j}", is_correct=j == 0)
+        self.sop = SOP.objects.create(org=self.org, code="ASYNC-1", title="Async SOP", status="published")
+        XPEvent.objects.create(user=self.user, org=self.org, skill=skill, source="quiz", amount=15)
+        ModuleAttempt.objects.create(user=self.user, module=self.module, score=80, passed=True)
+        token = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+        self.auth = {"headers": {"Authorization": f"Bearer {token}"}}
+
+    def test_views_are_coroutines(self):
+        for view in (views.sop_view_heartbeat, views.my_dashboard, views.leaderboard, views.next_question,
+                     views.whoami):
+            self.assertTrue(asyncio.iscoroutinefunction(view), view)
+
+    async def test_async_endpoints(self):
+        resp = await self.async_client.get("/api/me/whoami/", **self.auth)
+        self.assertEqual(resp.json(), {"username": "async", "biz_role": "manager"})
+
+        for _ in range(2):
+            resp = await self.async_client.post(
+                f"/api/sops/{self.sop.id}/view/", {"seconds_viewed": 5, "progress": 0.4},
+                content_type="application/json", **self.auth,
+            )
+            self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["seconds_viewed"], 10)
+        view = await SOPView.objects.aget(sop_id=self.sop.id, user_id=self.user.id)
+        self.assertEqual(view.progress, 0.4)
+
+        dashboard = (await self.async_client.get("/api/me/dashboard/", **self.auth)).json()
+        self.assertEqual(dashboard["overall_xp"], 15)
+        self.assertEqual((dashboard["attempts_total"], dashboard["attempts_passed"]), (1, 1))
+        self.assertEqual(dashboard["avg_score"], 80.0)
+
+        board = (await self.async_client.get("/api/leaderboard/", **self.auth)).json()
+        self.assertEqual([r["username"] for r in board["results"]], ["async"])
+
+        started = (await self.async_client.post(f"/api/modules/{self.module.id}/start/", **self.auth)).json()
+        nxt = (await self.async_client.get(f"/api/attempts/{started['attempt_id']}/next/", **self.auth)).json()
+        self.assertEqual(nxt["question"], started["questions"][0])
+
+    async def test_async_errors(self):
+        self.assertEqual((await self.async_client.get("/api/me/dashboard/")).status_code, 401)
+        resp = await self.async_client.post(f"/api/sops/{uuid.uuid4()}/view/", {}, **self.auth)
+        self.assertEqual(resp.status_code, 404)
+        self.assertEqual((await self.async_client.delete("/api/me/whoami/", **self.auth)).status_code, 405)
+
+    async def test_sop_completion_counts_for_streak(self):
+        url = f"/api/sops/{self.sop.id}/view/"
+        await self.async_client.post(url, {"progress": 0.5}, content_type="application/json", **self.auth)
+        self.assertFalse(await UserStreak.objects.filter(user_id=self.user.id).aexists())
+        await self.async_client.post(url, {"completed": True}, content_type="application/json", **self.auth)
+        streak = await UserStreak.objects.aget(user_id=self.user.id)
+        self.assertEqual((streak.current, streak.last_active), (1, timezone.localdate()))
+
+    def test_same_views_under_wsgi(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        resp = client.post(f"/api/sops/{self.sop.id}/view/", {"seconds_viewed": 7}, format="json")
+        self.assertEqual(resp.data["seconds_viewed"], 7)
+        self.assertEqual(client.get("/api/me/dashboard/").data["overall_xp"], 15)
+
+
+@override_settings(LIVE_EVENTS_MAX_AGE=5, LIVE_EVENTS_KEEPALIVE=5)
+class LiveEventStreamTests(TestCase):
+    """XP, rank and badge deltas on /api/events/stream/ (learning.events)."""
+
+    def setUp(self):
+        live_events.broker.cache_clear()
+        self.org = Org.objects.create(name="Live Org")
+        self.user = User.objects.create_user(username="live", password="pw", org=self.org)
+        self.rival = User.objects.create_user(username="rival", password="pw", org=self.org)
+        self.skill = Skill.objects.create(org=self.org, name="Live skill")
+        XPEvent.objects.create(user=self.user, org=self.org, skill=self.skill, source="quiz", amount=20)
+        XPEvent.objects.create(user=self.rival, org=self.org, skill=self.skill, source="quiz", amount=10)
+        token = ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+        self.auth = {"headers": {"Authorization": f"Bearer {token}"}}
+
+    def tearDown(self):
+        live_events.broker.cache_clear()
+
+    def _award(self, user, amount):
+        with self.captureOnCommitCallbacks(execute=True):
+            XPEvent.objects.create(user=user, org=self.org, skill=self.skill, source="quiz", amount=amount)
+
+    @staticmethod
+    def _parse(chunk):
+        fields = dict(line.split(": ", 1) for line in chunk.decode().strip().splitlines())
+        return fields.get("event"), json.loads(fields.get("data", "null"))
+
+    async def _open(self, **headers):
+        resp = await self.async_client.get(
+            "/api/events/stream/", headers={**self.auth["headers"], **headers}
+        )
+        self.assertEqual(resp["Content-Type"], "text/event-stream")
+        chunks = resp.streaming_content.__aiter__()
+        self.assertTrue((await anext(chunks)).startswith(b"retry: "))
+        return resp, chunks
+
+    async def _next(self, chunks):
+        return self._parse(await asyncio.wait_for(anext(chunks), 2))
+
+    async def test_xp_and_rank_deltas(self):
+        _, chunks = await self._open()
+        self.assertEqual((await self._next(chunks))[0], "ready")
+
+        await sync_to_async(self._award)(self.rival, 15)
+        self.assertEqual(
+            await self._next(chunks),
+            ("xp", {"user_id": str(self.rival.id), "username": "rival", "amount": 15, "overall_xp": 25,
+                    "level": level_for(25)}),
+        )
+        self.assertEqual(
+            await self._next(chunks),
+            ("rank", {"user_id": str(self.rival.id), "username": "rival", "rank": 1, "previous_rank": 2,
+                      "overall_xp": 25}),
+        )
+
+        # No rank change, no rank event
+        await sync_to_async(self._award)(self.rival, 1)
+        self.assertEqual((await self._next(chunks))[0], "xp")
+        await sync_to_async(self._award)(self.user, 10)
+        kind, data = await self._next(chunks)
+        self.assertEqual((kind, data["username"]), ("xp", "live"))
+        self.assertEqual((await self._next(chunks))[1]["rank"], 1)
+        await chunks.aclose()
+
+    async def test_subscription_released_when_stream_closes(self):
+        channel = live_events.org_channel(self.org.id)
+        stream = views._event_stream([channel], None)
+        await anext(stream)
+        self.assertTrue(live_events.broker().has_subscribers(channel))
+        await stream.aclose()
+        self.assertFalse(live_events.broker().has_subscribers(channel))
+
+    async def test_badge_award(self):
+        badge = await Badge.objects.acreate(
+            org=self.org, code="XP30", name="Thirty", rule_type="overall_xp_at_least", value=30
+        )
+        _, chunks = await self._open()
+        await self._next(chunks)
+        await sync_to_async(self._award)(self.user, 10)
+        received = dict([await self._next(chunks), await self._next(chunks)])
+        self.assertEqual(received["badge"]["badge"]["id"], str(badge.id))
+        self.assertEqual(received["badge"]["badge"]["name"], "Thirty")
+        self.assertEqual(received["xp"]["overall_xp"], 30)
+        awarded = await UserBadge.objects.select_related("badge").aget(badge=badge)
+        rest = await sync_to_async(lambda: JSONRenderer().render(UserBadgeSerializer(awarded).data))()
+        self.assertEqual(received["badge"], json.loads(rest))  # the /me/badges/ row
+        await chunks.aclose()
+
+    async def test_resume_from_last_event_id(self):
+        broker = live_events.broker()
+        channel = live_events.org_channel(self.org.id)
+        first = broker.publish(channel, "xp", {"n": 1})
+        broker.publish(channel, "xp", {"n": 2})
+        broker.publish(live_events.org_channel(uuid.uuid4()), "xp", {"other": True})
+
+        _, chunks = await self._open(**{"Last-Event-ID": str(first["id"])})
+        self.assertEqual(await self._next(chunks), ("ready", {"channels": [
+            live_events.user_channel(self.user.id), channel,
+        ]}))
+        self.assertEqual(await self._next(chunks), ("xp", {"n": 2}))
+        await chunks.aclose()
+
+    def test_resync_when_buffer_has_moved_on(self):
+        broker = live_events.InProcessBroker(buffer=2)
+        first = broker.publish("org:x", "xp", {"n": 1})
+        for n in range(2, 5):
+            last = broker.publish("org:x", "xp", {"n": n})
+        self.assertEqual([e["data"]["n"] for e in broker.replay(["org:x"], first["id"] + 1)], [3, 4])
+        self.assertEqual(broker.replay(["org:x"], first["id"]), [{"id": last["id"], "type": "resync", "data": {}}])
+
+    def test_nothing_computed_without_subscribers(self):
+        with self.assertNumQueries(0):
+            live_events.announce_xp(self.user.id, self.org.id, 5)
+
+    def test_wsgi_sends_missed_events_and_ends(self):
+        live_events.broker().publish(live_events.user_channel(self.user.id), "badge", {"n": 1})
+        client = APIClient()
+        client.force_authenticate(self.user)
+        resp = client.get("/api/events/stream/?last_event_id=0")
+        chunks = [self._parse(c) for c in resp.streaming_content if not c.startswith(b"retry")]
+        self.assertEqual([kind for kind, _ in chunks], ["ready", "badge"])
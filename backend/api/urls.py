@@ -43,6 +43,7 @@ urlpatterns = [
     path("my_progress/", views.my_progress, name="my-progress-underscore"),
 
     path("me/whoami/", views.whoami, name="whoami"),
+    path("events/stream/", views.event_stream, name="event-stream"),
     path("me/sop-views/", views.my_sop_views),
 
     # Overdue recerts for current user
@@ -61,11 +62,13 @@ urlpatterns = [
 
     # Personal dashboard & attempts
     path("me/dashboard/", views.my_dashboard, name="my-dashboard"),
+    path("me/xp-history/", views.my_xp_history, name="my-xp-history"),
     path(
         "me/module-attempts/",
         views.MyModuleAttemptsView.as_view(),
         name="my-module-attempts",
     ),
+    path("me/badges/", views.my_badges, name="my-badges"),
 
     # -------------------------------------------------------------------------
     # SOP media tracking
@@ -111,6 +114,13 @@ urlpatterns = [
         name="attempt-review",
     ),
 
+    # Offline/kiosk clients: many answers (across attempts) in one request.
+    # Not under attempts/ -- the router's attempt detail route would swallow it.
+    path(
+        "answers/batch/",
+        views.submit_answers_batch,
+        name="submit-answers-batch",
+    ),
     # Optional legacy endpoint: whole-attempt submit in one go
     path(
         "attempts/<uuid:attempt_id>/submit-all/",
@@ -126,8 +136,13 @@ urlpatterns = [
         views.manager_dashboard,
         name="manager-dashboard",
     ),
+    path(
+        "manager/xp-history/",
+        views.manager_xp_history,
+        name="manager-xp-history",
+    ),
 
-    # (We’ll wire /manager/badges/ & /me/badges/ once the views are in place)
+    # (We’ll wire /manager/badges/ once the view is in place)
 
     # -------------------------------------------------------------------------
     # Leaderboards & CSV exports
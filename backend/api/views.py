@@ -3,15 +3,22 @@
 # 1) Core imports
 # -----------------------------------------------------------------------------
 import random
+import uuid
 import csv
 import io
+import time
 from datetime import timedelta
+
+from asgiref.sync import sync_to_async
 # -----------------------------------------------------------------------------
 # 2) App model imports Question, Choice
 # -----------------------------------------------------------------------------
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
 from django.db import models
 from django.db.models import Sum, Q, Exists, OuterRef, IntegerField, Value, Avg, Count
+from django.db.models.functions import Coalesce, TruncDate
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema    #, OpenApiParameter
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework import viewsets, status
@@ -37,6 +44,11 @@ from learning.models import (
     UserBadge,
     XPEvent,
 )
+from learning import answers as answer_log, question_bank
+from learning.analytics import module_item_stats, module_summary
+from learning.attempt_session import AttemptSession, forget as forget_attempt_sessions
+from learning.levels import level_for, levels_for, progress_for
+from learning import events as live_events, streaks, xp_history
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -50,6 +62,10 @@ from sops.models import SOP, SOPView
 # -----------------------------------------------------------------------------
 # 4) Permissions
 # -----------------------------------------------------------------------------
+from .async_views import aget_object_or_404, async_api_view
+from .fast_serializers import FastListMixin, ModuleAttemptMeFast, UserBadgeFast, XPEventFast
+from .pagination import KeysetPagination
+from .renderers import EventStreamRenderer, ORJSONRenderer
 from .permissions import IsManagerForWrites, IsManagerOnly
 
 # -----------------------------------------------------------------------------
@@ -57,6 +73,8 @@ from .permissions import IsManagerForWrites, IsManagerOnly
 # -----------------------------------------------------------------------------
 from .serializers import (
     BadgeSerializer,
+    BatchAnswerRequestSerializer,
+    BatchAnswerResponseSerializer,
     DepartmentSerializer,
     JobRoleSerializer,
     LeaderboardEntrySerializer,
@@ -92,6 +110,8 @@ from .serializers import (
     UserSerializer,
     WhoAmISerializer,
     XPEventSerializer,
+    XPHistoryQuerySerializer,
+    XPHistorySerializer,
 )
 
 @api_view(["GET"])
@@ -308,34 +328,28 @@ class ModuleViewSet(viewsets.ModelViewSet):
         - timestamps for last attempt / last pass
         """
         module = self.get_object()
-        qs = ModuleAttempt.objects.filter(module=module)
-
-        total_attempts = qs.count()
-        unique_users = qs.values("user_id").distinct().count()
-        pass_count = qs.filter(passed=True).count()
-        agg = qs.aggregate(avg_score=Avg("score"))
-
-        last_attempt = qs.order_by("-created_at").values_list("created_at", flat=True).first()
-        last_pass = (
-            qs.filter(passed=True)
-            .order_by("-completed_at")
-            .values_list("completed_at", flat=True)
-            .first()
-        )
-
-        pass_rate = float(round(pass_count * 100.0 / total_attempts, 1)) if total_attempts else 0.0
-        avg_score = float(round(agg["avg_score"] or 0.0, 1))
+        payload = {"module_id": str(module.id), "title": module.title, **module_summary(module)}
+        return Response(payload)
 
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path="analytics",
+        permission_classes=[IsManagerOnly],
+    )
+    def analytics(self, request, pk=None):
+        """
+        Item analysis for a module's questions: p-value, point-biserial
+        discrimination, distractor selection rates, median time and change
+        rate. Reads the precomputed QuestionStats rows; attempts completed
+        since the last `rollup_question_stats` run are reported as pending.
+        """
+        module = self.get_object()
         payload = {
             "module_id": str(module.id),
             "title": module.title,
-            "total_attempts": total_attempts,
-            "unique_users": unique_users,
-            "pass_count": pass_count,
-            "pass_rate": pass_rate,
-            "avg_score": avg_score,
-            "last_attempt": last_attempt,
-            "last_pass": last_pass,
+            **module_summary(module),
+            **module_item_stats(module),
         }
         return Response(payload)
 
@@ -364,6 +378,7 @@ class ModuleAttemptViewSet(viewsets.ModelViewSet):
     queryset = ModuleAttempt.objects.select_related("module", "user")
     serializer_class = ModuleAttemptSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
 @extend_schema(responses=AttemptReviewSerializer)
 @decorators.api_view(["GET"])
@@ -386,8 +401,8 @@ def review(request, attempt_id: str):
     module = attempt.module
 
     # Normalise answers so keys + choice IDs are strings
-    # attempt.answers is stored as {question_id: [choice_ids]}
-    raw_answers = attempt.answers or {}
+    # (log + legacy attempt.answers as {question_id: [choice_ids]})
+    raw_answers = answer_log.answers_for(attempt)
     answers_by_qid: dict[str, list[str]] = {}
     for qid, choice_ids in raw_answers.items():
         qid_str = str(qid)
@@ -456,21 +471,20 @@ class StartModuleAttemptView(APIView):
 class MyModuleAttemptsView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @extend_schema(responses=ModuleAttemptMeSerializer(many=True))
     def get(self, request, *args, **kwargs):
-        qs = (
-            ModuleAttempt.objects
-            .select_related("module", "module__skill", "module__sop")
-            .filter(user=request.user)
-            .order_by("-created_at")
-        )
-        serializer = ModuleAttemptMeSerializer(qs, many=True)
-        return Response(serializer.data)
+        qs = ModuleAttemptMeFast.values(ModuleAttempt.objects.filter(user=request.user))
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(qs, request, view=self)
+        return paginator.get_paginated_response(ModuleAttemptMeFast.from_rows(page))
     
 
-class XPEventViewSet(viewsets.ModelViewSet):
+class XPEventViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = XPEvent.objects.select_related("user", "skill", "org")
     serializer_class = XPEventSerializer
+    fast_serializer_class = XPEventFast
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
 
 class SupervisorSignoffViewSet(viewsets.ModelViewSet):
@@ -503,10 +517,13 @@ class BadgeViewSet(viewsets.ModelViewSet):
     permission_classes = [IsManagerForWrites]
 
 
-class UserBadgeViewSet(viewsets.ModelViewSet):
+class UserBadgeViewSet(FastListMixin, viewsets.ModelViewSet):
     queryset = UserBadge.objects.select_related("user", "badge")
     serializer_class = UserBadgeSerializer
+    fast_serializer_class = UserBadgeFast
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ("-awarded_at", "-id")
 
 
 class DepartmentViewSet(viewsets.ModelViewSet):
@@ -573,6 +590,9 @@ class MeOverdueSopsView(generics.ListAPIView):
     """
     serializer_class = RecertRequirementSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    # Earliest due first; due_day is never null for an overdue requirement
+    keyset_ordering = ("due_day", "id")
 
     def get_queryset(self):
         user = self.request.user
@@ -588,19 +608,19 @@ class MeOverdueSopsView(generics.ListAPIView):
             .filter(
                 Q(due_date__lt=today) | Q(due_at__lte=now)
             )
-            .order_by("due_date", "due_at")
+            .annotate(due_day=Coalesce("due_date", TruncDate("due_at")))
         )
 
 # -----------------------------------------------------------------------------
 # 6) SOP Media Heartbeat & Completion
 # -----------------------------------------------------------------------------
 @extend_schema(request=SOPViewSerializer, responses=SOPViewSerializer)
-@decorators.api_view(["POST"])
+@async_api_view(["POST"])
 @decorators.permission_classes([permissions.IsAuthenticated])
-def sop_view_heartbeat(request, sop_id):
+async def sop_view_heartbeat(request, sop_id):
     """Track video/pdf/presentation progress for a SOP."""
-    sop = get_object_or_404(SOP, id=sop_id)
-    view, _ = SOPView.objects.get_or_create(sop=sop, user=request.user)
+    sop = await aget_object_or_404(SOP, id=sop_id)
+    view, _ = await SOPView.objects.aget_or_create(sop=sop, user=request.user)
     data = request.data or {}
 
     seconds = int(data.get("seconds_viewed") or 0)
@@ -614,21 +634,19 @@ def sop_view_heartbeat(request, sop_id):
         view.pages_viewed = max(view.pages_viewed, pages)
     if progress:
         view.progress = max(view.progress, min(1.0, progress))
+    newly_completed = completed and not view.completed
     if completed:
         view.completed = True
 
-    view.save()
+    await view.asave()
+    if newly_completed:
+        await sync_to_async(streaks.record_activity)(request.user.id)
     return response.Response(SOPViewSerializer(view).data)
 
 
 # -----------------------------------------------------------------------------
 # 7) Gamified XP Progress / Leaderboards
 # -----------------------------------------------------------------------------
-def level_from_total_xp(xp: int) -> int:
-    """Example level curve — tweak as needed."""
-    return int((xp or 0) ** 0.5 // 10)
-
-
 def _org_xp_queryset(request):
     """
     Convenience helper: XPEvent queryset scoped to the current user's org.
@@ -640,6 +658,27 @@ def _org_xp_queryset(request):
     return qs
 
 
+def _leaderboard_page(request, qs):
+    """
+    One page of ranked rows from a values("user_id", "user__username")
+    queryset annotated with overall_xp (highest first, ranks continue
+    across pages).
+    """
+    paginator = KeysetPagination(ordering=("-overall_xp", "user_id"))
+    rows = paginator.paginate_queryset(qs, request)
+    results = []
+    levels = levels_for(r["overall_xp"] for r in rows)
+    for rank, (row, level) in enumerate(zip(rows, levels), start=paginator.position + 1):
+        results.append({
+            "rank": rank,
+            "user_id": row["user_id"],
+            "username": row["user__username"],
+            "overall_xp": row["overall_xp"] or 0,
+            "level": level,
+        })
+    return paginator.get_paginated_response(results)
+
+
 @extend_schema(responses=ProgressSerializer)
 @decorators.api_view(["GET"])
 @decorators.permission_classes([permissions.IsAuthenticated])
@@ -647,19 +686,16 @@ def my_progress(request):
     """Current user's XP and level summary."""
     user = request.user
     total_xp = XPEvent.objects.filter(user=user).aggregate(s=Sum("amount"))["s"] or 0
-    overall_level = level_from_total_xp(total_xp)
-    next_level = overall_level + 1
-    xp_next = (next_level * 10) ** 2
-    xp_to_next = xp_next - total_xp
+    progress = progress_for(total_xp)
 
     skills = XPEvent.objects.filter(user=user).values("skill_id", "skill__name").annotate(xp=Sum("amount"))
 
     skills_data = [{"skill_id": s["skill_id"], "skill_name": s["skill__name"], "xp": s["xp"]} for s in skills]
     payload = {
         "overall_xp": total_xp,
-        "overall_level": overall_level,
-        "next_level": next_level,
-        "xp_to_next": xp_to_next,
+        "overall_level": progress["level"],
+        "next_level": progress["next_level"],
+        "xp_to_next": progress["xp_to_next"],
         "skills": skills_data,
     }
     return response.Response(payload)
@@ -680,32 +716,22 @@ def my_badges(request):
     return response.Response(data)
 
 @extend_schema(responses=LeaderboardEntrySerializer(many=True))
-@decorators.api_view(["GET"])
+@async_api_view(["GET"])
 @decorators.permission_classes([permissions.IsAuthenticated])
-def leaderboard(request):
+async def leaderboard(request):
     """Simple org leaderboard by total XP (JSON)."""
     qs = (
         _org_xp_queryset(request)
         .values("user_id", "user__username")
         .annotate(overall_xp=Sum("amount"))
-        .order_by("-overall_xp")
     )
-
-    results = []
-    for rank, row in enumerate(qs, start=1):
-        results.append({
-            "rank": rank,
-            "user_id": row["user_id"],
-            "username": row["user__username"],
-            "overall_xp": row["overall_xp"] or 0,
-            "level": level_from_total_xp(row["overall_xp"]),
-        })
-    return response.Response(results)
+    # The paginator and the level table are sync-only
+    return await sync_to_async(_leaderboard_page)(request, qs)
 
 @extend_schema(responses=MyDashboardSerializer)
-@decorators.api_view(["GET"])
+@async_api_view(["GET"])
 @decorators.permission_classes([permissions.IsAuthenticated])
-def my_dashboard(request):
+async def my_dashboard(request):
     """
     Personal dashboard for the current user.
     Combines XP, level, attempt stats and overdue recertification info.
@@ -713,23 +739,22 @@ def my_dashboard(request):
     user = request.user
 
     # --- XP + level (same curve as my_progress) -----------------------------
-    total_xp = XPEvent.objects.filter(user=user).aggregate(s=Sum("amount"))["s"] or 0
-    overall_level = level_from_total_xp(total_xp)
-    next_level = overall_level + 1
-    xp_next = (next_level * 10) ** 2
-    xp_to_next = max(0, xp_next - total_xp)
-
-    # --- Attempts -----------------------------------------------------------
-    attempts_qs = ModuleAttempt.objects.filter(user=user)
-    attempts_total = attempts_qs.count()
-    attempts_passed = attempts_qs.filter(passed=True).count()
+    total_xp = (await XPEvent.objects.filter(user=user).aaggregate(s=Sum("amount")))["s"] or 0
+    progress = await sync_to_async(progress_for)(total_xp)
 
+    # --- Attempts (one query) -----------------------------------------------
     now = timezone.now()
     since_30 = now - timedelta(days=30)
-    attempts_last_30 = attempts_qs.filter(created_at__gte=since_30).count()
-
-    avg_score_val = attempts_qs.aggregate(avg=Avg("score"))["avg"] or 0.0
-    avg_score_val = float(round(avg_score_val, 1))
+    attempts = await ModuleAttempt.objects.filter(user=user).aaggregate(
+        total=Count("id"),
+        passed=Count("id", filter=Q(passed=True)),
+        last_30=Count("id", filter=Q(created_at__gte=since_30)),
+        avg=Avg("score"),
+    )
+    attempts_total = attempts["total"]
+    attempts_passed = attempts["passed"]
+    attempts_last_30 = attempts["last_30"]
+    avg_score_val = float(round(attempts["avg"] or 0.0, 1))
 
     # --- Overdue recert requirements ---------------------------------------
     today = timezone.localdate()
@@ -747,7 +772,7 @@ def my_dashboard(request):
     )
 
     overdue_recerts = []
-    for r in overdue_qs:
+    async for r in overdue_qs:
         overdue_recerts.append(
             {
                 "id": r.id,
@@ -761,9 +786,9 @@ def my_dashboard(request):
 
     payload = {
         "overall_xp": int(total_xp),
-        "overall_level": int(overall_level),
-        "next_level": int(next_level),
-        "xp_to_next": int(xp_to_next),
+        "overall_level": progress["level"],
+        "next_level": progress["next_level"],
+        "xp_to_next": progress["xp_to_next"],
         "attempts_total": int(attempts_total),
         "attempts_passed": int(attempts_passed),
         "attempts_last_30_days": int(attempts_last_30),
@@ -813,8 +838,8 @@ def attempt_review(request, attempt_id: str):
     questions = list(module.questions.prefetch_related("choices").all())
     q_map = {str(q.id): q for q in questions}
 
-    # answers is stored as {question_id: [choice_ids]}
-    answers = attempt.answers or {}
+    # answers as {question_id: [choice_ids]}
+    answers = answer_log.answers_for(attempt)
 
     review_questions = []
     for qid, q in q_map.items():
@@ -864,7 +889,7 @@ def _get_next_unanswered_question(attempt: ModuleAttempt):
     Returns (Question or None, remaining_count, total_count) based on
     presented_questions and existing ModuleAttemptQuestion rows.
     """
-    presented_ids = [str(qid) for qid in (attempt.presented_questions or [])]
+    presented_ids, _ = question_bank.presented_order(attempt)
     total = len(presented_ids)
     if total == 0:
         return None, 0, 0
@@ -931,14 +956,14 @@ def leaderboard_csv(request):
     writer = csv.writer(resp)
     writer.writerow(["rank", "user_id", "username", "overall_xp", "level"])
 
-    for rank, row in enumerate(qs, start=1):
-        xp = row["overall_xp"] or 0
+    rows = list(qs)
+    for rank, (row, level) in enumerate(zip(rows, levels_for(r["overall_xp"] for r in rows)), start=1):
         writer.writerow([
             rank,
             row["user_id"],
             row["user__username"],
-            xp,
-            level_from_total_xp(xp),
+            row["overall_xp"] or 0,
+            level,
         ])
 
     return resp
@@ -1015,20 +1040,8 @@ def skill_leaderboard(request, skill_id):
         .filter(skill_id=skill_id)
         .values("user_id", "user__username")
         .annotate(overall_xp=Sum("amount"))
-        .order_by("-overall_xp")
     )
-
-    results = []
-    for rank, row in enumerate(qs, start=1):
-        xp = row["overall_xp"] or 0
-        results.append({
-            "rank": rank,
-            "user_id": row["user_id"],
-            "username": row["user__username"],
-            "overall_xp": xp,
-            "level": level_from_total_xp(xp),
-        })
-    return response.Response(results)
+    return _leaderboard_page(request, qs)
 
 # --- Role Leaderboard ------------------------------------------------------
 
@@ -1053,20 +1066,8 @@ def role_leaderboard(request, role_id):
         .filter(user_id__in=user_ids)
         .values("user_id", "user__username")
         .annotate(overall_xp=Sum("amount"))
-        .order_by("-overall_xp")
     )
-
-    results = []
-    for rank, row in enumerate(qs, start=1):
-        xp = row["overall_xp"] or 0
-        results.append({
-            "rank": rank,
-            "user_id": row["user_id"],
-            "username": row["user__username"],
-            "overall_xp": xp,
-            "level": level_from_total_xp(xp),
-        })
-    return response.Response(results)
+    return _leaderboard_page(request, qs)
 
 # --- Group (Department/Team) Leaderboard -----------------------------------
 
@@ -1103,7 +1104,7 @@ def org_leaderboard_by_group(request):
             "department_id": str(getattr(t.department, "id", "")) if t.department_id else None,
             "department_name": getattr(t.department, "name", None),
             "overall_xp": total,
-            "level": level_from_total_xp(total),
+            "level": level_for(total),
         })
 
     # Department XP = sum of its teams (or members)
@@ -1120,10 +1121,9 @@ def org_leaderboard_by_group(request):
                 "overall_xp": 0,
             }
         dept_map[did]["overall_xp"] += tp["overall_xp"]
-    dept_payload = []
-    for did, d in dept_map.items():
-        d["level"] = level_from_total_xp(d["overall_xp"])
-        dept_payload.append(d)
+    dept_payload = list(dept_map.values())
+    for d, level in zip(dept_payload, levels_for(d["overall_xp"] for d in dept_payload)):
+        d["level"] = level
 
     # Order both by xp desc
     team_payload.sort(key=lambda x: x["overall_xp"], reverse=True)
@@ -1137,9 +1137,9 @@ def org_leaderboard_by_group(request):
 # 9) WhoAmI endpoint for Swagger banner / UI
 # -----------------------------------------------------------------------------
 @extend_schema(responses=WhoAmISerializer)
-@decorators.api_view(["GET"])
+@async_api_view(["GET"])
 @decorators.permission_classes([permissions.IsAuthenticated])
-def whoami(request):
+async def whoami(request):
     """Return logged-in user's username and biz_role."""
     return response.Response(
         {
@@ -1148,6 +1148,84 @@ def whoami(request):
         }
     )
 
+
+# -----------------------------------------------------------------------------
+# 10) Live XP / rank / badge event stream (Server-Sent Events)
+# -----------------------------------------------------------------------------
+def _sse(event) -> bytes:
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (
+        event["id"], event["type"].encode(), ORJSONRenderer().render(event["data"]),
+    )
+
+
+def _stream_preamble(channels):
+    yield b"retry: %d\n\n" % (getattr(settings, "LIVE_EVENTS_RETRY", 5) * 1000)
+    cursor = live_events.broker().last_event_id(channels)
+    yield _sse({"id": cursor, "type": "ready", "data": {"channels": channels}})
+
+
+async def _event_stream(channels, last_event_id):
+    sub = live_events.broker().subscribe(channels, last_event_id)
+    try:
+        for chunk in _stream_preamble(channels):
+            yield chunk
+        for event in sub.pending():
+            yield _sse(event)
+        keepalive = getattr(settings, "LIVE_EVENTS_KEEPALIVE", 15)
+        deadline = time.monotonic() + getattr(settings, "LIVE_EVENTS_MAX_AGE", 300)
+        while (remaining := deadline - time.monotonic()) > 0:
+            event = await sub.get(min(keepalive, remaining))
+            yield _sse(event) if event else b": keepalive\n\n"
+    finally:
+        sub.close()
+
+
+def _missed_events(channels, last_event_id):
+    # WSGI: can't hold a worker open, so send what was missed and end
+    yield from _stream_preamble(channels)
+    if last_event_id is not None:
+        for event in live_events.broker().replay(channels, last_event_id):
+            yield _sse(event)
+
+
+@extend_schema(
+    responses={(200, "text/event-stream"): OpenApiTypes.STR},
+    description=(
+        "Server-Sent Events: xp and rank deltas for the user's org, badge awards for the user "
+        "(see learning.events). Send Last-Event-ID to resume; a resync event means re-fetch."
+    ),
+)
+@async_api_view(["GET"])
+@decorators.permission_classes([permissions.IsAuthenticated])
+@decorators.renderer_classes([ORJSONRenderer, EventStreamRenderer])
+async def event_stream(request):
+    """
+    Live updates for the leaderboard and badge pages.
+
+    The connection is closed after LIVE_EVENTS_MAX_AGE seconds and the client
+    reconnects with Last-Event-ID, so a dead connection is never held for
+    long. Under WSGI a worker can't be held open at all: the stream sends
+    what the client missed and ends, and the client's reconnects turn it
+    into polling of the event buffer.
+    """
+    user = request.user
+    channels = [live_events.user_channel(user.pk)]
+    if user.org_id:
+        channels.append(live_events.org_channel(user.org_id))
+    try:
+        last_event_id = int(request.headers.get("Last-Event-ID") or request.query_params.get("last_event_id"))
+    except (TypeError, ValueError):
+        last_event_id = None
+    if "wsgi.version" in request.META:
+        stream = _missed_events(channels, last_event_id)
+    else:
+        stream = _event_stream(channels, last_event_id)
+    return StreamingHttpResponse(
+        stream,
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @extend_schema(
     responses=RecertRequirementSerializer(many=True),
     description="List recert requirements for the current user that are overdue (due_at < now)."
@@ -1199,50 +1277,36 @@ def _start_module_attempt_core(request, module: Module):
         if not viewed_ok:
             raise PermissionDenied("Please view the SOP media before starting the quiz.")
 
-    # Load questions + choices
-    qs = list(module.questions.prefetch_related("choices").all())
-
-    # Pool selection
-    if module.question_pool_count and module.question_pool_count < len(qs):
-        qs = random.sample(qs, k=module.question_pool_count)
-
-    # Shuffle questions
-    if module.shuffle_questions:
-        random.shuffle(qs)
-
-    # Build deterministic choice order per question
-    choice_order = {}
-    for q in qs:
-        choices = list(q.choices.all())
-        if module.shuffle_choices:
-            random.shuffle(choices)
-        choice_order[str(q.id)] = [str(c.id) for c in choices]
-
-    # Create attempt
-    attempt = ModuleAttempt.objects.create(
-        user=request.user,
-        module=module,
-        answers={},
-        presented_questions=[str(q.id) for q in qs],
-        choice_order=choice_order,
-    )
+    # Pre-serialised questions (cached per content version); pick + shuffle by index
+    bank = question_bank.get_bank(module)
+    seed = question_bank.new_seed() if question_bank.seeded_attempts_enabled() else None
+    rng = random.Random(seed) if seed is not None else None
+    public_questions = [
+        question_bank.public_question(bank, i, order) for i, order in question_bank.draw(bank, module, rng)
+    ]
 
-    # Serialize questions in the chosen order (without exposing is_correct)
-    public_questions = []
-    for q in qs:
-        ordered_ids = choice_order[str(q.id)]
-        all_choices = list(q.choices.all())
-        ordered_choices = [
-            c for cid in ordered_ids for c in all_choices if str(c.id) == cid
-        ]
-        # hint serializer to use the ordered choices
-        q._prefetched_objects_cache = {"choices": ordered_choices}
-        public_questions.append(q)
+    # Create attempt; seeded attempts regenerate this order from (seed, bank_version)
+    if seed is not None:
+        attempt = ModuleAttempt.objects.create(
+            user=request.user,
+            module=module,
+            answers={},
+            seed=seed,
+            bank_version=bank["version"],
+        )
+    else:
+        attempt = ModuleAttempt.objects.create(
+            user=request.user,
+            module=module,
+            answers={},
+            presented_questions=[q["id"] for q in public_questions],
+            choice_order={q["id"]: [c["id"] for c in q["choices"]] for q in public_questions},
+        )
 
     return {
         "attempt_id": str(attempt.id),
         "module_id": str(module.id),
-        "questions": QuestionPublicSerializer(public_questions, many=True).data,
+        "questions": public_questions,
     }
 
 
@@ -1268,10 +1332,19 @@ def start_module_attempt(request, module_id: str):
 @decorators.permission_classes([permissions.IsAuthenticated])
 def my_sop_views(request):
     """
-    Return SOPView records for the current user (per-SOP progress).
+    Return SOPView records for the current user (per-SOP progress),
+    most recently viewed first. ``?sop=<id>`` narrows it to one SOP.
     """
     qs = SOPView.objects.filter(user=request.user).select_related("sop")
-    return response.Response(SOPViewSerializer(qs, many=True).data)
+    sop_id = request.query_params.get("sop")
+    if sop_id:
+        try:
+            qs = qs.filter(sop_id=uuid.UUID(sop_id))
+        except ValueError:
+            raise ValidationError({"sop": "Must be a valid UUID."})
+    paginator = KeysetPagination(ordering=("-last_heartbeat", "-id"))
+    page = paginator.paginate_queryset(qs, request)
+    return paginator.get_paginated_response(SOPViewSerializer(page, many=True).data)
 # -------------------------------------------------------------------------
 # One-question-at-a-time quiz engine
 #   - /attempts/<attempt_id>/next/   [GET]
@@ -1294,38 +1367,26 @@ def my_sop_views(request):
     },
     description="Get the next unanswered question for this attempt (one-question-at-a-time engine).",
 )
-@decorators.api_view(["GET"])
+@async_api_view(["GET"])
 @decorators.permission_classes([permissions.IsAuthenticated])
-def next_question(request, attempt_id: str):
+async def next_question(request, attempt_id: str):
     try:
-        attempt = ModuleAttempt.objects.select_related("module").get(
-            id=attempt_id,
-            user=request.user,
-        )
+        session = await sync_to_async(AttemptSession.load)(attempt_id, request.user)
     except ModuleAttempt.DoesNotExist:
         raise ValidationError("Attempt not found.")
 
     # If attempt is already completed, signal done
-    presented_ids = [str(x) for x in (attempt.presented_questions or [])]
+    presented_ids = session.presented
     if not presented_ids:
         raise ValidationError("Attempt has no presented questions. Start again.")
 
-    answers = attempt.answers or {}
-    answered_ids = set(answers.keys())
-
-    next_qid = None
-    idx = None
-    for i, qid in enumerate(presented_ids, start=1):
-        if qid not in answered_ids:
-            next_qid = qid
-            idx = i
-            break
+    idx, next_qid = session.next_unanswered()
 
     if not next_qid:
         # Everything answered
         return response.Response(
             {
-                "attempt_id": str(attempt.id),
+                "attempt_id": session.attempt_id,
                 "done": True,
                 "index": len(presented_ids),
                 "total": len(presented_ids),
@@ -1333,28 +1394,20 @@ def next_question(request, attempt_id: str):
             }
         )
 
-    # Load that question with choices
-    module = attempt.module
-    q = module.questions.prefetch_related("choices").get(id=next_qid)
-
-    # Reorder choices according to choice_order
-    choice_order = (attempt.choice_order or {}).get(str(q.id)) or [
-        str(c.id) for c in q.choices.all()
-    ]
-    all_choices = list(q.choices.all())
-    ordered_choices = [
-        c for cid in choice_order for c in all_choices if str(c.id) == cid
-    ]
-    # Hint to DRF serializer
-    q._prefetched_objects_cache = {"choices": ordered_choices}
+    # Serve it from the module's question bank, in the attempt's choice order
+    bank = await sync_to_async(session.bank)()
+    q_index = bank["positions"].get(next_qid)
+    if q_index is None:
+        raise ValidationError("Question no longer exists in this module.")
+    order = question_bank.choice_order_from_ids(bank, q_index, session.choice_order[next_qid])
 
     return response.Response(
         {
-            "attempt_id": str(attempt.id),
+            "attempt_id": session.attempt_id,
             "done": False,
             "index": idx,
             "total": len(presented_ids),
-            "question": QuestionPublicSerializer(q).data,
+            "question": question_bank.public_question(bank, q_index, order),
         }
     )
 
@@ -1380,10 +1433,7 @@ def next_question(request, attempt_id: str):
 @decorators.permission_classes([permissions.IsAuthenticated])
 def submit_question(request, attempt_id: str):
     try:
-        attempt = ModuleAttempt.objects.select_related("module").get(
-            id=attempt_id,
-            user=request.user,
-        )
+        session = AttemptSession.load(attempt_id, request.user)
     except ModuleAttempt.DoesNotExist:
         raise ValidationError("Attempt not found.")
 
@@ -1392,69 +1442,23 @@ def submit_question(request, attempt_id: str):
     qid = str(serializer.validated_data["question_id"])
     chosen_ids = [str(cid) for cid in serializer.validated_data["choice_ids"]]
 
-    presented_ids = [str(x) for x in (attempt.presented_questions or [])]
-    if qid not in presented_ids:
+    if qid not in session.presented:
         raise ValidationError("Question is not part of this attempt.")
 
-    module = attempt.module
-    try:
-        q = module.questions.prefetch_related("choices").get(id=qid)
-    except module.questions.model.DoesNotExist:
+    bank = session.bank()
+    q_index = bank["positions"].get(qid)
+    if q_index is None:
         raise ValidationError("Question not found for this module.")
 
-    max_pts = float(q.points)
-
-    correct_ids = {str(c.id) for c in q.choices.filter(is_correct=True)}
-    wrong_ids = {str(c.id) for c in q.choices.filter(is_correct=False)}
-    chosen = set(chosen_ids)
-
-    earned = 0.0
-    correct_flag = False
-    msg = ""
-
-    if q.qtype in ("single", "truefalse"):
-        if len(chosen) == 1 and next(iter(chosen)) in correct_ids:
-            earned = max_pts
-            correct_flag = True
-        else:
-            earned = 0.0
-        msg = q.explanation or ("Correct." if correct_flag else "Incorrect.")
-    else:
-        # Multi-select with optional negative marking
-        total_correct = len(correct_ids)
-        sel_correct = len(chosen & correct_ids)
-        sel_wrong = len(chosen & wrong_ids)
-
-        if total_correct == 0:
-            earned = 0.0
-            correct_flag = False
-            msg = "No correct choices configured."
-        else:
-            fraction = sel_correct / total_correct
-            if module.negative_marking:
-                fraction -= sel_wrong / max(1, len(wrong_ids))
-            fraction = max(0.0, min(1.0, fraction))
-            earned = round(max_pts * fraction, 2)
-            correct_flag = fraction == 1.0 and sel_wrong == 0
-
-            if sel_wrong and module.negative_marking:
-                msg = "Some incorrect choices selected."
-            elif sel_correct < total_correct:
-                msg = "You missed some correct choices."
-            else:
-                msg = "Correct."
-            if q.explanation:
-                msg = f"{msg} {q.explanation}"
+    max_pts = float(bank["questions"][q_index]["points"])
+    earned, correct_flag, msg = question_bank.score_answer(bank, q_index, chosen_ids, session.negative_marking)
 
-    # Persist this answer on the attempt (but don't finish yet)
-    answers = attempt.answers or {}
-    answers[qid] = list(chosen_ids)
-    attempt.answers = answers
-    attempt.save(update_fields=["answers"])
+    # Persist this answer on the attempt (but don't finish yet): one log row
+    session.record(qid, chosen_ids)
 
     return response.Response(
         {
-            "attempt_id": str(attempt.id),
+            "attempt_id": session.attempt_id,
             "question_id": qid,
             "earned": earned,
             "max": max_pts,
@@ -1491,7 +1495,7 @@ def finish_attempt(request, attempt_id: str):
         raise ValidationError("Attempt not found.")
 
     module = attempt.module
-    presented_ids = [str(x) for x in (attempt.presented_questions or [])]
+    presented_ids, _ = question_bank.presented_order(attempt)
     if not presented_ids:
         raise ValidationError("Attempt has no presented questions. Start again.")
 
@@ -1618,7 +1622,7 @@ def submit_started_attempt(request, attempt_id: str):
     if isinstance(data.get("answers"), list):
         answers = data["answers"]
 
-        presented_ids = [str(x) for x in (attempt.presented_questions or [])]
+        presented_ids, _ = question_bank.presented_order(attempt)
         if not presented_ids:
             raise ValidationError("Attempt has no presented questions. Start again.")
 
@@ -1708,6 +1712,7 @@ def submit_started_attempt(request, attempt_id: str):
             qid: list(chosen_map.get(qid, set())) for qid in presented_ids
         }
         attempt.save()
+        forget_attempt_sessions([attempt.id])
 
         return response.Response(
             {
@@ -1734,7 +1739,7 @@ def submit_started_attempt(request, attempt_id: str):
     choice_ids = [str(cid) for cid in req.validated_data.get("choice_ids") or []]
     time_taken = float(req.validated_data.get("time_taken") or 0.0)
 
-    presented_ids = [str(x) for x in (attempt.presented_questions or [])]
+    presented_ids, _ = question_bank.presented_order(attempt)
     if qid_str not in presented_ids:
         raise ValidationError("Question not part of this attempt.")
 
@@ -1799,28 +1804,16 @@ def submit_started_attempt(request, attempt_id: str):
         },
     )
 
-    history = maq.selection_history or []
-    history.append(
-        {
-            "choice_ids": choice_ids,
-            "timestamp": timezone.now().isoformat(),
-            "time_taken": time_taken,
-        }
-    )
+    # Selection history lives in the answer log (see learning.answers.selection_history)
+    answer_log.record_answer(attempt, qid_str, choice_ids, time_taken)
+    forget_attempt_sessions([attempt.id])
 
-    maq.selection_history = history
     maq.final_choices = choice_ids
     maq.correct = correct_flag
     maq.points_awarded = earned
     maq.time_taken = (maq.time_taken or 0.0) + time_taken
-    maq.changed_answer = len(history) > 1
-    maq.save()
-
-    # Update attempt.answers for backwards compatibility
-    answers_map = attempt.answers or {}
-    answers_map[qid_str] = choice_ids
-    attempt.answers = answers_map
-    attempt.save(update_fields=["answers"])
+    maq.changed_answer = not created
+    maq.save(update_fields=["final_choices", "correct", "points_awarded", "time_taken", "changed_answer"])
 
     # Check if all questions answered
     presented_set = set(presented_ids)
@@ -1872,6 +1865,27 @@ def submit_started_attempt(request, attempt_id: str):
 
     return response.Response(resp_payload, status=status.HTTP_200_OK)
 
+
+@extend_schema(
+    request=BatchAnswerRequestSerializer,
+    responses=BatchAnswerResponseSerializer,
+    description=(
+        "Submit many answers at once (offline/kiosk clients replaying a session). "
+        "Items may span several of the user's attempts. Each item needs a client_ts; "
+        "replaying an item with the same attempt, question and client_ts is a no-op "
+        "reported as 'duplicate'. Attempts whose questions are all answered are completed."
+    ),
+)
+@decorators.api_view(["POST"])
+@decorators.permission_classes([permissions.IsAuthenticated])
+def submit_answers_batch(request):
+    req = BatchAnswerRequestSerializer(data=request.data)
+    req.is_valid(raise_exception=True)
+
+    results, attempts = answer_log.submit_batch(request.user, req.validated_data["items"])
+    forget_attempt_sessions(a["attempt_id"] for a in attempts)
+    return response.Response({"results": results, "attempts": attempts}, status=status.HTTP_200_OK)
+
 @extend_schema(
     responses={
         "200": {
@@ -1906,46 +1920,45 @@ def finish_attempt(request, attempt_id: str):
     """
     Finalise an attempt (if not already) and return a full feedback summary.
 
-    Uses ModuleAttemptQuestion for per-question scores and correctness.
+    Uses ModuleAttemptQuestion for per-question scores and correctness where
+    present, otherwise scores the logged answer against the question bank.
+    Answers are read from the answer log, not the cached session: the cached
+    copy can miss answers written concurrently or be evicted.
     """
     try:
-        attempt = ModuleAttempt.objects.select_related("module").get(
-            id=attempt_id, user=request.user
-        )
+        session = AttemptSession.load(attempt_id, request.user)
     except ModuleAttempt.DoesNotExist:
         raise ValidationError("Attempt not found.")
 
-    module = attempt.module
-    presented_ids = [str(x) for x in (attempt.presented_questions or [])]
+    presented_ids = session.presented
     if not presented_ids:
         raise ValidationError("Attempt has no presented questions.")
 
-    # Load questions with choices
-    questions = list(
-        module.questions.prefetch_related("choices").filter(id__in=presented_ids)
-    )
-    q_map = {str(q.id): q for q in questions}
+    bank = session.bank()
 
     # Map question_id -> ModuleAttemptQuestion
     from learning.models import ModuleAttemptQuestion
 
-    maq_qs = ModuleAttemptQuestion.objects.filter(attempt=attempt)
+    maq_qs = ModuleAttemptQuestion.objects.filter(attempt_id=session.attempt_id)
     maq_map = {str(aq.question_id): aq for aq in maq_qs}
 
+    attempt = ModuleAttempt.objects.select_related("module").get(id=session.attempt_id)
+    answers = answer_log.answers_for(attempt) if set(presented_ids) - maq_map.keys() else {}
+
     total_earned = 0.0
     total_max = 0.0
     feedback = []
 
     for qid in presented_ids:
-        q = q_map.get(qid)
-        if not q:
+        q_index = bank["positions"].get(qid)
+        if q_index is None:
             continue
 
-        max_pts = float(q.points)
+        max_pts = float(bank["questions"][q_index]["points"])
         total_max += max_pts
 
         aq = maq_map.get(qid)
-        if not aq:
+        if not aq and qid not in answers:
             # unanswered question
             feedback.append(
                 {
@@ -1958,37 +1971,16 @@ def finish_attempt(request, attempt_id: str):
             )
             continue
 
-        total_earned += aq.points_awarded
-        correct_flag = aq.correct
-        chosen = set(aq.final_choices or [])
-
-        correct_ids = {str(c.id) for c in q.choices.filter(is_correct=True)}
-        wrong_ids = {str(c.id) for c in q.choices.filter(is_correct=False)}
-
-        # Rebuild a human message, similar to old submit_started_attempt
-        if q.qtype in ("single", "truefalse"):
-            msg = q.explanation or ("Correct." if correct_flag else "Incorrect.")
-        else:
-            total_correct = len(correct_ids)
-            sel_correct = len(chosen & correct_ids)
-            sel_wrong = len(chosen & wrong_ids)
-
-            if total_correct == 0:
-                msg = "No correct choices configured."
-            else:
-                if sel_wrong and module.negative_marking:
-                    msg = "Some incorrect choices selected."
-                elif sel_correct < total_correct:
-                    msg = "You missed some correct choices."
-                else:
-                    msg = "Correct."
-                if q.explanation:
-                    msg = f"{msg} {q.explanation}"
+        chosen = aq.final_choices if aq else answers[qid]
+        earned, correct_flag, msg = question_bank.score_answer(bank, q_index, chosen or [], session.negative_marking)
+        if aq:
+            earned, correct_flag = aq.points_awarded, aq.correct
 
+        total_earned += earned
         feedback.append(
             {
                 "question_id": qid,
-                "earned": aq.points_awarded,
+                "earned": earned,
                 "max": max_pts,
                 "correct": correct_flag,
                 "message": msg,
@@ -1996,7 +1988,7 @@ def finish_attempt(request, attempt_id: str):
         )
 
     percent = int(round((total_earned / total_max) * 100)) if total_max > 0 else 0
-    passed = percent >= (module.pass_mark or module.passing_score)
+    passed = percent >= session.pass_mark
 
     # Finalise attempt if not already done
     if not attempt.completed_at:
@@ -2005,10 +1997,11 @@ def finish_attempt(request, attempt_id: str):
         attempt.completed_at = timezone.now()
         attempt.save(update_fields=["score", "passed", "completed_at"])
         # XP is still awarded by your existing post_save signal on ModuleAttempt
+    session.close()
 
     return response.Response(
         {
-            "attempt_id": str(attempt.id),
+            "attempt_id": session.attempt_id,
             "percent": percent,
             "passed": passed,
             "score": total_earned,
@@ -2067,6 +2060,58 @@ def manager_dashboard(request):
     ser = ManagerDashboardSerializer(payload)
     return response.Response(ser.data)
 
+
+# --- XP history (charts) ---------------------------------------------------
+
+def _xp_history_params(request):
+    params = XPHistoryQuerySerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    return params.validated_data
+
+
+def _xp_history_response(q, org_id, user_id):
+    """Shared body of the XP history endpoints, read from the XPRollup buckets."""
+    skill_id = q.get("skill")
+    buckets = xp_history.history(q["period"], q["start"], q["end"], org_id, user_id=user_id, skill_id=skill_id)
+    payload = {
+        "period": q["period"],
+        "start": q["start"],
+        "end": q["end"],
+        "user_id": user_id,
+        "skill_id": skill_id,
+        "total_xp": sum(b["xp"] for b in buckets),
+        "buckets": buckets,
+    }
+    return response.Response(XPHistorySerializer(payload).data)
+
+
+@extend_schema(parameters=[XPHistoryQuerySerializer], responses=XPHistorySerializer)
+@decorators.api_view(["GET"])
+@decorators.permission_classes([permissions.IsAuthenticated])
+def my_xp_history(request):
+    """
+    Current user's XP per day or week:
+      GET /api/me/xp-history/?period=week&start=2025-01-01&end=2025-03-31&skill=<id>
+    Defaults to the last 30 days (or 12 weeks). Empty buckets are included.
+    """
+    return _xp_history_response(_xp_history_params(request), request.user.org_id, request.user.id)
+
+
+@extend_schema(parameters=[XPHistoryQuerySerializer], responses=XPHistorySerializer)
+@decorators.api_view(["GET"])
+@decorators.permission_classes([IsManagerOnly])
+def manager_xp_history(request):
+    """
+    XP per day or week across the manager's org, or for one member with
+    ?user=<id>. Same parameters as /me/xp-history/.
+    """
+    q = _xp_history_params(request)
+    org_id = request.user.org_id
+    user_id = q.get("user")
+    if user_id:
+        user_id = get_object_or_404(User, id=user_id, org_id=org_id).id
+    return _xp_history_response(q, org_id, user_id)
+
 ##### Badges
 @extend_schema(
     description="Summary of badge rules in this org, including how many users hold each badge."
@@ -2123,14 +2168,10 @@ def my_badges(request):
     """
     Return all UserBadge records for the currently authenticated user.
     """
-    qs = (
-        UserBadge.objects
-        .filter(user=request.user)
-        .select_related("badge", "badge__skill", "badge__team", "badge__department")
-        .order_by("-awarded_at")
-    )
-    serializer = UserBadgeSerializer(qs, many=True)
-    return response.Response(serializer.data)
+    qs = UserBadgeFast.values(UserBadge.objects.filter(user=request.user))
+    paginator = KeysetPagination(ordering=("-awarded_at", "-id"))
+    page = paginator.paginate_queryset(qs, request)
+    return paginator.get_paginated_response(UserBadgeFast.from_rows(page))
 
     @extend_schema(
         responses=UserBadgeSerializer(many=True),
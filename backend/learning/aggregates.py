@@ -0,0 +1,274 @@
+# learning/aggregates.py
+"""
+Maintained XP counters for teams and departments.
+
+Group badge rules used to re-aggregate every member's XP on each XP event.
+Instead we keep one row per team / department and move it by delta:
+
+  - XP recorded for a user          -> + amount on each of their active teams
+                                       (and each distinct department)
+  - XPEvent deleted                 -> - amount, the same way (except where
+                                       the XP moves elsewhere: ``xp_moved``)
+  - membership activated / created  -> + user's XP on that team (department
+                                       only if it's their first team there)
+  - membership deactivated / deleted -> the reverse
+
+Teams also keep an active member count and, for every threshold used by a
+team_member_count_with_xp_at_least badge, how many members are at or above
+it. A member crossing a threshold bumps that one row (down again if a
+deletion takes them back under it).
+
+Inside a ``batching.batch()`` the XP deltas are applied when the batch ends,
+but membership changes and recomputes happen straight away and read XPEvent,
+which already has the queued XP. Those leave the queued amounts out
+(``user_org_xp(..., queued=False)``); the deltas add them when they run.
+
+Rows are created lazily with a full recompute, so a missing row is never
+wrong, just slower once. ``rebuild_group_xp_totals`` recomputes from scratch.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional
+
+from django.db.models import F, Q, Sum
+
+from . import batching
+from .models import (
+    Department,
+    DepartmentXPTotal,
+    Team,
+    TeamMember,
+    TeamXPThresholdCount,
+    TeamXPTotal,
+    XPEvent,
+)
+
+
+_moving = ContextVar("group_xp_moving", default=False)
+
+
+def user_org_xp(user_id, org_id, queued: bool = True) -> int:
+    """
+    Total XP a user has earned within one org; with ``queued=False``, less
+    what the current batch has yet to pass to ``record_xp``.
+    """
+    total = XPEvent.objects.filter(user_id=user_id, org_id=org_id).aggregate(s=Sum("amount"))["s"] or 0
+    if not queued:
+        total -= _queued_xp().get((user_id, org_id), 0)
+    return total
+
+
+def _queued_xp() -> Dict:
+    """(user_id, org_id) -> XP queued for ``record_xp`` in the current batch."""
+    return {args: amount for args, (amount,) in batching.pending(record_xp).items()}
+
+
+# ----------------------------------------------------------------------------
+# Delta updates
+# ----------------------------------------------------------------------------
+def record_xp(user_id, org_id, amount: int) -> None:
+    """
+    Apply an XP change to the user's team/department counters: a recorded
+    event's amount, or minus the amount of a deleted one.
+    """
+    if not amount:
+        return
+
+    rows = TeamMember.objects.filter(user_id=user_id, active=True, team__org_id=org_id).values_list(
+        "team_id", "team__department_id"
+    )
+    team_ids = set()
+    dept_ids = set()
+    for team_id, dept_id in rows:
+        team_ids.add(team_id)
+        if dept_id:
+            dept_ids.add(dept_id)
+
+    rebuilt = _bump(TeamXPTotal, "team_id", team_ids, total_xp=amount)
+    _bump(DepartmentXPTotal, "department_id", dept_ids, total_xp=amount)
+
+    # Members crossing a configured threshold with this change (downwards when it's negative)
+    thresholds = TeamXPThresholdCount.objects.filter(team_id__in=team_ids - rebuilt)
+    if team_ids - rebuilt and thresholds.exists():
+        new_total = user_org_xp(user_id, org_id)
+        low, high = sorted((new_total - amount, new_total))
+        thresholds.filter(threshold__gt=low, threshold__lte=high).update(
+            members_at_or_above=F("members_at_or_above") + (1 if amount > 0 else -1)
+        )
+
+
+def xp_moving() -> bool:
+    """Whether XPEvents deleted now are moving elsewhere (inside ``xp_moved``)."""
+    return _moving.get()
+
+
+@contextmanager
+def xp_moved():
+    """
+    XPEvents deleted inside this block leave the counters alone, because
+    their XP is recorded again elsewhere (the archive's opening balances).
+    """
+    token = _moving.set(True)
+    try:
+        yield
+    finally:
+        _moving.reset(token)
+
+
+def membership_changed(user_id, team_id, sign: int, exclude_pk=None) -> None:
+    """
+    Add (sign=+1) or remove (sign=-1) a user's XP from a team's counters.
+
+    ``exclude_pk`` is the TeamMember row being changed, so it isn't counted
+    when checking whether the user has another active team in the department.
+    """
+    team = Team.objects.filter(id=team_id).values("org_id", "department_id").first()
+    if team is None:
+        return  # team is being deleted
+    xp = user_org_xp(user_id, team["org_id"], queued=False)
+
+    if not _bump(TeamXPTotal, "team_id", {team_id}, create=sign > 0, total_xp=sign * xp, member_count=sign):
+        TeamXPThresholdCount.objects.filter(team_id=team_id, threshold__lte=xp).update(
+            members_at_or_above=F("members_at_or_above") + sign
+        )
+
+    dept_id = team["department_id"]
+    if xp and dept_id:
+        other_teams_in_dept = (
+            TeamMember.objects.filter(user_id=user_id, active=True, team__department_id=dept_id)
+            .exclude(pk=exclude_pk)
+            .exists()
+        )
+        if not other_teams_in_dept:
+            _bump(DepartmentXPTotal, "department_id", {dept_id}, create=sign > 0, total_xp=sign * xp)
+
+
+def ensure_threshold_counter(team_id, threshold: int) -> int:
+    """
+    Make sure a (team, threshold) counter exists and return its value.
+    Creating one scans the team's members once; after that it's kept by delta.
+    """
+    row = TeamXPThresholdCount.objects.filter(team_id=team_id, threshold=threshold).first()
+    if row is not None:
+        return row.members_at_or_above
+
+    team = Team.objects.filter(id=team_id).values("org_id").first()
+    if team is None:
+        return 0
+    member_ids = set(TeamMember.objects.filter(team_id=team_id, active=True).values_list("user_id", flat=True))
+    xp_by_user = dict(
+        XPEvent.objects.filter(org_id=team["org_id"], user_id__in=member_ids)
+        .values("user_id")
+        .annotate(total=Sum("amount"))
+        .values_list("user_id", "total")
+    )
+    at_least = sum(1 for uid in member_ids if (xp_by_user.get(uid) or 0) >= threshold)
+    TeamXPThresholdCount.objects.bulk_create(
+        [TeamXPThresholdCount(team_id=team_id, threshold=threshold, members_at_or_above=at_least)],
+        ignore_conflicts=True,
+    )
+    return at_least
+
+
+def _bump(model, field: str, ids: Iterable, create: bool = True, **deltas) -> set:
+    """
+    Apply ``deltas`` to the counter rows for ``ids``. Returns the ids whose
+    rows were missing and rebuilt from scratch instead (already up to date).
+    """
+    ids = set(ids)
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not ids or not deltas:
+        return set()
+    existing = set(model.objects.filter(**{f"{field}__in": ids}).values_list(field, flat=True))
+    if existing:
+        model.objects.filter(**{f"{field}__in": existing}).update(
+            **{name: F(name) + delta for name, delta in deltas.items()}
+        )
+
+    missing = ids - existing
+    if missing and create:
+        # Current state already includes this change, so recompute rather than apply the delta
+        if model is TeamXPTotal:
+            rebuild_group_xp_totals(team_ids=missing, dept_ids=())
+        else:
+            rebuild_group_xp_totals(team_ids=(), dept_ids=missing)
+        return missing
+    return set()
+
+
+# ----------------------------------------------------------------------------
+# Full recompute
+# ----------------------------------------------------------------------------
+def rebuild_group_xp_totals(team_ids: Optional[Iterable] = None, dept_ids: Optional[Iterable] = None) -> None:
+    """
+    Recompute team/department counters from XPEvent and active memberships.
+
+    With no arguments every counter is rebuilt; otherwise only the given
+    teams and departments are.
+    """
+    teams = Team.objects.all()
+    scoped = team_ids is not None or dept_ids is not None
+    if scoped:
+        team_ids = set(team_ids or ())
+        dept_ids = set(dept_ids or ())
+        teams = teams.filter(Q(id__in=team_ids) | Q(department_id__in=dept_ids))
+    team_rows = list(teams.values("id", "org_id", "department_id"))
+
+    members = TeamMember.objects.filter(active=True)
+    if scoped:
+        members = members.filter(team_id__in=[t["id"] for t in team_rows])
+    team_users: Dict = {}
+    for tid, uid in members.values_list("team_id", "user_id"):
+        team_users.setdefault(tid, set()).add(uid)
+
+    xp_qs = XPEvent.objects.all()
+    if scoped:
+        xp_qs = xp_qs.filter(user_id__in={uid for uids in team_users.values() for uid in uids})
+    queued = _queued_xp()
+    xp_by_user = {
+        (row["org_id"], row["user_id"]): (row["total"] or 0) - queued.get((row["user_id"], row["org_id"]), 0)
+        for row in xp_qs.values("org_id", "user_id").annotate(total=Sum("amount"))
+    }
+
+    team_totals = []
+    team_member_xp: Dict = {}
+    dept_users: Dict = {}
+    dept_org: Dict = {}
+    for team in team_rows:
+        uids = team_users.get(team["id"], set())
+        if not scoped or team["id"] in team_ids:
+            member_xp = [xp_by_user.get((team["org_id"], uid), 0) for uid in uids]
+            team_totals.append(TeamXPTotal(team_id=team["id"], total_xp=sum(member_xp), member_count=len(uids)))
+            team_member_xp[team["id"]] = member_xp
+        if team["department_id"]:
+            dept_users.setdefault(team["department_id"], set()).update(uids)
+            dept_org[team["department_id"]] = team["org_id"]
+
+    if not scoped:
+        dept_ids = set(Department.objects.values_list("id", flat=True))
+    dept_totals = [
+        DepartmentXPTotal(
+            department_id=did,
+            total_xp=sum(xp_by_user.get((dept_org[did], uid), 0) for uid in dept_users.get(did, ())),
+        )
+        for did in dept_ids
+    ]
+
+    for model, rows, key in (
+        (TeamXPTotal, team_totals, "team"),
+        (DepartmentXPTotal, dept_totals, "department"),
+    ):
+        model.objects.bulk_create(
+            rows,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=[key],
+            update_fields=["total_xp", "member_count"] if model is TeamXPTotal else ["total_xp"],
+        )
+
+    counters = list(TeamXPThresholdCount.objects.filter(team_id__in=list(team_member_xp)))
+    for counter in counters:
+        counter.members_at_or_above = sum(
+            1 for xp in team_member_xp[counter.team_id] if xp >= counter.threshold
+        )
+    TeamXPThresholdCount.objects.bulk_update(counters, ["members_at_or_above"], batch_size=500)
@@ -0,0 +1,275 @@
+# learning/analytics.py
+"""
+Item analysis for module questions.
+
+``rollup`` folds completed attempts that haven't been analysed yet into
+one ``QuestionStats`` row per question, a batch of attempts at a time:
+three reads for the batch (attempts, ModuleAttemptQuestion rows, answer
+log), per-question deltas summed in memory, then one bulk write. Each
+attempt is stamped ``analysed_at`` in the same transaction, so a rollup
+can be interrupted and rerun without counting anything twice.
+
+The rows hold running sums rather than results, so every statistic can be
+derived without rescanning attempts (``item_stats``):
+
+  - p-value           correct_count / responses
+  - discrimination    point-biserial between getting the question right
+                      and the attempt's percent score
+  - distractors       how often each choice was part of the final answer
+  - median time       from a per-second histogram (capped at TIME_CAP)
+  - change rate       share of responses where the answer was changed
+
+An answer comes from ModuleAttemptQuestion where the attempt has one for
+the question, otherwise from the answer log / legacy ``answers`` JSON,
+scored against the current question bank.
+"""
+import math
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Q
+from django.utils import timezone
+
+from .answers import decode_choices, served_choices
+from .models import AttemptAnswer, Module, ModuleAttempt, ModuleAttemptQuestion, Question, QuestionStats
+from .question_bank import get_bank, presented_order, score_answer
+
+BATCH_SIZE = 500
+TIME_CAP = 3600  # seconds; slower answers land in the last histogram bin
+
+
+def module_summary(module: Module) -> Dict:
+    """Attempt counts, pass rate and average score for a module (one query)."""
+    agg = ModuleAttempt.objects.filter(module=module).aggregate(
+        total_attempts=Count("id"),
+        unique_users=Count("user_id", distinct=True),
+        pass_count=Count("id", filter=Q(passed=True)),
+        avg_score=Avg("score"),
+        last_attempt=Max("created_at"),
+        last_pass=Max("completed_at", filter=Q(passed=True)),
+    )
+    total = agg["total_attempts"]
+    agg["pass_rate"] = float(round(agg["pass_count"] * 100.0 / total, 1)) if total else 0.0
+    agg["avg_score"] = float(round(agg["avg_score"] or 0.0, 1))
+    return agg
+
+
+# ----------------------------------------------------------------------------
+# Rollup
+# ----------------------------------------------------------------------------
+def pending_attempts(module_id=None):
+    qs = ModuleAttempt.objects.filter(completed_at__isnull=False, analysed_at__isnull=True)
+    return qs.filter(module_id=module_id) if module_id else qs
+
+
+def rollup(module_id=None, batch_size: int = BATCH_SIZE) -> int:
+    """Analyse every pending completed attempt; returns how many were folded in."""
+    total = 0
+    while True:
+        done = rollup_batch(module_id, batch_size)
+        total += done
+        if done < batch_size:
+            return total
+
+
+def rollup_batch(module_id=None, batch_size: int = BATCH_SIZE) -> int:
+    with transaction.atomic():
+        attempts = list(
+            pending_attempts(module_id)
+            .select_for_update(of=("self",))
+            .select_related("module")
+            .order_by("completed_at")[:batch_size]
+        )
+        if not attempts:
+            return 0
+
+        deltas: Dict[str, Dict] = {}
+        for attempt, qid, final, correct, time_taken, changed in _responses(attempts):
+            d = deltas.get(qid)
+            if d is None:
+                d = deltas[qid] = {
+                    "responses": 0, "correct_count": 0, "changed_count": 0,
+                    "score_sum": 0, "score_sq_sum": 0, "correct_score_sum": 0,
+                    "time": Counter(), "choices": Counter(),
+                }
+            score = attempt.score
+            d["responses"] += 1
+            d["score_sum"] += score
+            d["score_sq_sum"] += score * score
+            if correct:
+                d["correct_count"] += 1
+                d["correct_score_sum"] += score
+            if changed:
+                d["changed_count"] += 1
+            d["time"][min(int(time_taken or 0), TIME_CAP)] += 1
+            d["choices"].update(str(cid) for cid in set(final))
+
+        _apply(deltas)
+        ModuleAttempt.objects.filter(id__in=[a.id for a in attempts]).update(analysed_at=timezone.now())
+    return len(attempts)
+
+
+def _responses(attempts: List[ModuleAttempt]) -> Iterable:
+    """``(attempt, question id, final choice ids, correct, time taken, changed)`` per answered question."""
+    by_id = {a.id: a for a in attempts}
+    seen = set()
+    for aid, qid, final, correct, time_taken, changed in ModuleAttemptQuestion.objects.filter(
+        attempt_id__in=by_id
+    ).values_list("attempt_id", "question_id", "final_choices", "correct", "time_taken", "changed_answer"):
+        seen.add((aid, str(qid)))
+        yield by_id[aid], str(qid), final or [], correct, time_taken, changed
+
+    # Answers submitted through the log (or the legacy JSON) without a MAQ row
+    logged: Dict = {}
+    for aid, position, mask, time_taken in AttemptAnswer.objects.filter(attempt_id__in=by_id).values_list(
+        "attempt_id", "position", "choices", "time_taken"
+    ):
+        prev = logged.get((aid, position))
+        logged[(aid, position)] = (mask, (prev[1] if prev else 0.0) + time_taken, (prev[2] if prev else 0) + 1)
+
+    per_attempt: Dict = {}
+    for (aid, position), entry in logged.items():
+        per_attempt.setdefault(aid, {})[position] = entry
+
+    for attempt in attempts:
+        log = per_attempt.get(attempt.id, {})
+        legacy = attempt.answers or {}
+        if not log and not legacy:
+            continue
+        presented, choice_order = presented_order(attempt)
+        answers = {str(qid): ([str(c) for c in cids or []], 0.0, 1) for qid, cids in legacy.items()}
+        for position, (mask, time_taken, count) in log.items():
+            if position < len(presented):
+                qid = presented[position]
+                answers[qid] = (decode_choices(served_choices(attempt, choice_order, qid), mask), time_taken, count)
+
+        bank = get_bank(attempt.module)
+        for qid, (final, time_taken, count) in answers.items():
+            index = bank["positions"].get(qid)
+            if index is None or (attempt.id, qid) in seen:
+                continue
+            _, correct, _ = score_answer(bank, index, final, attempt.module.negative_marking)
+            yield attempt, qid, final, correct, time_taken, count > 1
+
+
+def _apply(deltas: Dict[str, Dict]) -> None:
+    modules = dict(Question.objects.filter(id__in=deltas).values_list("id", "module_id"))
+    existing = {
+        str(row.question_id): row
+        for row in QuestionStats.objects.select_for_update().filter(question_id__in=modules)
+    }
+    now = timezone.now()
+    to_create, to_update = [], []
+    for question_id, module_id in modules.items():
+        qid = str(question_id)
+        d = deltas[qid]
+        row = existing.get(qid)
+        if row is None:
+            row = QuestionStats(question_id=question_id, module_id=module_id)
+            to_create.append(row)
+        else:
+            to_update.append(row)
+        for field in ("responses", "correct_count", "changed_count", "score_sum", "score_sq_sum", "correct_score_sum"):
+            setattr(row, field, getattr(row, field) + d[field])
+        row.time_histogram = _merge(row.time_histogram, d["time"])
+        row.choice_counts = _merge(row.choice_counts, d["choices"])
+        row.updated_at = now  # bulk_update skips auto_now
+
+    QuestionStats.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+    QuestionStats.objects.bulk_update(
+        to_update,
+        ["responses", "correct_count", "changed_count", "score_sum", "score_sq_sum", "correct_score_sum",
+         "time_histogram", "choice_counts", "updated_at"],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def _merge(stored: Dict, delta: Counter) -> Dict:
+    merged = Counter({k: v for k, v in (stored or {}).items()})
+    for key, count in delta.items():
+        merged[str(key)] += count
+    return dict(merged)
+
+
+def rebuild(module_id=None, batch_size: int = BATCH_SIZE) -> int:
+    """Drop the stored stats (for one module or all) and analyse every completed attempt again."""
+    with transaction.atomic():
+        stats = QuestionStats.objects.all()
+        attempts = ModuleAttempt.objects.filter(analysed_at__isnull=False)
+        if module_id:
+            stats, attempts = stats.filter(module_id=module_id), attempts.filter(module_id=module_id)
+        stats.delete()
+        attempts.update(analysed_at=None)
+    return rollup(module_id, batch_size)
+
+
+# ----------------------------------------------------------------------------
+# Reading
+# ----------------------------------------------------------------------------
+def point_biserial(row: QuestionStats) -> Optional[float]:
+    n, n1 = row.responses, row.correct_count
+    n0 = n - n1
+    if not n1 or not n0:
+        return None
+    mean = row.score_sum / n
+    variance = row.score_sq_sum / n - mean * mean
+    if variance <= 0:
+        return None
+    mean_correct = row.correct_score_sum / n1
+    mean_wrong = (row.score_sum - row.correct_score_sum) / n0
+    return (mean_correct - mean_wrong) / math.sqrt(variance) * math.sqrt(n1 * n0 / (n * n))
+
+
+def median_time(histogram: Dict) -> Optional[int]:
+    bins = sorted((int(k), v) for k, v in (histogram or {}).items())
+    n = sum(v for _, v in bins)
+    if not n:
+        return None
+    seen = 0
+    for seconds, count in bins:
+        seen += count
+        if seen * 2 >= n:
+            return seconds
+    return bins[-1][0]
+
+
+def item_stats(bank_question: Dict, correct_flags: List[bool], row: Optional[QuestionStats]) -> Dict:
+    """Derived statistics for one question in the bank shape (zeros before any responses)."""
+    n = row.responses if row else 0
+    counts = row.choice_counts if row else {}
+    r = point_biserial(row) if row else None
+    return {
+        "question_id": bank_question["id"],
+        "text": bank_question["text"],
+        "qtype": bank_question["qtype"],
+        "responses": n,
+        "p_value": round(row.correct_count / n, 3) if n else None,
+        "discrimination": round(r, 3) if r is not None else None,
+        "median_time": median_time(row.time_histogram) if row else None,
+        "change_rate": round(row.changed_count / n, 3) if n else None,
+        "choices": [
+            {
+                "choice_id": c["id"],
+                "text": c["text"],
+                "is_correct": ok,
+                "selected": counts.get(c["id"], 0),
+                "rate": round(counts.get(c["id"], 0) / n, 3) if n else None,
+            }
+            for c, ok in zip(bank_question["choices"], correct_flags)
+        ],
+    }
+
+
+def module_item_stats(module: Module) -> Dict:
+    """Per-question analysis for a module, in question order, from the stored rows."""
+    bank = get_bank(module)
+    rows = {str(r.question_id): r for r in QuestionStats.objects.filter(module=module)}
+    return {
+        "analysed_attempts": ModuleAttempt.objects.filter(module=module, analysed_at__isnull=False).count(),
+        "pending_attempts": pending_attempts(module.id).count(),
+        "updated_at": max((r.updated_at for r in rows.values()), default=None),
+        "questions": [
+            item_stats(q, bank["correct"][i], rows.get(q["id"])) for i, q in enumerate(bank["questions"])
+        ],
+    }
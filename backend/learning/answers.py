@@ -0,0 +1,253 @@
+# learning/answers.py
+"""
+Compact answer storage for module attempts.
+
+Each submit appends one ``AttemptAnswer`` row: the question's position in
+the attempt's presented order and a bitmask of the chosen choices (bit j =
+j-th choice as served, so up to 63 choices per question). Nothing is
+rewritten on submit.
+
+The legacy ``{question_id: [choice_id, ...]}`` shape is only built when
+read (``answers_for``), the last submit per question winning and falling
+back to ``ModuleAttempt.answers`` for attempts stored before the log
+existed (or submitted all at once).
+
+``submit_batch`` takes many answers at once (offline kiosks replaying a
+session): one transaction, one bulk insert, ModuleAttemptQuestion rows
+recomputed from the log so a replayed batch changes nothing.
+"""
+from typing import Dict, Iterable, List, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AttemptAnswer, ModuleAttempt, ModuleAttemptQuestion
+from .question_bank import get_bank, presented_order, score_answer
+
+MAX_CHOICES = 63
+
+
+def encode_choices(served_ids: List[str], chosen_ids: Iterable[str]) -> int:
+    """Bitmask of ``chosen_ids`` against the served choice order; unknown ids are dropped."""
+    positions = {cid: j for j, cid in enumerate(served_ids)}
+    mask = 0
+    for cid in chosen_ids:
+        j = positions.get(str(cid))
+        if j is not None:
+            if j >= MAX_CHOICES:
+                raise ValueError(f"Questions support at most {MAX_CHOICES} choices.")
+            mask |= 1 << j
+    return mask
+
+
+def decode_choices(served_ids: List[str], mask: int) -> List[str]:
+    return [cid for j, cid in enumerate(served_ids) if mask >> j & 1]
+
+
+def served_choices(attempt: ModuleAttempt, choice_order: Dict, qid: str) -> List[str]:
+    """Choice ids as served; attempts without a stored order saw the bank order."""
+    served = choice_order.get(qid)
+    if served is None:
+        bank = get_bank(attempt.module)
+        i = bank["positions"].get(qid)
+        served = [c["id"] for c in bank["questions"][i]["choices"]] if i is not None else []
+    return served
+
+
+def record_answer(attempt: ModuleAttempt, question_id, choice_ids: Iterable[str], time_taken: float = 0.0) -> AttemptAnswer:
+    """Append one answer to the attempt's log (a single INSERT)."""
+    presented, choice_order = presented_order(attempt)
+    qid = str(question_id)
+    return AttemptAnswer.objects.create(
+        attempt=attempt,
+        position=presented.index(qid),
+        choices=encode_choices(served_choices(attempt, choice_order, qid), choice_ids),
+        time_taken=time_taken or 0.0,
+    )
+
+
+def answers_for(attempt: ModuleAttempt) -> Dict[str, List[str]]:
+    """The attempt's answers in the legacy ``{question_id: [choice_ids]}`` shape."""
+    answers = {str(qid): [str(c) for c in (cids or [])] for qid, cids in (attempt.answers or {}).items()}
+    log = list(AttemptAnswer.objects.filter(attempt=attempt).values_list("position", "choices"))
+    if not log:
+        return answers
+    presented, choice_order = presented_order(attempt)
+    for position, mask in log:  # ordered by id: the last submit wins
+        qid = presented[position]
+        answers[qid] = decode_choices(served_choices(attempt, choice_order, qid), mask)
+    return answers
+
+
+def selection_history(maq: ModuleAttemptQuestion) -> List[Dict]:
+    """Every submit for one attempt question, oldest first (legacy JSON history included)."""
+    attempt = maq.attempt
+    presented, choice_order = presented_order(attempt)
+    qid = str(maq.question_id)
+    served = served_choices(attempt, choice_order, qid)
+    history = list(maq.selection_history or [])
+    if qid in presented:
+        for mask, created_at, time_taken in AttemptAnswer.objects.filter(
+            attempt=attempt, position=presented.index(qid)
+        ).values_list("choices", "created_at", "time_taken"):
+            history.append(
+                {"choice_ids": decode_choices(served, mask), "timestamp": created_at.isoformat(), "time_taken": time_taken}
+            )
+    return history
+
+
+# ----------------------------------------------------------------------------
+# Batch submit
+# ----------------------------------------------------------------------------
+def include_feedback(feedback_mode: str, qtype: str) -> bool:
+    """Whether per-question feedback is shown under a module's feedback_mode."""
+    mode = feedback_mode or "end"
+    return mode == "immediate" or (mode == "mixed" and qtype in ("single", "truefalse"))
+
+
+def submit_batch(user, items: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Record and score many answers for ``user``'s attempts.
+
+    ``items`` are dicts with attempt_id, question_id, choice_ids, time_taken
+    and client_ts. Answers already logged with the same (attempt, question,
+    client_ts) are reported as duplicates and not stored again; other
+    answers to a completed attempt are errors. Returns
+    ``(per-item results in input order, per-attempt summaries)``.
+    """
+    results: List[Dict] = [{} for _ in items]
+    with transaction.atomic():
+        attempts = {
+            a.id: a
+            for a in ModuleAttempt.objects.select_for_update(of=("self",))
+            .select_related("module")
+            .filter(id__in={item["attempt_id"] for item in items}, user=user)
+        }
+        existing = set(
+            AttemptAnswer.objects.filter(
+                attempt_id__in=attempts, client_ts__in={item["client_ts"] for item in items}
+            ).values_list("attempt_id", "position", "client_ts")
+        )
+
+        orders = {aid: presented_order(a) for aid, a in attempts.items()}
+        banks = {a.module_id: get_bank(a.module) for a in attempts.values()}
+        new_rows = []
+        touched: Dict = {}  # attempt_id -> positions with new answers
+
+        # Oldest first, so log order (and "last answer wins") follows the client's clock
+        for n, item in sorted(enumerate(items), key=lambda pair: pair[1]["client_ts"]):
+            qid = str(item["question_id"])
+            result = {"index": n, "attempt_id": str(item["attempt_id"]), "question_id": qid}
+            results[n] = result
+            attempt = attempts.get(item["attempt_id"])
+            if attempt is None:
+                result.update(status="error", error="Attempt not found.")
+                continue
+            presented, choice_order = orders[attempt.id]
+            bank = banks[attempt.module_id]
+            if qid not in presented or qid not in bank["positions"]:
+                result.update(status="error", error="Question not part of this attempt.")
+                continue
+
+            position = presented.index(qid)
+            key = (attempt.id, position, item["client_ts"])
+            served = served_choices(attempt, choice_order, qid)
+            try:
+                mask = encode_choices(served, item["choice_ids"])
+            except ValueError as exc:
+                result.update(status="error", error=str(exc))
+                continue
+
+            if key in existing:
+                result["status"] = "duplicate"
+            elif attempt.completed_at:
+                # Scored already: a new answer would leave score/passed/XP out of step with it
+                result.update(status="error", error="Attempt already completed.")
+                continue
+            else:
+                existing.add(key)
+                result["status"] = "recorded"
+                touched.setdefault(attempt.id, set()).add(position)
+                new_rows.append(
+                    AttemptAnswer(
+                        attempt=attempt,
+                        position=position,
+                        choices=mask,
+                        time_taken=item.get("time_taken") or 0.0,
+                        client_ts=item["client_ts"],
+                    )
+                )
+
+            index = bank["positions"][qid]
+            if include_feedback(attempt.module.feedback_mode, bank["questions"][index]["qtype"]):
+                earned, correct, msg = score_answer(bank, index, item["choice_ids"], attempt.module.negative_marking)
+                result.update(correct=correct, earned=earned, max_points=float(bank["questions"][index]["points"]), message=msg)
+
+        AttemptAnswer.objects.bulk_create(new_rows, batch_size=500, ignore_conflicts=True)
+        _sync_attempt_questions({aid: attempts[aid] for aid in touched}, touched, orders, banks)
+
+        summaries = [_finish_if_answered(attempt, orders[aid][0]) for aid, attempt in attempts.items()]
+    return results, summaries
+
+
+def _sync_attempt_questions(attempts: Dict, touched: Dict, orders: Dict, banks: Dict) -> None:
+    """Recompute ModuleAttemptQuestion rows for the touched questions from the log."""
+    state: Dict = {}
+    for aid, position, mask, time_taken in AttemptAnswer.objects.filter(attempt_id__in=attempts).values_list(
+        "attempt_id", "position", "choices", "time_taken"
+    ):
+        if position in touched[aid]:
+            prev = state.get((aid, position))
+            state[(aid, position)] = (mask, (prev[1] if prev else 0.0) + time_taken, (prev[2] if prev else 0) + 1)
+
+    existing = {
+        (maq.attempt_id, str(maq.question_id)): maq
+        for maq in ModuleAttemptQuestion.objects.filter(attempt_id__in=attempts)
+    }
+    to_create, to_update = [], []
+    for (aid, position), (mask, time_taken, count) in state.items():
+        attempt = attempts[aid]
+        presented, choice_order = orders[aid]
+        qid = presented[position]
+        bank = banks[attempt.module_id]
+        final = decode_choices(served_choices(attempt, choice_order, qid), mask)
+        earned, correct, _ = score_answer(bank, bank["positions"][qid], final, attempt.module.negative_marking)
+
+        maq = existing.get((aid, qid))
+        if maq is None:
+            maq = ModuleAttemptQuestion(attempt=attempt, question_id=qid)
+            existing[(aid, qid)] = maq
+            to_create.append(maq)
+        else:
+            to_update.append(maq)
+        maq.final_choices = final
+        maq.correct = correct
+        maq.points_awarded = earned
+        maq.time_taken = time_taken
+        maq.changed_answer = count > 1 or bool(maq.selection_history)
+
+    ModuleAttemptQuestion.objects.bulk_create(to_create, batch_size=500)
+    ModuleAttemptQuestion.objects.bulk_update(
+        to_update, ["final_choices", "correct", "points_awarded", "time_taken", "changed_answer"], batch_size=500
+    )
+
+
+def _finish_if_answered(attempt: ModuleAttempt, presented: List[str]) -> Dict:
+    """Complete the attempt once every presented question has an answer; returns a summary."""
+    aqs = list(attempt.attempt_questions.values_list("question_id", "points_awarded", "question__points"))
+    answered = {str(qid) for qid, _, _ in aqs}
+    summary = {
+        "attempt_id": str(attempt.id),
+        "completed": attempt.completed_at is not None,
+        "remaining": len([qid for qid in presented if qid not in answered]),
+    }
+    if not summary["remaining"] and not attempt.completed_at:
+        total_earned = sum(points for _, points, _ in aqs)
+        total_max = sum(float(points) for _, _, points in aqs) or 1.0
+        module = attempt.module
+        attempt.score = int(round((total_earned / total_max) * 100))
+        attempt.passed = attempt.score >= (module.pass_mark or module.passing_score)
+        attempt.completed_at = timezone.now()
+        attempt.save(update_fields=["score", "passed", "completed_at"])  # XP via post_save signal
+        summary.update(completed=True, score=attempt.score, passed=attempt.passed)
+    return summary
@@ -0,0 +1,145 @@
+# learning/attempt_session.py
+"""
+Cached state for an in-progress attempt.
+
+Every step of the one-question-at-a-time flow used to re-fetch the attempt
+and module, rebuild the presented order and re-read the answers. An
+``AttemptSession`` holds all of that in the cache for the life of the
+attempt:
+
+  - who owns it, the module id and the question bank version it reads
+  - presented question ids and per-question choice order
+  - answers so far, in the legacy ``{question_id: [choice_ids]}`` shape
+  - the module's scoring settings (negative marking, pass mark, feedback mode)
+
+Writes go to the database first (one AttemptAnswer insert) and then to the
+cached copy. Code that changes an attempt's answers any other way must call
+``forget`` so the next request rebuilds from the database. The cached
+answers are a convenience for serving the next question; scoring reads the
+answer log. Sessions of completed attempts are never cached. Sessions live in
+the ``QUIZ_SESSION_CACHE`` cache alias, which needs to be shared between
+workers (e.g. Redis/Memcached) when running more than one process.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .answers import answers_for, decode_choices, encode_choices, served_choices
+from .models import AttemptAnswer, ModuleAttempt
+from .question_bank import get_bank_for, presented_order
+
+SESSION_TTL = 2 * 60 * 60
+
+
+def _cache():
+    return caches[getattr(settings, "QUIZ_SESSION_CACHE", "default")]
+
+
+def _key(attempt_id) -> str:
+    return f"attempt-session:{attempt_id}"
+
+
+class AttemptSession:
+    __slots__ = (
+        "attempt_id",
+        "user_id",
+        "module_id",
+        "bank_version",
+        "presented",
+        "choice_order",
+        "answers",
+        "completed",
+        "negative_marking",
+        "pass_mark",
+        "feedback_mode",
+    )
+
+    def __init__(self, **state):
+        for name in self.__slots__:
+            setattr(self, name, state[name])
+
+    @classmethod
+    def from_attempt(cls, attempt: ModuleAttempt) -> "AttemptSession":
+        module = attempt.module
+        presented, choice_order = presented_order(attempt)
+        for qid in presented:
+            # Freeze the served order for questions without a stored one
+            choice_order[qid] = served_choices(attempt, choice_order, qid)
+        return cls(
+            attempt_id=str(attempt.id),
+            user_id=attempt.user_id,
+            module_id=attempt.module_id,
+            bank_version=module.content_version,
+            presented=presented,
+            choice_order=choice_order,
+            answers=answers_for(attempt),
+            completed=attempt.completed_at is not None,
+            negative_marking=module.negative_marking,
+            pass_mark=module.pass_mark or module.passing_score,
+            feedback_mode=module.feedback_mode or "end",
+        )
+
+    @classmethod
+    def load(cls, attempt_id, user) -> "AttemptSession":
+        """
+        The session for ``user``'s attempt, from the cache or rebuilt from the
+        database. Raises ModuleAttempt.DoesNotExist for someone else's attempt.
+        """
+        state = _cache().get(_key(attempt_id))
+        if state is not None:
+            session = cls(**state)
+            if session.user_id != user.id:
+                raise ModuleAttempt.DoesNotExist
+            return session
+
+        attempt = ModuleAttempt.objects.select_related("module").get(id=attempt_id, user=user)
+        session = cls.from_attempt(attempt)
+        if not session.completed:
+            session.save()
+        return session
+
+    def save(self) -> None:
+        _cache().set(_key(self.attempt_id), {name: getattr(self, name) for name in self.__slots__}, SESSION_TTL)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def bank(self) -> Dict:
+        return get_bank_for(self.module_id, self.bank_version)
+
+    def next_unanswered(self) -> Tuple[Optional[int], Optional[str]]:
+        """``(1-based index, question id)`` of the first unanswered question, or ``(None, None)``."""
+        for i, qid in enumerate(self.presented, start=1):
+            if qid not in self.answers:
+                return i, qid
+        return None, None
+
+    # ------------------------------------------------------------------
+    # Writes (database first, then the cached copy)
+    # ------------------------------------------------------------------
+    def record(self, question_id, choice_ids: Iterable[str], time_taken: float = 0.0) -> List[str]:
+        """Log one answer and return the stored choice ids (in served order)."""
+        qid = str(question_id)
+        served = self.choice_order.get(qid, [])
+        mask = encode_choices(served, choice_ids)
+        AttemptAnswer.objects.create(
+            attempt_id=self.attempt_id,
+            position=self.presented.index(qid),
+            choices=mask,
+            time_taken=time_taken or 0.0,
+        )
+        chosen = decode_choices(served, mask)
+        self.answers[qid] = chosen
+        if not self.completed:
+            self.save()
+        return chosen
+
+    def close(self) -> None:
+        """The attempt is finished; drop the cached state."""
+        forget([self.attempt_id])
+
+
+def forget(attempt_ids: Iterable) -> None:
+    """Drop cached sessions after their attempts changed outside the session."""
+    _cache().delete_many([_key(aid) for aid in attempt_ids])
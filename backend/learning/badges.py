@@ -10,9 +10,11 @@ from .models import (
     XPEvent,
     SupervisorSignoff,
     TeamMember,
-    Team,
-    Department,
+    TeamXPTotal,
+    DepartmentXPTotal,
 )
+from . import events
+from .aggregates import ensure_threshold_counter
 
 log = logging.getLogger(__name__)
 
@@ -29,6 +31,8 @@ def auto_award_badges_for_user(user, org=None):
       - signoffs_at_least
       - team_total_xp_at_least
       - department_total_xp_at_least
+      - team_member_count_with_xp_at_least (every active member of the team
+        has at least ``value`` XP; awarded to the whole team at once)
 
     Unknown rule_types are ignored (logged at debug).
     """
@@ -67,70 +71,32 @@ def auto_award_badges_for_user(user, org=None):
     # 2) Precompute team / department aggregates for this user
     # ----------------------------------------------------------------------------
     # Teams this user belongs to
-    memberships = TeamMember.objects.filter(user=user, active=True).select_related(
-        "team", "team__department"
-    )
+    memberships = TeamMember.objects.filter(user=user, active=True)
+    if org is not None:
+        memberships = memberships.filter(team__org=org)
 
     team_ids: Set[str] = set()
     dept_ids: Set[str] = set()
 
-    for tm in memberships:
-        if tm.team_id:
-            team_ids.add(str(tm.team_id))
-        if tm.team and tm.team.department_id:
-            dept_ids.add(str(tm.team.department_id))
+    for team_id, dept_id in memberships.values_list("team_id", "team__department_id"):
+        team_ids.add(str(team_id))
+        if dept_id:
+            dept_ids.add(str(dept_id))
 
+    # Maintained counters (learning.aggregates) – one row per team/department
     team_xp: Dict[str, int] = {}
-    dept_xp: Dict[str, int] = {}
-
-    if team_ids:
-        # All active members of teams this user is in
-        team_member_rows = TeamMember.objects.filter(
-            team_id__in=team_ids,
-            active=True,
-        ).values("team_id", "user_id")
-
-        team_to_users: Dict[str, Set[str]] = {}
-        user_ids_for_teams: Set[str] = set()
-
-        for row in team_member_rows:
-            tid = str(row["team_id"])
-            uid = str(row["user_id"])
-            team_to_users.setdefault(tid, set()).add(uid)
-            user_ids_for_teams.add(uid)
-
-        # XP for all those users in this org
-        team_xp_rows = XPEvent.objects.filter(
-            user_id__in=user_ids_for_teams,
-        )
-        if org is not None:
-            team_xp_rows = team_xp_rows.filter(org=org)
-
-        team_xp_rows = (
-            team_xp_rows.values("user_id")
-            .annotate(total=Sum("amount"))
+    team_members: Dict[str, int] = {}
+    for tid, total, members in TeamXPTotal.objects.filter(team_id__in=team_ids).values_list(
+        "team_id", "total_xp", "member_count"
+    ):
+        team_xp[str(tid)] = total
+        team_members[str(tid)] = members
+    dept_xp: Dict[str, int] = {
+        str(did): total
+        for did, total in DepartmentXPTotal.objects.filter(department_id__in=dept_ids).values_list(
+            "department_id", "total_xp"
         )
-        xp_by_user: Dict[str, int] = {
-            str(r["user_id"]): r["total"] or 0 for r in team_xp_rows
-        }
-
-        # Sum per team
-        for tid, uids in team_to_users.items():
-            team_xp[tid] = sum(xp_by_user.get(uid, 0) for uid in uids)
-
-        # From team_xp, roll up to departments
-        # First, get mapping team_id -> department_id
-        team_objs = Team.objects.filter(id__in=team_ids).select_related("department")
-        team_to_dept: Dict[str, Optional[str]] = {}
-        for t in team_objs:
-            team_to_dept[str(t.id)] = str(t.department_id) if t.department_id else None
-
-        for tid, total in team_xp.items():
-            dept_id = team_to_dept.get(tid)
-            if not dept_id:
-                continue
-            dept_xp.setdefault(dept_id, 0)
-            dept_xp[dept_id] += total
+    }
 
     # ----------------------------------------------------------------------------
     # 3) Evaluate badge rules
@@ -145,6 +111,7 @@ def auto_award_badges_for_user(user, org=None):
     )
 
     to_award = []
+    team_awards = []  # badges earned by a whole team
 
     for badge in badge_qs:
         if badge.id in already:
@@ -193,8 +160,21 @@ def auto_award_badges_for_user(user, org=None):
                 to_award.append(badge)
                 continue
 
+        elif rt == "team_member_count_with_xp_at_least":
+            if not badge.team_id:
+                log.debug("Badge %s has rule_type=team_member_count_with_xp_at_least but no team.", badge.id)
+                continue
+            tid = str(badge.team_id)
+            if tid not in team_ids:
+                continue
+            # Counter of members at/above this threshold (learning.aggregates)
+            at_least = ensure_threshold_counter(badge.team_id, value)
+            members = team_members.get(tid, 0)
+            if members and at_least >= members:
+                team_awards.append(badge)
+                continue
+
         else:
-            # Other rule types (e.g. team_member_count_with_xp_at_least) are not yet implemented
             log.debug("Ignoring unsupported badge rule_type=%s for badge=%s", rt, badge.id)
 
     # ----------------------------------------------------------------------------
@@ -213,3 +193,122 @@ def auto_award_badges_for_user(user, org=None):
                 badge.name,
                 user,
             )
+
+    if team_awards:
+        member_rows = TeamMember.objects.filter(
+            team_id__in=[b.team_id for b in team_awards], active=True
+        ).values_list("team_id", "user_id")
+        members_by_team: Dict = {}
+        for tid, uid in member_rows:
+            members_by_team.setdefault(tid, set()).add(uid)
+        awards = [
+            UserBadge(user_id=uid, badge=badge, meta={"auto_awarded": True})
+            for badge in team_awards
+            for uid in members_by_team.get(badge.team_id, ())
+        ]
+        UserBadge.objects.bulk_create(awards, ignore_conflicts=True)
+        # bulk_create skips post_save; members who already held a badge are filtered out there
+        events.record_badges(awards)
+        log.info("Auto-awarded team badges %s to teams of user %s", [b.code for b in team_awards], user)
+
+
+# ----------------------------------------------------------------------------
+# Set-based evaluation of team / department rules (used by award_group_badges)
+# ----------------------------------------------------------------------------
+GROUP_RULE_TYPES = (
+    "team_total_xp_at_least",
+    "department_total_xp_at_least",
+    "team_member_count_with_xp_at_least",
+)
+
+
+def evaluate_group_badges(org_ids=None):
+    """
+    Evaluate every team/department badge rule in one pass.
+
+    Loads active memberships and per-user XP once, evaluates all group
+    rules in memory and returns a list of ``(badge, [user_id, ...])`` pairs
+    holding the members who qualify but don't hold the badge yet.
+
+    Rule semantics:
+
+      - team_total_xp_at_least: summed XP of the team's active members
+      - department_total_xp_at_least: summed XP of the distinct active
+        members of any team in the department
+      - team_member_count_with_xp_at_least: every active member of the
+        team has at least ``value`` XP
+
+    XP is scoped to the badge's org. Qualifying badges go to all active
+    members of the team/department.
+    """
+    badge_qs = Badge.objects.filter(rule_type__in=GROUP_RULE_TYPES)
+    if org_ids:
+        badge_qs = badge_qs.filter(org_id__in=org_ids)
+    badges = list(badge_qs.order_by("org_id", "code"))
+    if not badges:
+        return []
+
+    # 1) Active memberships, grouped by team and by department
+    member_qs = TeamMember.objects.filter(active=True)
+    if org_ids:
+        member_qs = member_qs.filter(team__org_id__in=org_ids)
+
+    team_members: Dict = {}
+    dept_members: Dict = {}
+    for team_id, user_id, dept_id in member_qs.values_list(
+        "team_id", "user_id", "team__department_id"
+    ):
+        team_members.setdefault(team_id, set()).add(user_id)
+        if dept_id:
+            dept_members.setdefault(dept_id, set()).add(user_id)
+
+    # 2) Per-user XP, per org
+    xp_qs = XPEvent.objects.all()
+    if org_ids:
+        xp_qs = xp_qs.filter(org_id__in=org_ids)
+    xp_by_user = {
+        (row["org_id"], row["user_id"]): row["total"] or 0
+        for row in xp_qs.values("org_id", "user_id").annotate(total=Sum("amount"))
+    }
+
+    # 3) Existing holders, so we only report genuinely new awards
+    held: Dict = {}
+    for badge_id, user_id in UserBadge.objects.filter(
+        badge_id__in=[b.id for b in badges]
+    ).values_list("badge_id", "user_id"):
+        held.setdefault(badge_id, set()).add(user_id)
+
+    # 4) Evaluate rules in memory
+    plan = []
+    for badge in badges:
+        rt = badge.rule_type
+        value = badge.value or 0
+
+        if rt in ("team_total_xp_at_least", "team_member_count_with_xp_at_least"):
+            if not badge.team_id:
+                log.debug("Badge %s has rule_type=%s but no team.", badge.id, rt)
+                continue
+            members = team_members.get(badge.team_id, set())
+        else:
+            if not badge.department_id:
+                log.debug("Badge %s has rule_type=%s but no department.", badge.id, rt)
+                continue
+            members = dept_members.get(badge.department_id, set())
+
+        if not members:
+            continue
+
+        member_xp = [xp_by_user.get((badge.org_id, uid), 0) for uid in members]
+        if rt == "team_member_count_with_xp_at_least":
+            qualifies = all(xp >= value for xp in member_xp)
+        else:
+            qualifies = sum(member_xp) >= value
+
+        if not qualifies:
+            continue
+
+        missing = members - held.get(badge.id, set())
+        if missing:
+            plan.append((badge, sorted(missing, key=str)))
+
+    return plan
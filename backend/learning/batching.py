@@ -0,0 +1,107 @@
+# learning/batching.py
+"""
+Batching of signal side effects.
+
+One finished attempt can record two XP events, and each event used to
+update the team counters, the XP history buckets and re-evaluate the
+user's badges on its own. Inside a ``batch()`` (every request gets one, see
+``SignalBatchMiddleware``) that work is collected instead and run once per
+key when the outermost batch ends -- via ``transaction.on_commit``, so it
+only happens if the writes that caused it are committed:
+
+  - ``run_once(fn, *args)``        fn(*args) once, however often it's asked for
+  - ``add(fn, args, *amounts)``    fn(*args, *amounts) once, amounts summed
+  - ``pending(fn)``                what ``add`` has queued for fn so far, by args
+
+The key is the function plus ``args``; work runs in the order it was first
+asked for. Outside a batch both helpers call ``fn`` straight away, which is
+what management commands, the shell and model-level tests get.
+
+Deferred work must tolerate running late: re-checks and deltas, not reads
+whose result the caller needs.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import transaction
+
+_pending: ContextVar[Optional[Dict]] = ContextVar("learning_signal_batch", default=None)
+
+
+def run_once(fn: Callable, *args) -> None:
+    pending = _pending.get()
+    if pending is None:
+        fn(*args)
+    else:
+        pending.setdefault((fn, args), ())
+
+
+def add(fn: Callable, args: tuple, *amounts) -> None:
+    pending = _pending.get()
+    if pending is None:
+        fn(*args, *amounts)
+        return
+    current = pending.get((fn, args))
+    pending[(fn, args)] = amounts if current is None else tuple(a + b for a, b in zip(current, amounts))
+
+
+def pending(fn: Callable) -> Dict[tuple, tuple]:
+    """Amounts queued by ``add`` for ``fn`` in the current batch, keyed by args."""
+    return {args: amounts for (f, args), amounts in (_pending.get() or {}).items() if f is fn}
+
+
+@contextmanager
+def batch():
+    """Collect side effects until the outermost batch exits; dropped if it raises."""
+    if _pending.get() is not None:
+        yield  # nested: the outer batch flushes
+        return
+    pending: Dict = {}
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    if pending:
+        transaction.on_commit(lambda: _flush(pending))
+
+
+def _flush(pending: Dict) -> None:
+    for (fn, args), amounts in pending.items():
+        fn(*args, *amounts)
+
+
+class SignalBatchMiddleware:
+    """Runs each request inside ``batch()``."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with batch():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        # The ORM work in the view runs in threads that copy this context, so
+        # they all add to the same dict; flushing touches the database too.
+        if _pending.get() is not None:
+            return await self.get_response(request)
+        pending: Dict = {}
+        token = _pending.set(pending)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pending.reset(token)
+        if pending:
+            await sync_to_async(transaction.on_commit)(lambda: _flush(pending))
+        return response
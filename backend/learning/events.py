@@ -0,0 +1,237 @@
+# learning/events.py
+"""
+Live XP / rank / badge updates for the event stream (``/api/events/stream/``).
+
+The XP and badge write paths publish small deltas once their transaction
+has committed, on two kinds of channel:
+
+  - ``org:<org_id>``    ``xp``    {user_id, username, amount, overall_xp, level}
+                        ``rank``  {user_id, username, rank, previous_rank, overall_xp}
+  - ``user:<user_id>``  ``badge`` a /me/badges/ row for the newly awarded badge
+                        (``xp`` / ``rank`` too for users without an org)
+
+so an open leaderboard or badge list can apply them instead of re-fetching.
+Ranks follow the leaderboard order (overall XP, then user id). XP recorded
+in one request is announced once per user, with the amounts summed (see
+``learning.batching``); nothing is computed for an org nobody is watching.
+
+The broker is ``LIVE_EVENTS_BROKER`` (default ``InProcessBroker``). It only
+reaches subscribers in the process that made the change, which is fine for a
+single ASGI worker; with several processes plug in a broker with the same
+methods (``publish``, ``subscribe``, ``replay``, ``has_subscribers``,
+``last_event_id``) backed by a shared pub/sub (e.g. Redis). Each broker
+keeps the last ``LIVE_EVENTS_BUFFER`` events per channel so a reconnecting
+client can pass ``Last-Event-ID`` and get what it missed; if they're gone it
+gets a ``resync`` event and should re-fetch once.
+"""
+import asyncio
+import itertools
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils.module_loading import import_string
+
+from api.fast_serializers import UserBadgeFast
+
+from . import batching
+from .levels import level_for
+from .models import UserBadge, XPEvent
+
+
+def org_channel(org_id) -> str:
+    return f"org:{org_id}"
+
+
+def user_channel(user_id) -> str:
+    return f"user:{user_id}"
+
+
+# ----------------------------------------------------------------------------
+# Brokers
+# ----------------------------------------------------------------------------
+class Subscription:
+    """Events for a set of channels, delivered to one event loop."""
+
+    def __init__(self, broker: "InProcessBroker", channels: List[str], loop, maxsize: int):
+        self.broker = broker
+        self.channels = channels
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def deliver(self, event: Dict) -> None:
+        # Called on the subscriber's loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up: drop what's queued and ask the client to re-fetch
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"id": event["id"], "type": "resync", "data": {}})
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        """The next event, or None after ``timeout`` seconds without one."""
+        try:
+            event = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if event["type"] == "resync":
+            self.overflowed = False
+        return event
+
+    def pending(self) -> List[Dict]:
+        """The events already queued, without waiting."""
+        events = []
+        while not self.queue.empty():
+            events.append(self.queue.get_nowait())
+        self.overflowed = False
+        return events
+
+    def close(self) -> None:
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Pub/sub between the threads and event loops of this process."""
+
+    def __init__(self, buffer: int = 200, queue_size: int = 256):
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self._subscribers: Dict[str, set] = {}
+        self._recent: Dict[str, deque] = {}
+        self._evicted: Dict[str, int] = {}  # newest event id no longer in a channel's buffer
+        self.buffer = buffer
+        self.queue_size = queue_size
+
+    def has_subscribers(self, channel: str) -> bool:
+        return bool(self._subscribers.get(channel))
+
+    def publish(self, channel: str, type: str, data: Dict) -> Dict:
+        with self._lock:
+            event = {"id": next(self._ids), "type": type, "data": data}
+            recent = self._recent.setdefault(channel, deque(maxlen=self.buffer))
+            if len(recent) == recent.maxlen:
+                self._evicted[channel] = recent[0]["id"]
+            recent.append(event)
+            subscribers = list(self._subscribers.get(channel, ()))
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub.deliver, event)
+            except RuntimeError:  # the subscriber's loop has closed
+                self.unsubscribe(sub)
+        return event
+
+    def subscribe(self, channels: Iterable[str], last_event_id: Optional[int] = None) -> Subscription:
+        """Subscribe the running event loop; replays buffered events after ``last_event_id``."""
+        sub = Subscription(self, list(channels), asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            for channel in sub.channels:
+                self._subscribers.setdefault(channel, set()).add(sub)
+            if last_event_id is not None:
+                for event in self.replay(sub.channels, last_event_id):
+                    sub.deliver(event)
+        return sub
+
+    def replay(self, channels: Iterable[str], last_event_id: int) -> List[Dict]:
+        """Buffered events after ``last_event_id``, or one ``resync`` event if some are gone."""
+        channels = list(channels)
+        with self._lock:
+            if any(self._evicted.get(c, 0) > last_event_id for c in channels):
+                return [{"id": self.last_event_id(channels), "type": "resync", "data": {}}]
+            return sorted(
+                (e for c in channels for e in self._recent.get(c, ()) if e["id"] > last_event_id),
+                key=lambda e: e["id"],
+            )
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            for channel in sub.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(sub)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def last_event_id(self, channels: Iterable[str]) -> int:
+        """The newest event id on these channels (0 if none); a cursor for ``subscribe``."""
+        with self._lock:
+            return max([self._recent[c][-1]["id"] for c in channels if self._recent.get(c)] or [0])
+
+
+@lru_cache(maxsize=None)
+def broker():
+    cls = import_string(getattr(settings, "LIVE_EVENTS_BROKER", "learning.events.InProcessBroker"))
+    return cls(buffer=getattr(settings, "LIVE_EVENTS_BUFFER", 200))
+
+
+def publish(channel: str, type: str, data: Dict) -> None:
+    """Publish once the current transaction commits (straight away outside one)."""
+    transaction.on_commit(lambda: broker().publish(channel, type, data))
+
+
+# ----------------------------------------------------------------------------
+# XP and rank
+# ----------------------------------------------------------------------------
+def record_xp(event: XPEvent) -> None:
+    """Announce a newly recorded XPEvent (batched per request)."""
+    if not event.amount or event.source == "opening_balance":
+        return
+    batching.add(announce_xp, (event.user_id, event.org_id), event.amount)
+
+
+def announce_xp(user_id, org_id, amount: int) -> None:
+    channel = org_channel(org_id) if org_id else user_channel(user_id)
+    if not broker().has_subscribers(channel):
+        return
+
+    ledger = XPEvent.objects.filter(org_id=org_id) if org_id else XPEvent.objects.filter(user_id=user_id)
+    mine = list(ledger.filter(user_id=user_id).values("user__username").annotate(total=Sum("amount")).order_by())
+    if not mine:
+        return
+    mine = mine[0]
+    total = mine["total"] or 0
+    others = ledger.exclude(user_id=user_id).values("user_id").annotate(total=Sum("amount"))
+
+    def rank(xp):
+        # Leaderboard order: overall XP, then user id
+        return others.filter(Q(total__gt=xp) | Q(total=xp, user_id__lt=user_id)).count() + 1
+
+    username = mine["user__username"]
+    publish(
+        channel,
+        "xp",
+        {"user_id": str(user_id), "username": username, "amount": amount, "overall_xp": total,
+         "level": level_for(total)},
+    )
+    now, before = rank(total), rank(total - amount)
+    if now != before:
+        publish(
+            channel,
+            "rank",
+            {"user_id": str(user_id), "username": username, "rank": now, "previous_rank": before,
+             "overall_xp": total},
+        )
+
+
+# ----------------------------------------------------------------------------
+# Badges
+# ----------------------------------------------------------------------------
+def record_badges(user_badges: Iterable[UserBadge]) -> None:
+    """Announce newly awarded badges to their holders, as /me/badges/ rows."""
+    ids = [ub.id for ub in user_badges if broker().has_subscribers(user_channel(ub.user_id))]
+    if ids:
+        transaction.on_commit(lambda: _announce_badges(ids))
+
+
+def _announce_badges(ids: List) -> None:
+    # Same serializer as /me/badges/, so the two payloads can't drift apart
+    for row in UserBadgeFast.serialize(UserBadge.objects.filter(id__in=ids)):
+        broker().publish(user_channel(row["user"]), "badge", row)
@@ -0,0 +1,122 @@
+# learning/levels.py
+"""
+Single source of truth for turning total XP into a level.
+
+The ladder is a sorted array of cumulative XP thresholds, answered with a
+binary search:
+
+  - If ``LevelDef`` rows exist they define the ladder (``total_xp`` is the
+    cumulative XP required to reach ``level``). Past the last row the ladder
+    continues with the ``xp_for_next_level`` curve. XP below the first row is
+    the level before it.
+  - Otherwise the ladder is built from ``xp_for_next_level`` starting at
+    level 1 with 0 XP.
+
+The table is built once per process and rebuilt when a LevelDef changes
+(see signals) or after ``TABLE_TTL`` seconds, so edits made in another
+process are picked up too.
+"""
+import time
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional
+
+from .models import LevelDef, xp_for_next_level
+
+# Ladder stops once a threshold passes what a BigInteger XP total can hold
+MAX_TOTAL_XP = 2**63 - 1
+TABLE_TTL = 300
+
+
+class LevelTable:
+    """Cumulative thresholds: ``levels[i]`` is reached at ``thresholds[i]`` XP."""
+
+    __slots__ = ("levels", "thresholds")
+
+    def __init__(self, levels: List[int], thresholds: List[int]):
+        self.levels = levels
+        self.thresholds = thresholds
+
+    @classmethod
+    def from_curve(cls, levels=None, thresholds=None) -> "LevelTable":
+        """Extend the given ladder (or start at level 1 / 0 XP) with the XP curve."""
+        levels = list(levels or [1])
+        thresholds = list(thresholds or [0])
+        while True:
+            nxt = thresholds[-1] + xp_for_next_level(levels[-1])
+            if nxt > MAX_TOTAL_XP:
+                break
+            levels.append(levels[-1] + 1)
+            thresholds.append(nxt)
+        return cls(levels, thresholds)
+
+    @classmethod
+    def from_defs(cls, rows: Iterable) -> "LevelTable":
+        """Build from ``(level, total_xp)`` pairs; empty input falls back to the curve."""
+        levels, thresholds = [], []
+        for level, total_xp in sorted(rows):
+            # Keep thresholds sorted even if the admin-entered ladder isn't
+            total_xp = max(total_xp, thresholds[-1] if thresholds else 0)
+            if thresholds and total_xp == thresholds[-1]:
+                levels[-1] = level  # same threshold: the higher level wins
+                continue
+            levels.append(level)
+            thresholds.append(total_xp)
+        if not levels:
+            return cls.from_curve()
+        if thresholds[0] > 0:
+            levels.insert(0, levels[0] - 1)
+            thresholds.insert(0, 0)
+        return cls.from_curve(levels, thresholds)
+
+    def level_for(self, total: Optional[int]) -> int:
+        idx = bisect_right(self.thresholds, max(0, total or 0)) - 1
+        return self.levels[idx]
+
+    def levels_for(self, totals: Iterable[Optional[int]]) -> List[int]:
+        """Levels for a whole page of totals (e.g. a leaderboard) in one pass."""
+        thresholds, levels = self.thresholds, self.levels
+        return [levels[bisect_right(thresholds, max(0, t or 0)) - 1] for t in totals]
+
+    def progress_for(self, total: Optional[int]) -> Dict:
+        """Level, the XP needed for the next one, and how far away it is."""
+        total = max(0, total or 0)
+        idx = bisect_right(self.thresholds, total) - 1
+        nxt = min(idx + 1, len(self.levels) - 1)
+        return {
+            "level": self.levels[idx],
+            "level_xp": self.thresholds[idx],
+            "next_level": self.levels[nxt],
+            "next_level_xp": self.thresholds[nxt],
+            "xp_to_next": max(0, self.thresholds[nxt] - total),
+        }
+
+
+_table: Optional[LevelTable] = None
+_built_at = 0.0
+
+
+def get_table() -> LevelTable:
+    """The process-wide ladder, built from LevelDef on first use."""
+    global _table, _built_at
+    if _table is None or time.monotonic() - _built_at > TABLE_TTL:
+        _table = LevelTable.from_defs(LevelDef.objects.values_list("level", "total_xp"))
+        _built_at = time.monotonic()
+    return _table
+
+
+def invalidate() -> None:
+    """Drop the cached ladder; the next lookup rebuilds it."""
+    global _table
+    _table = None
+
+
+def level_for(total: Optional[int]) -> int:
+    return get_table().level_for(total)
+
+
+def levels_for(totals: Iterable[Optional[int]]) -> List[int]:
+    return get_table().levels_for(totals)
+
+
+def progress_for(total: Optional[int]) -> Dict:
+    return get_table().progress_for(total)
@@ -0,0 +1,69 @@
+import gzip
+import json
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from learning import xp_archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Move XP events older than the archive horizon (XP_ARCHIVE_AFTER_DAYS) to the XP archive "
+        "table, folding their amounts into per-user/skill opening balances so XP totals don't change."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=None,
+            help="Archive events older than this many days (default: XP_ARCHIVE_AFTER_DAYS).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=xp_archive.BATCH_SIZE,
+            help=f"Events per transaction (default: {xp_archive.BATCH_SIZE}).",
+        )
+        parser.add_argument(
+            "--export",
+            metavar="PATH",
+            help="Also append the archived events to this gzip-compressed JSON-lines file.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be archived without writing anything.",
+        )
+
+    def handle(self, *args, **opts):
+        if opts["days"] is not None:
+            cutoff = timezone.now() - timedelta(days=opts["days"])
+        else:
+            cutoff = xp_archive.default_cutoff()
+
+        if opts["dry_run"]:
+            agg = xp_archive.archivable(cutoff).aggregate(events=Count("id"), xp=Sum("amount"))
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Dry run: {agg['events']} events ({agg['xp'] or 0} XP) before {cutoff:%Y-%m-%d %H:%M} "
+                    "would be archived (nothing written)"
+                )
+            )
+            return
+
+        with gzip.open(opts["export"], "at", encoding="utf-8") if opts["export"] else nullcontext() as fh:
+            on_batch = None
+            if fh is not None:
+                def on_batch(rows):
+                    for row in rows:
+                        fh.write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+
+            archived = xp_archive.archive_before(cutoff, opts["batch_size"], on_batch=on_batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} XP events before {cutoff:%Y-%m-%d %H:%M}"))
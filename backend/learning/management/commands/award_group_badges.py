@@ -1,56 +1,84 @@
-from django.core.management.base import BaseCommand
-from django.db.models import Sum
+import uuid
 
-from learning.models import Badge, Team, TeamMember, UserBadge, XPEvent
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from accounts.models import Org, User
+from learning import events
+from learning.badges import evaluate_group_badges
+from learning.models import UserBadge
 
 
 class Command(BaseCommand):
-    help = "Evaluate and award team/department badges"
+    help = (
+        "Evaluate and award team/department badges. "
+        "Loads memberships and XP once and inserts missing awards in bulk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report which badges would be awarded without writing anything.",
+        )
+        parser.add_argument(
+            "--org",
+            action="append",
+            default=[],
+            help="Only evaluate this org (id or name). Repeat to shard across several orgs.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows per bulk insert (default: 1000).",
+        )
 
     def handle(self, *args, **opts):
-        awarded = 0
-        for badge in Badge.objects.select_related("team", "department", "org", "skill").all():
-            # Team total XP
-            if badge.rule_type == "team_total_xp_at_least" and badge.team_id:
-                member_ids = TeamMember.objects.filter(team_id=badge.team_id, active=True).values_list(
-                    "user_id", flat=True
-                )
-                total = XPEvent.objects.filter(user_id__in=member_ids).aggregate(s=Sum("amount"))["s"] or 0
-                if total >= badge.value:
-                    # Award to all active members missing it
-                    for uid in member_ids:
-                        UserBadge.objects.get_or_create(
-                            user_id=uid, badge=badge, defaults={"meta": {"awarded_by": "award_group_badges"}}
-                        )
-                        awarded += 1
-
-            # Department total XP
-            elif badge.rule_type == "department_total_xp_at_least" and badge.department_id:
-                team_ids = Team.objects.filter(department_id=badge.department_id).values_list("id", flat=True)
-                member_ids = TeamMember.objects.filter(team_id__in=team_ids, active=True).values_list(
-                    "user_id", flat=True
-                )
-                total = XPEvent.objects.filter(user_id__in=member_ids).aggregate(s=Sum("amount"))["s"] or 0
-                if total >= badge.value:
-                    for uid in member_ids:
-                        UserBadge.objects.get_or_create(
-                            user_id=uid, badge=badge, defaults={"meta": {"awarded_by": "award_group_badges"}}
-                        )
-                        awarded += 1
-
-            # Count of team members meeting a per-user XP threshold (overall)
-            elif badge.rule_type == "team_member_count_with_xp_at_least" and badge.team_id:
-                member_ids = list(
-                    TeamMember.objects.filter(team_id=badge.team_id, active=True).values_list("user_id", flat=True)
-                )
-                # overall xp per member
-                totals = XPEvent.objects.filter(user_id__in=member_ids).values("user_id").annotate(s=Sum("amount"))
-                count = sum(1 for t in totals if (t["s"] or 0) >= badge.value)
-                if count >= len(member_ids):  # all members met threshold
-                    for uid in member_ids:
-                        UserBadge.objects.get_or_create(
-                            user_id=uid, badge=badge, defaults={"meta": {"awarded_by": "award_group_badges"}}
-                        )
-                        awarded += 1
-
-        self.stdout.write(self.style.SUCCESS(f"Awarded/ensured {awarded} team/department badges"))
+        org_ids = self._resolve_orgs(opts["org"])
+        plan = evaluate_group_badges(org_ids=org_ids)
+        total = sum(len(user_ids) for _, user_ids in plan)
+
+        if opts["dry_run"]:
+            self._report(plan, opts["verbosity"])
+            self.stdout.write(
+                self.style.WARNING(f"Dry run: {total} new awards across {len(plan)} badges (nothing written)")
+            )
+            return
+
+        rows = [
+            UserBadge(user_id=uid, badge=badge, meta={"awarded_by": "award_group_badges"})
+            for badge, user_ids in plan
+            for uid in user_ids
+        ]
+        with transaction.atomic():
+            UserBadge.objects.bulk_create(rows, batch_size=opts["batch_size"], ignore_conflicts=True)
+            events.record_badges(rows)
+
+        if opts["verbosity"] >= 2:
+            self._report(plan, opts["verbosity"])
+        self.stdout.write(self.style.SUCCESS(f"Awarded {total} new team/department badges across {len(plan)} badges"))
+
+    def _resolve_orgs(self, values):
+        org_ids = []
+        for value in values:
+            try:
+                org = Org.objects.get(id=uuid.UUID(value))
+            except (ValueError, Org.DoesNotExist):
+                org = Org.objects.filter(name=value).first()
+            if org is None:
+                raise CommandError(f"Unknown org: {value}")
+            org_ids.append(org.id)
+        return org_ids
+
+    def _report(self, plan, verbosity):
+        """Print a per-badge diff: '+ CODE (name): N new holders'."""
+        usernames = {}
+        if verbosity >= 2:
+            user_ids = {uid for _, ids in plan for uid in ids}
+            usernames = dict(User.objects.filter(id__in=user_ids).values_list("id", "username"))
+
+        for badge, user_ids in plan:
+            self.stdout.write(f"+ {badge.code} ({badge.name}): {len(user_ids)} new holders")
+            for uid in user_ids if verbosity >= 2 else ():
+                self.stdout.write(f"    + {usernames.get(uid, uid)}")
@@ -0,0 +1,351 @@
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer, get_internal_wsgi_application
+from django.db import transaction
+
+from accounts.authentication import ClaimsTokenObtainPairSerializer
+from accounts.models import Org, User
+from learning import question_bank
+from learning.models import Choice, Module, Question, Skill, XPEvent
+from sops.models import SOP
+
+# label -> weight; the small, frequent requests kiosks and open quiz tabs make
+DEFAULT_MIX = "heartbeat=5,whoami=2,next=2,dashboard=1,leaderboard=1"
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class _PooledWSGIServer(WSGIServer):
+    """A fixed pool of worker threads, like gunicorn's ``--threads``; one request per connection."""
+
+    def __init__(self, *args, threads, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._work, request, client_address)
+
+    def _work(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class _Connection:
+    """A keep-alive client connection, reopened whenever the server closes it."""
+
+    def __init__(self, command, host, port, token, timeout):
+        self.command, self.host, self.port, self.token, self.timeout = command, host, port, token, timeout
+        self.streams = None
+
+    async def call(self, method, path, body=None):
+        try:
+            if self.streams is None:
+                self.streams = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+            status, data, keep = await asyncio.wait_for(
+                self.command._request(self.streams, self.host, method, f"/api/{path}", self.token, body), self.timeout
+            )
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            status, data, keep = 0, b"", False
+        if not keep:
+            self.close()
+        return status, data
+
+    def close(self):
+        if self.streams is not None:
+            self.streams[1].close()
+            self.streams = None
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare how many concurrent connections the WSGI and the ASGI deployment sustain. Seeds a "
+        "throwaway org, then keeps N client connections busy with SOP heartbeats, whoami, next-question, "
+        "dashboard and leaderboard requests (with think time) at each --connections level, against an "
+        "in-process WSGI server with a fixed thread pool and uvicorn running matrix.asgi (or --wsgi-url / "
+        "--asgi-url). Reports throughput, p50/p95/p99 and errors, and the highest level each one holds "
+        "within --slo-ms. The seeded org is deleted afterwards unless --keep."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--connections", default="25,100,400", help="Comma-separated levels (default: 25,100,400).")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds per level (default: 10).")
+        parser.add_argument("--think-ms", type=float, default=200.0, help="Mean pause between requests (default: 200).")
+        parser.add_argument("--timeout", type=float, default=5.0, help="Per-request timeout in seconds (default: 5).")
+        parser.add_argument("--slo-ms", type=float, default=1000.0, help="p99 a level must stay under (default: 1000).")
+        parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Request mix as label=weight (default: {DEFAULT_MIX}).")
+        parser.add_argument("--users", type=int, default=50, help="Learners in the seeded org (default: 50).")
+        parser.add_argument("--threads", type=int, default=16, help="In-process WSGI worker threads (default: 16).")
+        parser.add_argument("--wsgi-url", help="Drive an already running WSGI deployment (sharing this database).")
+        parser.add_argument("--asgi-url", help="Drive an already running ASGI deployment (sharing this database).")
+        parser.add_argument("--only", choices=("wsgi", "asgi"), help="Benchmark just one of the two.")
+        parser.add_argument("--json", metavar="PATH", help="Write the results to this file.")
+        parser.add_argument("--seed", type=int, default=None, help="Random seed for the client choices.")
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded org afterwards.")
+
+    def handle(self, *args, **opts):
+        try:
+            levels = [int(n) for n in opts["connections"].split(",")]
+            mix = {label: float(weight) for label, weight in (part.split("=") for part in opts["mix"].split(","))}
+        except ValueError:
+            raise CommandError("--connections takes integers and --mix label=weight pairs.")
+        unknown = set(mix) - {"heartbeat", "whoami", "next", "dashboard", "leaderboard"}
+        if unknown:
+            raise CommandError(f"Unknown labels in --mix: {', '.join(sorted(unknown))}")
+
+        targets = [t for t in ("wsgi", "asgi") if opts["only"] in (None, t)]
+        if "asgi" in targets and not opts["asgi_url"]:
+            try:
+                import uvicorn  # noqa: F401
+            except ImportError:
+                raise CommandError("uvicorn is not installed; install it or pass --asgi-url.")
+
+        rng = random.Random(opts["seed"])
+        org, users, module, sop = self._seed(opts)
+        report = {"config": {k: opts[k] for k in ("duration", "think_ms", "timeout", "users", "threads")}}
+        report["config"]["mix"] = mix
+        try:
+            tokens = [str(ClaimsTokenObtainPairSerializer.get_token(u).access_token) for u in users]
+            for target in targets:
+                url = opts[f"{target}_url"]
+                stop = None
+                if url:
+                    parts = urlsplit(url)
+                    host, port = parts.hostname, parts.port or 80
+                else:
+                    (host, port), stop = self._serve_wsgi(opts["threads"]) if target == "wsgi" else self._serve_asgi()
+                try:
+                    report[target] = {}
+                    for level in levels:
+                        result = asyncio.run(self._run(host, port, level, tokens, module, sop, mix, rng, opts))
+                        report[target][level] = result
+                        self._print_row(target, level, result)
+                finally:
+                    if stop:
+                        stop()
+        finally:
+            if not opts["keep"]:
+                org.delete()
+
+        self._print_capacity(report, targets, levels, opts["slo_ms"])
+        if opts["json"]:
+            with open(opts["json"], "w") as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"Wrote {opts['json']}")
+
+    # ------------------------------------------------------------------
+    # Setup
+    # ------------------------------------------------------------------
+    @transaction.atomic
+    def _seed(self, opts):
+        org = Org.objects.create(name=f"bench-asgi-{uuid.uuid4().hex[:8]}")
+        users = User.objects.bulk_create(
+            [User(username=f"{org.name}-u{i}", org=org, password="!") for i in range(opts["users"])]
+        )
+        skill = Skill.objects.create(org=org, name="Bench skill")
+        module = Module.objects.create(
+            org=org, skill=skill, title="Bench module", require_viewed=False, question_pool_count=10,
+        )
+        questions = Question.objects.bulk_create([Question(module=module, text=f"Q{i}", order=i) for i in range(40)])
+        Choice.objects.bulk_create(
+            [Choice(question=q, text=f"C{j}", is_correct=j == 0) for q in questions for j in range(4)]
+        )
+        question_bank.bump_version(module.id)
+        XPEvent.objects.bulk_create(
+            [XPEvent(user=u, org=org, skill=skill, source="quiz", amount=10 + i) for i, u in enumerate(users)]
+        )
+        sop = SOP.objects.create(org=org, code="BENCH-ASGI", title="Bench SOP", status="published")
+        self.stdout.write(f"Seeded {org.name}: {len(users)} users")
+        return org, users, str(module.id), str(sop.id)
+
+    def _serve_wsgi(self, threads):
+        server = _PooledWSGIServer(("127.0.0.1", 0), _QuietHandler, threads=threads)
+        server.set_app(get_internal_wsgi_application())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        def stop():
+            server.shutdown()
+            server.server_close()
+
+        return server.server_address[:2], stop
+
+    def _serve_asgi(self):
+        import uvicorn
+        from django.core.asgi import get_asgi_application
+
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("127.0.0.1", 0))
+        config = uvicorn.Config(
+            get_asgi_application(), lifespan="off", log_level="warning", access_log=False, backlog=4096,
+        )
+        server = uvicorn.Server(config)
+        thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.05)
+
+        def stop():
+            server.should_exit = True
+            thread.join(timeout=10)
+            sock.close()
+
+        return sock.getsockname()[:2], stop
+
+    # ------------------------------------------------------------------
+    # Clients
+    # ------------------------------------------------------------------
+    async def _run(self, host, port, connections, tokens, module, sop, mix, rng, opts):
+        # Start one quiz attempt per client up front (a few at a time, untimed), so the
+        # measured window only has the frequent small requests
+        gate = asyncio.Semaphore(8)
+        clients = [(tokens[i % len(tokens)], random.Random(rng.random())) for i in range(connections)]
+        attempts = await asyncio.gather(*[self._start(host, port, token, module, gate, opts) for token, _ in clients])
+
+        samples = []
+        started = time.perf_counter()
+        deadline = started + opts["duration"]
+        await asyncio.gather(
+            *[
+                self._client(host, port, token, attempt, sop, mix, crng, deadline, samples, opts)
+                for (token, crng), attempt in zip(clients, attempts)
+            ]
+        )
+        return self._summarise(samples, time.perf_counter() - started)
+
+    async def _start(self, host, port, token, module, gate, opts):
+        async with gate:
+            conn = _Connection(self, host, port, token, opts["timeout"])
+            status, data = await conn.call("POST", f"modules/{module}/start/")
+            conn.close()
+        return json.loads(data)["attempt_id"] if status == 200 else None
+
+    async def _client(self, host, port, token, attempt, sop, mix, rng, deadline, samples, opts):
+        conn = _Connection(self, host, port, token, opts["timeout"])
+        labels, weights = list(mix), list(mix.values())
+        think = opts["think_ms"] / 1000
+        paths = {
+            "heartbeat": ("POST", f"sops/{sop}/view/", {"seconds_viewed": 5, "progress": 0.5}),
+            "whoami": ("GET", "me/whoami/", None),
+            "next": ("GET", f"attempts/{attempt}/next/", None),
+            "dashboard": ("GET", "me/dashboard/", None),
+            "leaderboard": ("GET", "leaderboard/", None),
+        }
+        await asyncio.sleep(rng.random() * think)  # don't all start on the same tick
+        while time.perf_counter() < deadline:
+            label = rng.choices(labels, weights)[0]
+            method, path, body = paths[label]
+            began = time.perf_counter()
+            status, _ = await conn.call(method, path, body)
+            samples.append((label, (time.perf_counter() - began) * 1000, status))
+            await asyncio.sleep(think * rng.uniform(0.5, 1.5))
+        conn.close()
+
+    @staticmethod
+    async def _request(conn, host, method, path, token, body):
+        reader, writer = conn
+        payload = b"" if body is None else json.dumps(body).encode()
+        head = (
+            f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nAuthorization: Bearer {token}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+        )
+        if body is not None:
+            head += "Content-Type: application/json\r\n"
+        writer.write(head.encode() + b"\r\n" + payload)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise asyncio.IncompleteReadError(b"", None)
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                chunk = await reader.readexactly(size + 2)
+                if not size:
+                    break
+                chunks.append(chunk[:-2])
+            data = b"".join(chunks)
+        else:
+            data = await reader.readexactly(int(headers.get("content-length", 0)))
+        return status, data, headers.get("connection", "").lower() != "close"
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _percentile(ordered, pct):
+        if not ordered:
+            return None
+        k = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+        return round(ordered[k], 2)
+
+    def _summarise(self, samples, elapsed):
+        ordered = sorted(ms for _, ms, _ in samples)
+        errors = sum(1 for _, _, status in samples if not 200 <= status < 300)
+        by_label = defaultdict(list)
+        for label, ms, _ in samples:
+            by_label[label].append(ms)
+        return {
+            "requests": len(samples),
+            "errors": errors,
+            "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else None,
+            "p50_ms": self._percentile(ordered, 50),
+            "p95_ms": self._percentile(ordered, 95),
+            "p99_ms": self._percentile(ordered, 99),
+            "p95_by_label_ms": {label: self._percentile(sorted(v), 95) for label, v in sorted(by_label.items())},
+        }
+
+    def _print_row(self, target, level, row):
+        def ms(value):
+            return "      -" if value is None else f"{value:>7.1f}"
+
+        self.stdout.write(
+            f"{target:<5} {level:>6} conns  {row['throughput_rps'] or 0:>8.1f} req/s  p50 {ms(row['p50_ms'])}ms  "
+            f"p95 {ms(row['p95_ms'])}ms  p99 {ms(row['p99_ms'])}ms  errors {row['errors']}/{row['requests']}"
+        )
+
+    def _print_capacity(self, report, targets, levels, slo_ms):
+        for target in targets:
+            held = [
+                level for level in levels
+                if (row := report[target][level])["requests"]
+                and row["errors"] <= row["requests"] * 0.01
+                and row["p99_ms"] is not None and row["p99_ms"] <= slo_ms
+            ]
+            report[target]["capacity"] = max(held) if held else 0
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{target}: holds {report[target]['capacity']} connections within p99 {slo_ms:.0f} ms "
+                    "and 1% errors"
+                )
+            )
@@ -0,0 +1,109 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import Org, User
+from api.serializers import QuestionPublicSerializer
+from learning import question_bank
+from learning.models import Choice, Module, ModuleAttempt, Question, Skill
+
+
+class _Rollback(Exception):
+    """Raised to discard the synthetic benchmark data."""
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark starting a module attempt: the old ORM + serializer path vs the cached "
+        "question bank. Runs in a transaction that is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--questions", type=int, default=500)
+        parser.add_argument("--choices", type=int, default=4)
+        parser.add_argument("--pool", type=int, default=None, help="question_pool_count (default: whole bank)")
+        parser.add_argument("--runs", type=int, default=20)
+
+    def handle(self, *args, **opts):
+        try:
+            with transaction.atomic():
+                user, module = self._seed(opts)
+                self._run("legacy", lambda: self._legacy(user, module), opts["runs"])
+                question_bank.get_bank(module)  # warm the cache, as a second request would find it
+                self._run("bank", lambda: self._bank(user, module), opts["runs"])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _seed(self, opts):
+        org = Org.objects.create(name=f"bench-attempt-start-{random.random():.8f}")
+        user = User.objects.create(username=f"bench-{org.id.hex[:8]}", org=org, password="!")
+        skill = Skill.objects.create(org=org, name="Bench")
+        module = Module.objects.create(
+            org=org, skill=skill, title="Bench module", require_viewed=False, question_pool_count=opts["pool"],
+        )
+        questions = Question.objects.bulk_create(
+            [Question(module=module, text=f"Question {i}", order=i) for i in range(opts["questions"])]
+        )
+        Choice.objects.bulk_create(
+            [
+                Choice(question=q, text=f"Choice {j}", is_correct=j == 0)
+                for q in questions
+                for j in range(opts["choices"])
+            ],
+            batch_size=1000,
+        )
+        question_bank.bump_version(module.id)
+        module.refresh_from_db()
+        self.stdout.write(f"Seeded {len(questions)} questions x {opts['choices']} choices")
+        return user, module
+
+    def _run(self, label, fn, runs):
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{label:>8}: median {statistics.median(timings):8.2f} ms  min {min(timings):8.2f} ms"
+            )
+        )
+
+    def _bank(self, user, module):
+        bank = question_bank.get_bank(module)
+        questions = [question_bank.public_question(bank, i, order) for i, order in question_bank.draw(bank, module)]
+        ModuleAttempt.objects.create(
+            user=user,
+            module=module,
+            presented_questions=[q["id"] for q in questions],
+            choice_order={q["id"]: [c["id"] for c in q["choices"]] for q in questions},
+        )
+        return questions
+
+    def _legacy(self, user, module):
+        """The previous _start_module_attempt_core body."""
+        qs = list(module.questions.prefetch_related("choices").all())
+        if module.question_pool_count and module.question_pool_count < len(qs):
+            qs = random.sample(qs, k=module.question_pool_count)
+        if module.shuffle_questions:
+            random.shuffle(qs)
+        choice_order = {}
+        for q in qs:
+            choices = list(q.choices.all())
+            if module.shuffle_choices:
+                random.shuffle(choices)
+            choice_order[str(q.id)] = [str(c.id) for c in choices]
+        ModuleAttempt.objects.create(
+            user=user, module=module, presented_questions=[str(q.id) for q in qs], choice_order=choice_order,
+        )
+        for q in qs:
+            ordered_ids = choice_order[str(q.id)]
+            all_choices = list(q.choices.all())
+            q._prefetched_objects_cache = {
+                "choices": [c for cid in ordered_ids for c in all_choices if str(c.id) == cid]
+            }
+        return QuestionPublicSerializer(qs, many=True).data
@@ -0,0 +1,159 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from accounts.models import Org, User
+from learning.badges import evaluate_group_badges
+from learning.models import Badge, Department, Team, TeamMember, UserBadge, XPEvent
+
+
+class _Rollback(Exception):
+    """Raised to discard the synthetic benchmark data."""
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark award_group_badges on synthetic data (default: 10k users, 500 badges). "
+        "Everything runs in a transaction that is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10_000)
+        parser.add_argument("--badges", type=int, default=500)
+        parser.add_argument("--team-size", type=int, default=20)
+        parser.add_argument("--teams-per-department", type=int, default=10)
+        parser.add_argument("--events-per-user", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--legacy",
+            action="store_true",
+            help="Also time the previous per-badge loop (slow: one get_or_create per member).",
+        )
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts["seed"])
+        try:
+            with transaction.atomic():
+                org = self._seed(rng, opts)
+                if opts["legacy"]:
+                    # Savepoint so both runners start from the same state
+                    try:
+                        with transaction.atomic():
+                            self._run("legacy", lambda: self._legacy(org))
+                            raise _Rollback
+                    except _Rollback:
+                        pass
+                self._run("set-based", lambda: self._set_based(org))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    # ------------------------------------------------------------------
+    # Data
+    # ------------------------------------------------------------------
+    def _seed(self, rng, opts):
+        started = time.perf_counter()
+        org = Org.objects.create(name=f"bench-group-badges-{rng.random():.8f}")
+
+        users = User.objects.bulk_create(
+            [User(username=f"bench-{org.id.hex[:8]}-{i}", org=org, password="!") for i in range(opts["users"])],
+            batch_size=1000,
+        )
+
+        n_teams = max(1, len(users) // opts["team_size"])
+        n_depts = max(1, n_teams // opts["teams_per_department"])
+        depts = Department.objects.bulk_create([Department(org=org, name=f"Dept {i}") for i in range(n_depts)])
+        teams = Team.objects.bulk_create(
+            [Team(org=org, department=depts[i % n_depts], name=f"Team {i}") for i in range(n_teams)]
+        )
+        TeamMember.objects.bulk_create(
+            [TeamMember(team=teams[i % n_teams], user=u) for i, u in enumerate(users)],
+            batch_size=1000,
+        )
+        XPEvent.objects.bulk_create(
+            [
+                XPEvent(user=u, org=org, source="quiz", amount=rng.randint(10, 300))
+                for u in users
+                for _ in range(opts["events_per_user"])
+            ],
+            batch_size=1000,
+        )
+
+        rule_types = [
+            "team_total_xp_at_least",
+            "department_total_xp_at_least",
+            "team_member_count_with_xp_at_least",
+        ]
+        badges = []
+        for i in range(opts["badges"]):
+            rt = rule_types[i % len(rule_types)]
+            if rt == "department_total_xp_at_least":
+                target = {"department": rng.choice(depts), "value": rng.randint(10_000, 80_000)}
+            elif rt == "team_total_xp_at_least":
+                target = {"team": rng.choice(teams), "value": rng.randint(2_000, 12_000)}
+            else:
+                target = {"team": rng.choice(teams), "value": rng.randint(10, 120)}
+            badges.append(Badge(org=org, code=f"B{i}", name=f"Bench badge {i}", rule_type=rt, **target))
+        Badge.objects.bulk_create(badges)
+
+        self.stdout.write(
+            f"Seeded {len(users)} users, {n_teams} teams, {n_depts} departments, "
+            f"{len(badges)} badges in {time.perf_counter() - started:.2f}s"
+        )
+        return org
+
+    # ------------------------------------------------------------------
+    # Runners
+    # ------------------------------------------------------------------
+    def _run(self, label, fn):
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            started = time.perf_counter()
+            awarded = fn()
+            elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"{label:>10}: {elapsed * 1000:9.1f} ms, {queries[0]:6d} queries, {awarded} awards")
+        )
+
+    def _set_based(self, org):
+        started = time.perf_counter()
+        plan = evaluate_group_badges(org_ids=[org.id])
+        self.stdout.write(f"{'evaluate':>10}: {(time.perf_counter() - started) * 1000:9.1f} ms")
+        rows = [UserBadge(user_id=uid, badge=b, meta={}) for b, ids in plan for uid in ids]
+        UserBadge.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+        return len(rows)
+
+    def _legacy(self, org):
+        """The pre-rewrite command: per-badge member/XP queries and get_or_create per member."""
+        awarded = 0
+        for badge in Badge.objects.filter(org=org):
+            if badge.rule_type == "department_total_xp_at_least":
+                team_ids = Team.objects.filter(department_id=badge.department_id).values_list("id", flat=True)
+                member_ids = list(
+                    TeamMember.objects.filter(team_id__in=team_ids, active=True).values_list("user_id", flat=True)
+                )
+            else:
+                member_ids = list(
+                    TeamMember.objects.filter(team_id=badge.team_id, active=True).values_list("user_id", flat=True)
+                )
+
+            if badge.rule_type == "team_member_count_with_xp_at_least":
+                totals = XPEvent.objects.filter(user_id__in=member_ids).values("user_id").annotate(s=Sum("amount"))
+                ok = sum(1 for t in totals if (t["s"] or 0) >= badge.value) >= len(member_ids)
+            else:
+                total = XPEvent.objects.filter(user_id__in=member_ids).aggregate(s=Sum("amount"))["s"] or 0
+                ok = total >= badge.value
+
+            if ok:
+                for uid in member_ids:
+                    _, created = UserBadge.objects.get_or_create(user_id=uid, badge=badge, defaults={"meta": {}})
+                    awarded += int(created)
+        return awarded
@@ -0,0 +1,60 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from learning.levels import LevelTable
+from learning.models import xp_for_next_level
+
+
+def _legacy_level(total: int) -> int:
+    """The previous learning.models.level_from_total_xp: walk the curve one level at a time."""
+    lvl, left = 1, total
+    while left >= xp_for_next_level(lvl):
+        left -= xp_for_next_level(lvl)
+        lvl += 1
+    return lvl
+
+
+class Command(BaseCommand):
+    help = (
+        "Microbenchmark level lookups: the old per-level loop vs the binary-searched "
+        "threshold table, single lookups and whole pages. Uses the curve only (no DB)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lookups", type=int, default=20_000)
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument(
+            "--max-xp",
+            type=int,
+            action="append",
+            default=[],
+            help="Upper bound for random XP totals. Repeat to test several ranges (default: 10^4, 10^6, 10^9).",
+        )
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts["seed"])
+        table = LevelTable.from_curve()
+        self.stdout.write(f"Ladder: {len(table.levels)} levels up to {table.thresholds[-1]:,} XP")
+
+        for max_xp in opts["max_xp"] or [10**4, 10**6, 10**9]:
+            totals = [rng.randint(0, max_xp) for _ in range(opts["lookups"])]
+            mismatches = sum(1 for t in totals[:1000] if _legacy_level(t) != table.level_for(t))
+            if mismatches:
+                raise CommandError(f"{mismatches} totals disagree with the legacy loop at max_xp={max_xp}")
+
+            pages = [totals[i:i + opts["page_size"]] for i in range(0, len(totals), opts["page_size"])]
+            self.stdout.write(f"max_xp={max_xp:,} ({len(totals)} lookups)")
+            self._time("legacy loop", lambda totals=totals: [_legacy_level(t) for t in totals], len(totals))
+            self._time("table", lambda totals=totals: [table.level_for(t) for t in totals], len(totals))
+            self._time("table/page", lambda pages=pages: [table.levels_for(p) for p in pages], len(totals))
+
+    def _time(self, label, fn, n):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"  {label:>12}: {elapsed * 1000:9.1f} ms  {elapsed / n * 1e9:9.0f} ns/lookup")
+        )
@@ -0,0 +1,305 @@
+import json
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+from django.db import connection, transaction
+
+from accounts.authentication import ClaimsTokenObtainPairSerializer
+from accounts.models import Org, User
+from learning import question_bank
+from learning.models import Choice, Module, Question, Skill
+from sops.models import SOP
+
+# Endpoint labels, in report order
+LABELS = ("start", "next", "submit", "finish", "heartbeat", "dashboard", "leaderboard", "xp_history")
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class _QueryCountingApp:
+    """WSGI wrapper recording how many queries each labelled request ran (in-process server only)."""
+
+    def __init__(self, app):
+        self.app = app
+        self.queries = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def __call__(self, environ, start_response):
+        count = 0
+
+        def counter(execute, sql, params, many, context):
+            nonlocal count
+            count += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(counter):
+            result = self.app(environ, start_response)
+        label = environ.get("HTTP_X_BENCH_LABEL")
+        if label:
+            with self.lock:
+                self.queries[label].append(count)
+        return result
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the quiz path: seeds a throwaway org, then concurrent clients run "
+        "start -> next -> submit -> finish plus SOP heartbeats, dashboard, leaderboard and XP history "
+        "against an in-process WSGI server (or --url). Reports p50/p95/p99 latency, queries per request "
+        "and throughput; --json saves a baseline and --baseline diffs against one. The seeded org is "
+        "deleted afterwards unless --keep."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20, help="Learners in the seeded org (default: 20).")
+        parser.add_argument("--modules", type=int, default=3)
+        parser.add_argument("--questions", type=int, default=40, help="Questions per module (default: 40).")
+        parser.add_argument("--pool", type=int, default=10, help="question_pool_count per module (default: 10).")
+        parser.add_argument("--choices", type=int, default=4)
+        parser.add_argument("--clients", type=int, default=8, help="Concurrent clients (default: 8).")
+        parser.add_argument("--rounds", type=int, default=2, help="Attempts per user (default: 2).")
+        parser.add_argument("--correct", type=float, default=0.8, help="Chance of answering correctly (default: 0.8).")
+        parser.add_argument(
+            "--url",
+            help="Drive an already running server (sharing this database) instead of an in-process one. "
+                 "Queries per request are only reported for the in-process server.",
+        )
+        parser.add_argument("--json", metavar="PATH", help="Write the results to this file (a baseline).")
+        parser.add_argument("--baseline", metavar="PATH", help="Compare against results saved with --json.")
+        parser.add_argument("--seed", type=int, default=None, help="Random seed for the client choices.")
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded org afterwards.")
+
+    def handle(self, *args, **opts):
+        rng = random.Random(opts["seed"])
+        org, users, modules, sop, correct = self._seed(opts)
+        server = app = None
+        try:
+            if opts["url"]:
+                parts = urlsplit(opts["url"])
+                host, port = parts.hostname, parts.port or 80
+            else:
+                server, app = self._serve()
+                host, port = server.server_address[:2]
+
+            tokens = [
+                (str(ClaimsTokenObtainPairSerializer.get_token(u).access_token), random.Random(rng.random()))
+                for u in users
+            ]
+            samples = []
+            lock = threading.Lock()
+
+            def client(token_rng):
+                token, crng = token_rng
+                for _ in range(opts["rounds"]):
+                    local = self._session(host, port, token, crng, modules, sop, correct, opts["correct"])
+                    with lock:
+                        samples.extend(local)
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=opts["clients"]) as pool:
+                for f in [pool.submit(client, t) for t in tokens]:
+                    f.result()
+            elapsed = time.perf_counter() - started
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+            if not opts["keep"]:
+                org.delete()
+
+        report = self._summarise(samples, elapsed, app.queries if app else {}, opts)
+        self._print(report)
+        if opts["baseline"]:
+            try:
+                with open(opts["baseline"]) as fh:
+                    baseline = json.load(fh)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Could not read baseline {opts['baseline']}: {exc}")
+            self._compare(report, baseline)
+        if opts["json"]:
+            with open(opts["json"], "w") as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"Wrote {opts['json']}")
+
+    # ------------------------------------------------------------------
+    # Setup
+    # ------------------------------------------------------------------
+    @transaction.atomic
+    def _seed(self, opts):
+        org = Org.objects.create(name=f"bench-quiz-{uuid.uuid4().hex[:8]}")
+        users = User.objects.bulk_create(
+            [User(username=f"{org.name}-u{i}", org=org, password="!") for i in range(opts["users"])]
+        )
+        skill = Skill.objects.create(org=org, name="Bench skill")
+        modules = []
+        for m in range(opts["modules"]):
+            module = Module.objects.create(
+                org=org,
+                skill=skill,
+                title=f"Bench module {m}",
+                require_viewed=False,
+                question_pool_count=opts["pool"],
+                feedback_mode="immediate",
+            )
+            questions = Question.objects.bulk_create(
+                [Question(module=module, text=f"Q{i}", order=i) for i in range(opts["questions"])]
+            )
+            Choice.objects.bulk_create(
+                [Choice(question=q, text=f"C{j}", is_correct=j == 0) for q in questions for j in range(opts["choices"])],
+                batch_size=1000,
+            )
+            question_bank.bump_version(module.id)
+            modules.append(str(module.id))
+        sop = SOP.objects.create(org=org, code="BENCH-1", title="Bench SOP", status="published")
+        correct = {
+            str(qid): str(cid)
+            for cid, qid in Choice.objects.filter(question__module__org=org, is_correct=True).values_list("id", "question_id")
+        }
+        self.stdout.write(
+            f"Seeded {org.name}: {len(users)} users, {len(modules)} modules x {opts['questions']} questions "
+            f"(pool {opts['pool']})"
+        )
+        return org, users, modules, str(sop.id), correct
+
+    def _serve(self):
+        app = _QueryCountingApp(get_internal_wsgi_application())
+        server = ThreadedWSGIServer(("127.0.0.1", 0), _QuietHandler, allow_reuse_address=False)
+        server.set_app(app)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server, app
+
+    # ------------------------------------------------------------------
+    # One client session
+    # ------------------------------------------------------------------
+    def _session(self, host, port, token, rng, modules, sop, correct, p_correct):
+        samples = []
+
+        def call(label, method, path, body=None):
+            conn = HTTPConnection(host, port, timeout=60)
+            headers = {"Authorization": f"Bearer {token}", "X-Bench-Label": label}
+            payload = None
+            if body is not None:
+                payload = json.dumps(body)
+                headers["Content-Type"] = "application/json"
+            started = time.perf_counter()
+            try:
+                conn.request(method, f"/api/{path}", body=payload, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+                status = resp.status
+            except OSError:
+                data, status = b"", 0
+            finally:
+                conn.close()
+            samples.append((label, (time.perf_counter() - started) * 1000, status))
+            try:
+                return json.loads(data) if 200 <= status < 300 else None
+            except ValueError:
+                return None
+
+        started = call("start", "POST", f"modules/{rng.choice(modules)}/start/")
+        if started:
+            attempt = started["attempt_id"]
+            while True:
+                nxt = call("next", "GET", f"attempts/{attempt}/next/")
+                if not nxt or nxt.get("done") or not nxt.get("question"):
+                    break
+                q = nxt["question"]
+                right = correct.get(q["id"])
+                choice = right if rng.random() < p_correct else rng.choice([c["id"] for c in q["choices"]])
+                if not call("submit", "POST", f"attempts/{attempt}/submit/", {"question_id": q["id"], "choice_ids": [choice]}):
+                    break
+            call("finish", "POST", f"attempts/{attempt}/finish/")
+
+        for seconds in (5, 5, 5):
+            call("heartbeat", "POST", f"sops/{sop}/view/", {"seconds_viewed": seconds, "progress": rng.random()})
+        call("dashboard", "GET", "me/dashboard/")
+        call("leaderboard", "GET", "leaderboard/")
+        call("xp_history", "GET", "me/xp-history/?period=week")
+        return samples
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _percentile(ordered, pct):
+        if not ordered:
+            return None
+        k = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+        return round(ordered[k], 2)
+
+    def _summarise(self, samples, elapsed, queries, opts):
+        by_label = defaultdict(list)
+        errors = defaultdict(int)
+        for label, ms, status in samples:
+            by_label[label].append(ms)
+            if not 200 <= status < 300:
+                errors[label] += 1
+
+        endpoints = {}
+        for label in LABELS:
+            ordered = sorted(by_label.get(label, []))
+            if not ordered:
+                continue
+            counts = queries.get(label)
+            endpoints[label] = {
+                "requests": len(ordered),
+                "errors": errors[label],
+                "p50_ms": self._percentile(ordered, 50),
+                "p95_ms": self._percentile(ordered, 95),
+                "p99_ms": self._percentile(ordered, 99),
+                "queries": round(sum(counts) / len(counts), 1) if counts else None,
+            }
+        return {
+            "config": {k: opts[k] for k in ("users", "modules", "questions", "pool", "choices", "clients", "rounds")},
+            "elapsed_s": round(elapsed, 2),
+            "requests": len(samples),
+            "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else None,
+            "endpoints": endpoints,
+        }
+
+    def _print(self, report):
+        self.stdout.write(f"{'endpoint':<12} {'reqs':>6} {'err':>5} {'p50':>9} {'p95':>9} {'p99':>9} {'queries':>8}")
+        for label, row in report["endpoints"].items():
+            queries = "-" if row["queries"] is None else f"{row['queries']:.1f}"
+            self.stdout.write(
+                f"{label:<12} {row['requests']:>6} {row['errors']:>5} {row['p50_ms']:>7.2f}ms "
+                f"{row['p95_ms']:>7.2f}ms {row['p99_ms']:>7.2f}ms {queries:>8}"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{report['requests']} requests in {report['elapsed_s']} s: {report['throughput_rps']} req/s"
+            )
+        )
+
+    def _compare(self, report, baseline):
+        if baseline.get("config") != report["config"]:
+            self.stdout.write(self.style.WARNING("Baseline was recorded with a different configuration."))
+
+        def delta(new, old):
+            if new is None or old in (None, 0):
+                return "     n/a"
+            return f"{(new - old) / old * 100:+7.1f}%"
+
+        self.stdout.write(f"{'vs baseline':<12} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8}")
+        for label, row in report["endpoints"].items():
+            old = baseline.get("endpoints", {}).get(label)
+            if old is None:
+                self.stdout.write(f"{label:<12} (new)")
+                continue
+            self.stdout.write(
+                f"{label:<12} {delta(row['p50_ms'], old['p50_ms'])} {delta(row['p95_ms'], old['p95_ms'])} "
+                f"{delta(row['p99_ms'], old['p99_ms'])} {delta(row['queries'], old.get('queries'))}"
+            )
+        self.stdout.write(f"throughput   {delta(report['throughput_rps'], baseline.get('throughput_rps'))}")
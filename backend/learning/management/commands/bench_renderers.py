@@ -0,0 +1,110 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from accounts.models import Org, User
+from api.renderers import ORJSONRenderer, orjson
+from learning import question_bank
+from learning.models import Choice, Module, ModuleAttempt, Question, Skill, XPEvent
+
+
+class _Rollback(Exception):
+    """Raised to discard the synthetic benchmark data."""
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark JSON encoding of the main API payloads: DRF's JSONRenderer vs the orjson renderer. "
+        "Payloads come from real requests against seeded data; reports response size and median "
+        "encode time. Runs in a transaction that is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=500)
+        parser.add_argument("--events", type=int, default=20000)
+        parser.add_argument("--questions", type=int, default=200)
+        parser.add_argument("--runs", type=int, default=20)
+
+    def handle(self, *args, **opts):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING("orjson is not installed; the renderer falls back to DRF."))
+        try:
+            with transaction.atomic():
+                user, module = self._seed(opts)
+                client = APIClient(SERVER_NAME="localhost")
+                client.force_authenticate(user)
+                endpoints = [
+                    ("leaderboard", "get", "/api/leaderboard/?page_size=500"),
+                    ("xp_events", "get", "/api/xp/?page_size=500"),
+                    ("my_attempts", "get", "/api/me/module-attempts/?page_size=500"),
+                    ("modules", "get", "/api/modules/"),
+                    ("start", "post", f"/api/modules/{module.id}/start/"),
+                    ("xp_history", "get", "/api/me/xp-history/?period=day"),
+                    ("dashboard", "get", "/api/me/dashboard/"),
+                ]
+                self.stdout.write(f"{'endpoint':>12} {'bytes':>9} {'drf ms':>9} {'orjson ms':>10} {'speedup':>8}")
+                for label, method, url in endpoints:
+                    resp = getattr(client, method)(url)
+                    if resp.status_code >= 400:
+                        self.stdout.write(self.style.WARNING(f"{label}: HTTP {resp.status_code}, skipped"))
+                        continue
+                    self._compare(label, resp.data, opts["runs"])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _seed(self, opts):
+        org = Org.objects.create(name=f"bench-renderers-{random.random():.8f}")
+        users = User.objects.bulk_create(
+            [User(username=f"bench-ren-{org.id}-{i}", org=org, password="!") for i in range(opts["users"])]
+        )
+        skill = Skill.objects.create(org=org, name="Bench")
+        module = Module.objects.create(org=org, skill=skill, title="Bench module", require_viewed=False)
+        XPEvent.objects.bulk_create(
+            [
+                XPEvent(user=random.choice(users), org=org, skill=skill, source="quiz", amount=random.randint(1, 50))
+                for _ in range(opts["events"])
+            ],
+            batch_size=1000,
+        )
+        ModuleAttempt.objects.bulk_create(
+            [ModuleAttempt(user=users[0], module=module, score=random.randint(0, 100)) for _ in range(500)]
+        )
+        questions = Question.objects.bulk_create(
+            [Question(module=module, text=f"Question {i} – “quoted” ✓", order=i) for i in range(opts["questions"])]
+        )
+        Choice.objects.bulk_create(
+            [Choice(question=q, text=f"Choice {j}", is_correct=j == 0) for q in questions for j in range(4)]
+        )
+        question_bank.bump_version(module.id)
+        user = users[0]
+        user.biz_role = "manager"
+        user.save(update_fields=["biz_role"])
+        self.stdout.write(f"Seeded {len(users)} users, {opts['events']} XP events, {len(questions)} questions")
+        return user, module
+
+    def _compare(self, label, data, runs):
+        drf, fast = JSONRenderer(), ORJSONRenderer()
+        body = drf.render(data)
+        if json.loads(fast.render(data)) != json.loads(body):
+            self.stdout.write(self.style.WARNING(f"{label}: orjson output decodes differently"))
+        slow = self._median(lambda: drf.render(data), runs)
+        quick = self._median(lambda: fast.render(data), runs)
+        self.stdout.write(
+            self.style.SUCCESS(f"{label:>12} {len(body):>9,} {slow:>9.3f} {quick:>10.3f} {slow / quick:>7.1f}x")
+        )
+
+    @staticmethod
+    def _median(fn, runs):
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
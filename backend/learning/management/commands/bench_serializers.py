@@ -0,0 +1,114 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import Org, User
+from api import fast_serializers
+from api.serializers import ModuleAttemptMeSerializer, UserBadgeSerializer, XPEventSerializer
+from learning.models import Badge, Module, ModuleAttempt, Skill, UserBadge, XPEvent
+
+
+class _Rollback(Exception):
+    """Raised to discard the synthetic benchmark data."""
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the hot list shapes: DRF serializers over model instances vs the values()-based "
+        "read serializers in api.fast_serializers (query included). Runs in a transaction that is "
+        "rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--runs", type=int, default=5)
+
+    def handle(self, *args, **opts):
+        try:
+            with transaction.atomic():
+                org = self._seed(opts["rows"])
+                cases = [
+                    (
+                        "xp_events",
+                        XPEventSerializer,
+                        XPEvent.objects.filter(org=org).select_related("user", "skill", "org"),
+                        fast_serializers.XPEventFast,
+                    ),
+                    (
+                        "attempts",
+                        ModuleAttemptMeSerializer,
+                        ModuleAttempt.objects.filter(module__org=org).select_related("module"),
+                        fast_serializers.ModuleAttemptMeFast,
+                    ),
+                    (
+                        "user_badges",
+                        UserBadgeSerializer,
+                        UserBadge.objects.filter(badge__org=org).select_related(
+                            "badge", "badge__skill", "badge__team", "badge__department"
+                        ),
+                        fast_serializers.UserBadgeFast,
+                    ),
+                ]
+                for label, drf, queryset, fast in cases:
+                    queryset = queryset.order_by("id")
+                    self._check(label, drf, queryset, fast)
+                    slow = self._run(lambda drf=drf, qs=queryset: drf(qs.all(), many=True).data, opts["runs"])
+                    quick = self._run(lambda fast=fast, qs=queryset: fast.serialize(qs.all()), opts["runs"])
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f"{label:>12}: drf {slow:>9,.0f} rows/s  fast {quick:>9,.0f} rows/s  "
+                            f"x{quick / slow:.1f}"
+                        )
+                    )
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _seed(self, rows):
+        org = Org.objects.create(name=f"bench-serializers-{random.random():.8f}")
+        users = User.objects.bulk_create(
+            [User(username=f"bench-ser-{org.id}-{i}", org=org, password="!") for i in range(100)]
+        )
+        skill = Skill.objects.create(org=org, name="Bench")
+        module = Module.objects.create(org=org, skill=skill, title="Bench module", require_viewed=False)
+        XPEvent.objects.bulk_create(
+            [
+                XPEvent(user=users[i % 100], org=org, skill=skill if i % 2 else None, source="quiz", amount=5)
+                for i in range(rows)
+            ],
+            batch_size=1000,
+        )
+        ModuleAttempt.objects.bulk_create(
+            [ModuleAttempt(user=users[i % 100], module=module, score=i % 101) for i in range(rows)],
+            batch_size=1000,
+        )
+        badges = Badge.objects.bulk_create(
+            [
+                Badge(org=org, code=f"b{i}", name=f"Badge {i}", rule_type="overall_xp_at_least", skill=skill)
+                for i in range(rows // 100 + 1)
+            ]
+        )
+        UserBadge.objects.bulk_create(
+            [UserBadge(user=users[i % 100], badge=badges[i // 100]) for i in range(rows)], batch_size=1000,
+        )
+        self.stdout.write(f"Seeded {rows} rows per shape")
+        return org
+
+    def _check(self, label, drf, queryset, fast):
+        render = JSONRenderer().render
+        if json.loads(render(drf(queryset[:200], many=True).data)) != json.loads(render(fast.serialize(queryset[:200]))):
+            self.stdout.write(self.style.WARNING(f"{label}: fast output differs from DRF"))
+
+    def _run(self, fn, runs):
+        timings = []
+        rows = 0
+        for _ in range(runs):
+            started = time.perf_counter()
+            rows = len(fn())
+            timings.append(time.perf_counter() - started)
+        return rows / statistics.median(timings)
@@ -0,0 +1,30 @@
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Org
+from learning import xp_history
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the daily/weekly XP rollups behind the XP history charts from XPEvent. "
+        "Needed once after deploying, and after editing XP events in place by hand."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--org", help="Only rebuild this org (id or name).")
+
+    def handle(self, *args, **opts):
+        org_id = None
+        if opts["org"]:
+            try:
+                org = Org.objects.get(id=uuid.UUID(opts["org"]))
+            except (ValueError, Org.DoesNotExist):
+                org = Org.objects.filter(name=opts["org"]).first()
+            if org is None:
+                raise CommandError(f"Unknown org: {opts['org']}")
+            org_id = org.id
+
+        rows = xp_history.rebuild(org_id)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} XP history rows"))
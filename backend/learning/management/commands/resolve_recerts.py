@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from learning import recerts
+from learning.models import RecertRequirement
+
+
+class Command(BaseCommand):
+    help = (
+        "Resolve open recert requirements that recorded passes already satisfy: a passed module "
+        "attempt for the requirement's skill or SOP, after the requirement was raised. New passes "
+        "resolve requirements as they happen; this back-fills the ones from before that."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=recerts.BATCH_SIZE,
+            help=f"Requirements per UPDATE (default: {recerts.BATCH_SIZE}).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report how many would be resolved without writing anything.",
+        )
+
+    def handle(self, *args, **opts):
+        if opts["dry_run"]:
+            n = recerts.satisfied().count()
+            self.stdout.write(self.style.WARNING(f"Dry run: {n} open requirements would be resolved"))
+            return
+
+        total = RecertRequirement.objects.filter(resolved=False).count()
+
+        def on_batch(scanned, resolved):
+            self.stdout.write(f"  {scanned}/{total} scanned, {resolved} resolved")
+
+        scanned, resolved = recerts.backfill(opts["batch_size"], on_batch=on_batch)
+        self.stdout.write(self.style.SUCCESS(f"Resolved {resolved} of {scanned} open recert requirements"))
@@ -0,0 +1,42 @@
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from learning import analytics
+from learning.models import Module
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold completed attempts into per-question item statistics (p-value, discrimination, "
+        "distractor rates, median time, change rate). Only attempts not analysed yet are read; "
+        "run it from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--module", help="Only analyse this module (id).")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=analytics.BATCH_SIZE,
+            help=f"Attempts per transaction (default: {analytics.BATCH_SIZE}).",
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Discard the stored statistics and analyse every completed attempt again.",
+        )
+
+    def handle(self, *args, **opts):
+        module_id = None
+        if opts["module"]:
+            try:
+                module_id = Module.objects.get(id=uuid.UUID(opts["module"])).id
+            except (ValueError, Module.DoesNotExist):
+                raise CommandError(f"Unknown module: {opts['module']}")
+
+        if opts["rebuild"]:
+            done = analytics.rebuild(module_id, opts["batch_size"])
+        else:
+            done = analytics.rollup(module_id, opts["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Analysed {done} attempts"))
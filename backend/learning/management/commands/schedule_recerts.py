@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from learning import recerts
+
+
+class Command(BaseCommand):
+    help = (
+        "Raise expiry recertifications: fold passes (module attempts, supervisor signoffs) recorded "
+        "since the last run into per-user skill certifications, resolve expiry recerts renewed by a "
+        "newer pass, and raise one for every certification running out within its lead time "
+        "(RECERT_LEAD_DAYS by skill risk level). Run it daily from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=recerts.BATCH_SIZE,
+            help=f"Rows per transaction (default: {recerts.BATCH_SIZE}).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the certifications that are due without writing anything (passes aren't synced).",
+        )
+
+    def handle(self, *args, **opts):
+        if opts["dry_run"]:
+            due = recerts.due().values("skill__risk_level").annotate(n=Count("id")).order_by("skill__risk_level")
+            summary = ", ".join(f"{row['n']} {row['skill__risk_level']}-risk" for row in due) or "none"
+            self.stdout.write(self.style.WARNING(f"Dry run: due for recertification: {summary} (nothing written)"))
+            return
+
+        synced = recerts.sync(opts["batch_size"])
+        raised = recerts.schedule(batch_size=opts["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Read {synced['passes']} passes, updated {synced['certified']} certifications, "
+                f"resolved {synced['resolved']} recerts, raised {raised} recerts"
+            )
+        )
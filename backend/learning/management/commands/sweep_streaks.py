@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from learning import streaks
+
+
+class Command(BaseCommand):
+    help = (
+        "Daily streak sweep: award streak XP to streaks that reached a milestone (STREAK_XP, at most "
+        "once per streak and milestone) and close streaks with no activity yesterday or today. "
+        "Run it once a day from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=streaks.BATCH_SIZE,
+            help=f"Streaks per transaction when awarding XP (default: {streaks.BATCH_SIZE}).",
+        )
+
+    def handle(self, *args, **opts):
+        awards, closed = streaks.sweep(batch_size=opts["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Awarded {awards} streak milestones, closed {closed} streaks"))
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_group_xp_totals(apps, schema_editor):
+    Team = apps.get_model("learning", "Team")
+    TeamMember = apps.get_model("learning", "TeamMember")
+    XPEvent = apps.get_model("learning", "XPEvent")
+    TeamXPTotal = apps.get_model("learning", "TeamXPTotal")
+    DepartmentXPTotal = apps.get_model("learning", "DepartmentXPTotal")
+
+    xp_by_user = {
+        (row["org_id"], row["user_id"]): row["total"] or 0
+        for row in XPEvent.objects.values("org_id", "user_id").annotate(total=models.Sum("amount"))
+    }
+    team_users = {}
+    for team_id, user_id in TeamMember.objects.filter(active=True).values_list("team_id", "user_id"):
+        team_users.setdefault(team_id, set()).add(user_id)
+
+    dept_users = {}
+    dept_org = {}
+    team_rows = []
+    for team in Team.objects.values("id", "org_id", "department_id"):
+        users = team_users.get(team["id"], set())
+        total = sum(xp_by_user.get((team["org_id"], uid), 0) for uid in users)
+        team_rows.append(TeamXPTotal(team_id=team["id"], total_xp=total))
+        if team["department_id"]:
+            dept_users.setdefault(team["department_id"], set()).update(users)
+            dept_org[team["department_id"]] = team["org_id"]
+
+    TeamXPTotal.objects.bulk_create(team_rows, batch_size=500)
+    DepartmentXPTotal.objects.bulk_create(
+        [
+            DepartmentXPTotal(
+                department_id=did,
+                total_xp=sum(xp_by_user.get((dept_org[did], uid), 0) for uid in users),
+            )
+            for did, users in dept_users.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0015_alter_module_feedback_mode'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepartmentXPTotal',
+            fields=[
+                ('department', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='xp_total', serialize=False, to='learning.department')),
+                ('total_xp', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TeamXPTotal',
+            fields=[
+                ('team', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='xp_total', serialize=False, to='learning.team')),
+                ('total_xp', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_group_xp_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_member_counts_and_thresholds(apps, schema_editor):
+    Team = apps.get_model("learning", "Team")
+    TeamMember = apps.get_model("learning", "TeamMember")
+    XPEvent = apps.get_model("learning", "XPEvent")
+    Badge = apps.get_model("learning", "Badge")
+    TeamXPTotal = apps.get_model("learning", "TeamXPTotal")
+    TeamXPThresholdCount = apps.get_model("learning", "TeamXPThresholdCount")
+
+    team_users = {}
+    for team_id, user_id in TeamMember.objects.filter(active=True).values_list("team_id", "user_id"):
+        team_users.setdefault(team_id, set()).add(user_id)
+
+    for row in TeamXPTotal.objects.all():
+        row.member_count = len(team_users.get(row.team_id, ()))
+        row.save(update_fields=["member_count"])
+
+    thresholds = set(
+        Badge.objects.filter(rule_type="team_member_count_with_xp_at_least", team__isnull=False).values_list(
+            "team_id", "value"
+        )
+    )
+    if not thresholds:
+        return
+
+    team_org = dict(Team.objects.values_list("id", "org_id"))
+    xp_by_user = {
+        (row["org_id"], row["user_id"]): row["total"] or 0
+        for row in XPEvent.objects.values("org_id", "user_id").annotate(total=models.Sum("amount"))
+    }
+    TeamXPThresholdCount.objects.bulk_create(
+        [
+            TeamXPThresholdCount(
+                team_id=team_id,
+                threshold=value,
+                members_at_or_above=sum(
+                    1 for uid in team_users.get(team_id, ()) if xp_by_user.get((team_org[team_id], uid), 0) >= value
+                ),
+            )
+            for team_id, value in thresholds
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0016_teamxptotal_departmentxptotal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='teamxptotal',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='TeamXPThresholdCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('threshold', models.PositiveIntegerField()),
+                ('members_at_or_above', models.PositiveIntegerField(default=0)),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='xp_threshold_counts', to='learning.team')),
+            ],
+            options={
+                'unique_together': {('team', 'threshold')},
+            },
+        ),
+        migrations.RunPython(backfill_member_counts_and_thresholds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0017_teamxpthresholdcount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='module',
+            name='content_version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0018_module_content_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moduleattempt',
+            name='bank_version',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='moduleattempt',
+            name='seed',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0019_moduleattempt_seed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttemptAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField()),
+                ('choices', models.PositiveBigIntegerField(default=0)),
+                ('time_taken', models.FloatField(default=0.0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('attempt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_log', to='learning.moduleattempt')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
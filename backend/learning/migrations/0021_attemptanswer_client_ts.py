@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0020_attemptanswer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attemptanswer',
+            name='client_ts',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='attemptanswer',
+            constraint=models.UniqueConstraint(condition=models.Q(('client_ts__isnull', False)), fields=('attempt', 'position', 'client_ts'), name='uniq_attempt_answer_client_ts'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0021_attemptanswer_client_ts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='learning.question')),
+                ('responses', models.PositiveIntegerField(default=0)),
+                ('correct_count', models.PositiveIntegerField(default=0)),
+                ('changed_count', models.PositiveIntegerField(default=0)),
+                ('score_sum', models.BigIntegerField(default=0)),
+                ('score_sq_sum', models.BigIntegerField(default=0)),
+                ('correct_score_sum', models.BigIntegerField(default=0)),
+                ('time_histogram', models.JSONField(blank=True, default=dict)),
+                ('choice_counts', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='moduleattempt',
+            name='analysed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='moduleattempt',
+            index=models.Index(condition=models.Q(('analysed_at__isnull', True), ('completed_at__isnull', False)), fields=['completed_at'], name='attempt_pending_analysis_idx'),
+        ),
+        migrations.AddField(
+            model_name='questionstats',
+            name='module',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_stats', to='learning.module'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from datetime import timedelta
+
+from django.utils import timezone
+
+
+def backfill_xp_rollups(apps, schema_editor):
+    XPEvent = apps.get_model("learning", "XPEvent")
+    XPRollup = apps.get_model("learning", "XPRollup")
+
+    totals = {}
+    for created_at, org_id, user_id, skill_id, amount in XPEvent.objects.values_list(
+        "created_at", "org_id", "user_id", "skill_id", "amount"
+    ).iterator():
+        day = timezone.localdate(created_at)
+        scopes = [(user_id, None), (None, None)]
+        if skill_id:
+            scopes += [(user_id, skill_id), (None, skill_id)]
+        for period, bucket in (("day", day), ("week", day - timedelta(days=day.weekday()))):
+            for scope_user, scope_skill in scopes:
+                key = (period, bucket, org_id, scope_user, scope_skill)
+                prev_amount, prev_events = totals.get(key, (0, 0))
+                totals[key] = (prev_amount + amount, prev_events + 1)
+
+    XPRollup.objects.bulk_create(
+        [
+            XPRollup(period=period, bucket=bucket, org_id=org_id, user_id=user_id, skill_id=skill_id,
+                     amount=amount, events=events)
+            for (period, bucket, org_id, user_id, skill_id), (amount, events) in totals.items()
+            if amount
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0001_initial'),
+        ('learning', '0022_question_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='XPRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'day'), ('week', 'week')], max_length=4)),
+                ('bucket', models.DateField()),
+                ('amount', models.BigIntegerField(default=0)),
+                ('events', models.PositiveIntegerField(default=0)),
+                ('org', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.org')),
+                ('skill', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='learning.skill')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='xprollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('skill__isnull', True), ('user__isnull', False)), fields=('period', 'org', 'user', 'bucket'), name='uniq_xp_rollup_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='xprollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('skill__isnull', False), ('user__isnull', False)), fields=('period', 'org', 'user', 'skill', 'bucket'), name='uniq_xp_rollup_user_skill'),
+        ),
+        migrations.AddConstraint(
+            model_name='xprollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('skill__isnull', True), ('user__isnull', True)), fields=('period', 'org', 'bucket'), name='uniq_xp_rollup_org'),
+        ),
+        migrations.AddConstraint(
+            model_name='xprollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('skill__isnull', False), ('user__isnull', True)), fields=('period', 'org', 'skill', 'bucket'), name='uniq_xp_rollup_org_skill'),
+        ),
+        migrations.RunPython(backfill_xp_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0001_initial'),
+        ('learning', '0023_xprollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='XPEventArchive',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('source', models.CharField(max_length=40)),
+                ('amount', models.PositiveIntegerField()),
+                ('meta', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='xpevent',
+            name='source',
+            field=models.CharField(choices=[('module_pass', 'module_pass'), ('quiz', 'quiz'), ('streak', 'streak'), ('supervisor_signoff', 'supervisor_signoff'), ('evidence', 'evidence'), ('opening_balance', 'opening_balance')], max_length=40),
+        ),
+        migrations.AddIndex(
+            model_name='xpevent',
+            index=models.Index(fields=['created_at'], name='xpevent_created_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='xpeventarchive',
+            name='org',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.org'),
+        ),
+        migrations.AddField(
+            model_name='xpeventarchive',
+            name='skill',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='learning.skill'),
+        ),
+        migrations.AddField(
+            model_name='xpeventarchive',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='xpeventarchive',
+            index=models.Index(fields=['user', 'source'], name='xparchive_user_source_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:52
+
+from django.db import migrations, models
+
+
+def backfill_pass_keys(apps, schema_editor):
+    """Key existing module-pass awards so they can't be awarded again (first award per module wins)."""
+    for name in ("XPEvent", "XPEventArchive"):
+        model = apps.get_model("learning", name)
+        seen = set()
+        keyed = []
+        for event in model.objects.filter(source="module_pass").order_by("created_at").only("id", "user_id", "meta"):
+            module_id = (event.meta or {}).get("module")
+            if not module_id or (event.user_id, module_id) in seen:
+                continue
+            seen.add((event.user_id, module_id))
+            event.idempotency_key = f"module_pass:{module_id}"
+            keyed.append(event)
+        model.objects.bulk_update(keyed, ["idempotency_key"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0024_xpeventarchive'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='xpeventarchive',
+            name='xparchive_user_source_idx',
+        ),
+        migrations.AddField(
+            model_name='xpevent',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='xpeventarchive',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.RunPython(backfill_pass_keys, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='xpevent',
+            constraint=models.UniqueConstraint(condition=models.Q(('idempotency_key__isnull', False)), fields=('user', 'idempotency_key'), name='uniq_xpevent_user_idempotency_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='xpeventarchive',
+            constraint=models.UniqueConstraint(condition=models.Q(('idempotency_key__isnull', False)), fields=('user', 'idempotency_key'), name='uniq_xparchive_user_idempotency_key'),
+        ),
+    ]
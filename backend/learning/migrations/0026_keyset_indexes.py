@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0025_xpevent_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='moduleattempt',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='attempt_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userbadge',
+            index=models.Index(fields=['user', '-awarded_at', '-id'], name='userbadge_user_awarded_idx'),
+        ),
+    ]
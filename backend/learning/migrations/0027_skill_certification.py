@@ -0,0 +1,70 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0002_user_token_version'),
+        ('learning', '0026_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecertCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=10, unique=True)),
+                ('synced_to', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SkillCertification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('attempt', 'attempt'), ('signoff', 'signoff')], max_length=10)),
+                ('certified_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='moduleattempt',
+            index=models.Index(condition=models.Q(('passed', True)), fields=['completed_at', 'id'], name='attempt_passed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='supervisorsignoff',
+            index=models.Index(fields=['created_at', 'id'], name='signoff_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='skillcertification',
+            name='org',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.org'),
+        ),
+        migrations.AddField(
+            model_name='skillcertification',
+            name='requirement',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='certification', to='learning.recertrequirement'),
+        ),
+        migrations.AddField(
+            model_name='skillcertification',
+            name='skill',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='learning.skill'),
+        ),
+        migrations.AddField(
+            model_name='skillcertification',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='skillcertification',
+            index=models.Index(condition=models.Q(('requirement__isnull', True)), fields=['expires_at'], name='cert_expiry_due_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='skillcertification',
+            constraint=models.UniqueConstraint(fields=('user', 'skill'), name='uniq_skill_certification'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('learning', '0027_skill_certification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recertrequirement',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='recertrequirement',
+            index=models.Index(condition=models.Q(('resolved', False)), fields=['user'], name='recert_open_user_idx'),
+        ),
+    ]
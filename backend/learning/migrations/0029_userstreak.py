@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('learning', '0028_recert_resolution'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStreak',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('current', models.PositiveIntegerField(default=0)),
+                ('longest', models.PositiveIntegerField(default=0)),
+                ('last_active', models.DateField(blank=True, null=True)),
+                ('rewarded', models.PositiveIntegerField(default=0)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='streak', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('current__gt', 0)), fields=['last_active'], name='streak_open_idx')],
+            },
+        ),
+    ]
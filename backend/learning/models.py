@@ -15,11 +15,10 @@ def xp_for_next_level(level: int) -> int:
 
 
 def level_from_total_xp(total: int) -> int:
-    lvl, left = 1, total
-    while left >= xp_for_next_level(lvl):
-        left -= xp_for_next_level(lvl)
-        lvl += 1
-    return lvl
+    # Kept for callers of the old helper; see learning.levels
+    from .levels import level_for
+
+    return level_for(total)
 
 
 class JobRole(models.Model):
@@ -87,6 +86,8 @@ class Module(models.Model):
         default="end",
         help_text="Controls when the learner sees feedback for quiz questions.",
     )
+    # Bumped whenever questions/choices change; keys the cached question bank
+    content_version = models.PositiveIntegerField(default=1, editable=False)
 
     def __str__(self):
         return self.title
@@ -113,9 +114,27 @@ class ModuleAttempt(models.Model):
     answers = models.JSONField(default=dict, blank=True)  # {question_id:[choice_ids]}
     presented_questions = models.JSONField(default=list, blank=True)  # [question_id,...]
     choice_order = models.JSONField(default=dict, blank=True)  # {question_id:[choice_id,...]}
+    # Seeded attempts store only these and regenerate the order above (see learning.question_bank)
+    seed = models.PositiveBigIntegerField(null=True, blank=True)
+    bank_version = models.PositiveIntegerField(null=True, blank=True)
+    # Set once the completed attempt is folded into QuestionStats (see learning.analytics)
+    analysed_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["completed_at"],
+                condition=models.Q(completed_at__isnull=False, analysed_at__isnull=True),
+                name="attempt_pending_analysis_idx",
+            ),
+            # Keyset pages of a user's attempts (api.pagination)
+            models.Index(fields=["user", "-created_at", "-id"], name="attempt_user_created_idx"),
+            # Passes since the recert scheduler's high-water mark (learning.recerts)
+            models.Index(
+                fields=["completed_at", "id"], condition=models.Q(passed=True), name="attempt_passed_idx"
+            ),
+        ]
 
 class ModuleAttemptQuestion(models.Model):
     
@@ -131,6 +150,33 @@ class ModuleAttemptQuestion(models.Model):
     time_taken = models.FloatField(default=0.0)
     changed_answer = models.BooleanField(default=False)
 
+
+class AttemptAnswer(models.Model):
+    """
+    Append-only answer log: one small row per submit.
+    ``position`` indexes the attempt's presented questions and bit j of
+    ``choices`` is the j-th choice as served. See learning.answers.
+    """
+
+    attempt = models.ForeignKey("ModuleAttempt", on_delete=models.CASCADE, related_name="answer_log")
+    position = models.PositiveSmallIntegerField()
+    choices = models.PositiveBigIntegerField(default=0)
+    time_taken = models.FloatField(default=0.0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set by offline clients; makes replays of the same answer a no-op
+    client_ts = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["attempt", "position", "client_ts"],
+                condition=models.Q(client_ts__isnull=False),
+                name="uniq_attempt_answer_client_ts",
+            ),
+        ]
+
+
 class XPEvent(models.Model):
     SOURCE = [
         ("module_pass", "module_pass"),
@@ -138,6 +184,8 @@ class XPEvent(models.Model):
         ("streak", "streak"),
         ("supervisor_signoff", "supervisor_signoff"),
         ("evidence", "evidence"),
+        # Sum of archived events for one (org, user, skill); see learning.xp_archive
+        ("opening_balance", "opening_balance"),
     ]
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -147,6 +195,116 @@ class XPEvent(models.Model):
     amount = models.PositiveIntegerField()
     meta = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set for one-off awards (e.g. "module_pass:<module id>"); see learning.services.award_xp
+    idempotency_key = models.CharField(max_length=100, null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["created_at"], name="xpevent_created_at_idx")]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "idempotency_key"],
+                condition=models.Q(idempotency_key__isnull=False),
+                name="uniq_xpevent_user_idempotency_key",
+            ),
+        ]
+
+
+class XPEventArchive(models.Model):
+    """
+    XPEvent rows older than the archive horizon, moved out of the hot table
+    as-is. Their amounts live on in opening-balance XPEvents, so nothing
+    that sums XP reads this table.
+    """
+
+    id = models.UUIDField(primary_key=True, editable=False)  # the original XPEvent id
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    org = models.ForeignKey("accounts.Org", on_delete=models.CASCADE, related_name="+")
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    source = models.CharField(max_length=40)
+    amount = models.PositiveIntegerField()
+    meta = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField()
+    idempotency_key = models.CharField(max_length=100, null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "idempotency_key"],
+                condition=models.Q(idempotency_key__isnull=False),
+                name="uniq_xparchive_user_idempotency_key",
+            ),
+        ]
+
+
+class XPRollup(models.Model):
+    """
+    XP earned per day or week, for charts. One row per bucket and scope:
+    a user, a user within a skill, the whole org or the org within a skill
+    (``user`` / ``skill`` left null for the wider scopes).
+    Maintained by learning.xp_history as XPEvents are recorded.
+    """
+
+    PERIODS = [("day", "day"), ("week", "week")]
+
+    period = models.CharField(max_length=4, choices=PERIODS)
+    bucket = models.DateField()  # first day of the day/week (weeks start on Monday)
+    org = models.ForeignKey("accounts.Org", on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE, null=True, blank=True)
+    amount = models.BigIntegerField(default=0)
+    events = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["period", "org", "user", "bucket"],
+                condition=models.Q(user__isnull=False, skill__isnull=True),
+                name="uniq_xp_rollup_user",
+            ),
+            models.UniqueConstraint(
+                fields=["period", "org", "user", "skill", "bucket"],
+                condition=models.Q(user__isnull=False, skill__isnull=False),
+                name="uniq_xp_rollup_user_skill",
+            ),
+            models.UniqueConstraint(
+                fields=["period", "org", "bucket"],
+                condition=models.Q(user__isnull=True, skill__isnull=True),
+                name="uniq_xp_rollup_org",
+            ),
+            models.UniqueConstraint(
+                fields=["period", "org", "skill", "bucket"],
+                condition=models.Q(user__isnull=True, skill__isnull=False),
+                name="uniq_xp_rollup_org_skill",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.bucket}: {self.amount} XP"
+
+
+class UserStreak(models.Model):
+    """
+    A user's run of consecutive active days (a completed module attempt or
+    SOP), kept up to date by learning.streaks as activity is recorded. The
+    daily sweep closes broken streaks and awards "streak" XP at milestones.
+    """
+
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="streak")
+    current = models.PositiveIntegerField(default=0)
+    longest = models.PositiveIntegerField(default=0)
+    last_active = models.DateField(null=True, blank=True)
+    # Highest milestone of the current streak already awarded XP (0 once it breaks)
+    rewarded = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Open streaks, for the daily sweep
+            models.Index(fields=["last_active"], condition=models.Q(current__gt=0), name="streak_open_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user}: {self.current} days (best {self.longest})"
 
 
 class SupervisorSignoff(models.Model):
@@ -157,6 +315,12 @@ class SupervisorSignoff(models.Model):
     note = models.TextField(blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Signoffs since the recert scheduler's high-water mark (learning.recerts)
+            models.Index(fields=["created_at", "id"], name="signoff_created_idx"),
+        ]
+
 class TrainingPathway(models.Model):
     """
     A named training path, usually linked to a job role / department / level.
@@ -276,13 +440,70 @@ class RecertRequirement(models.Model):
     # arbitrary context
     meta = models.JSONField(default=dict, blank=True)
 
+    # when it was raised; only passes after this satisfy it (null for older rows)
+    created_at = models.DateTimeField(auto_now_add=True, null=True)
+
     class Meta:
         ordering = ["due_at", "due_date", "id"]
+        indexes = [
+            # A user's open requirements: overdue lists, resolution on pass (learning.recerts)
+            models.Index(fields=["user"], condition=models.Q(resolved=False), name="recert_open_user_idx"),
+        ]
 
     def __str__(self) -> str:
         base = self.skill.name if self.skill_id else "Recert requirement"
         return f"{base} -> {self.user} ({self.due_date or self.due_at})"
 
+
+class SkillCertification(models.Model):
+    """
+    A user's current certification in a skill: their latest pass (a passed
+    module attempt or a supervisor signoff) and when it runs out,
+    ``Skill.valid_for_days`` after it. Maintained by learning.recerts, which
+    raises an "expiry" RecertRequirement as the expiry approaches and
+    resolves it when a newer pass comes in.
+    """
+
+    SOURCES = [("attempt", "attempt"), ("signoff", "signoff")]
+
+    org = models.ForeignKey("accounts.Org", on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    skill = models.ForeignKey(Skill, on_delete=models.CASCADE)
+    source = models.CharField(max_length=10, choices=SOURCES)
+    certified_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+    # The expiry recert raised for this certification (cleared by a newer pass)
+    requirement = models.OneToOneField(
+        RecertRequirement, null=True, blank=True, on_delete=models.SET_NULL, related_name="certification"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "skill"], name="uniq_skill_certification"),
+        ]
+        indexes = [
+            # Due-date index: certifications still waiting for their expiry recert
+            models.Index(
+                fields=["expires_at"], condition=models.Q(requirement__isnull=True), name="cert_expiry_due_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} / {self.skill} until {self.expires_at:%Y-%m-%d}"
+
+
+class RecertCursor(models.Model):
+    """
+    High-water mark of the passes learning.recerts has read, per source:
+    each run reads only the passes recorded after it.
+    """
+
+    source = models.CharField(max_length=10, unique=True)
+    synced_to = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.source}: {self.synced_to}"
+
 # ---- Levels & Badges --------------------------------------------------------
 
 
@@ -339,6 +560,7 @@ class UserBadge(models.Model):
     class Meta:
         unique_together = ("user", "badge")
         ordering = ["-awarded_at"]
+        indexes = [models.Index(fields=["user", "-awarded_at", "-id"], name="userbadge_user_awarded_idx")]
 
     def __str__(self):
         return f"{self.user} → {self.badge}"
@@ -398,6 +620,51 @@ class TeamMember(models.Model):
         unique_together = ("team", "user", "active")
 
 
+class TeamXPTotal(models.Model):
+    """
+    Running XP total of a team's active members (XP scoped to the team's org).
+    Maintained by delta in learning.aggregates; read by group badge rules.
+    """
+
+    team = models.OneToOneField(Team, on_delete=models.CASCADE, primary_key=True, related_name="xp_total")
+    total_xp = models.BigIntegerField(default=0)
+    member_count = models.PositiveIntegerField(default=0)  # active members
+
+    def __str__(self):
+        return f"{self.team}: {self.total_xp} XP"
+
+
+class TeamXPThresholdCount(models.Model):
+    """
+    How many active members of a team have at least ``threshold`` XP.
+    One row per (team, threshold) used by a team_member_count_with_xp_at_least
+    badge; bumped when a member crosses the threshold or joins/leaves.
+    """
+
+    team = models.ForeignKey(Team, on_delete=models.CASCADE, related_name="xp_threshold_counts")
+    threshold = models.PositiveIntegerField()
+    members_at_or_above = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("team", "threshold")
+
+    def __str__(self):
+        return f"{self.team}: {self.members_at_or_above} members ≥ {self.threshold} XP"
+
+
+class DepartmentXPTotal(models.Model):
+    """
+    Running XP total of the distinct active members of a department's teams.
+    """
+
+    department = models.OneToOneField(
+        Department, on_delete=models.CASCADE, primary_key=True, related_name="xp_total"
+    )
+    total_xp = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.department}: {self.total_xp} XP"
+
 
 
 
@@ -419,3 +686,27 @@ class Choice(models.Model):
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name="choices")
     text = models.CharField(max_length=400)
     is_correct = models.BooleanField(default=False)
+
+
+class QuestionStats(models.Model):
+    """
+    Item analysis for one question, as running sums over completed attempts
+    so new attempts can be added without rescanning old ones. Scores are the
+    attempt's percent score. Maintained by learning.analytics.
+    """
+
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    module = models.ForeignKey(Module, on_delete=models.CASCADE, related_name="question_stats")
+
+    responses = models.PositiveIntegerField(default=0)
+    correct_count = models.PositiveIntegerField(default=0)
+    changed_count = models.PositiveIntegerField(default=0)
+    score_sum = models.BigIntegerField(default=0)
+    score_sq_sum = models.BigIntegerField(default=0)
+    correct_score_sum = models.BigIntegerField(default=0)  # scores of attempts that got it right
+    time_histogram = models.JSONField(default=dict, blank=True)  # {whole seconds: responses}
+    choice_counts = models.JSONField(default=dict, blank=True)  # {choice_id: times in final answer}
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.question_id}: {self.correct_count}/{self.responses} correct"
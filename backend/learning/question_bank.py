@@ -0,0 +1,255 @@
+# learning/question_bank.py
+"""
+Pre-serialised question banks for starting attempts.
+
+Starting an attempt used to load every question and choice, shuffle model
+instances and run the public serializer over all of them. Instead each
+module's bank is built once into plain dicts (already in the
+QuestionPublicSerializer shape) and cached under the module's
+``content_version``:
+
+    {
+        "version": 3,
+        "questions": [{"id", "qtype", "text", "points", "choices": [{"id", "text"}]}],
+        "correct": [[bool per choice], ...],    # aligned with "questions"
+        "explanations": [str, ...],
+        "positions": {question_id: index},
+    }
+
+Question/Choice saves and deletes bump the version (see signals), so a
+stale bank is simply never looked up again. Code that bulk-creates or
+``.update()``s questions or choices must call ``bump_version`` itself.
+
+Seeded attempts (``QUIZ_SEEDED_ATTEMPTS``) store only a PRNG seed and the
+bank version instead of ``presented_questions`` / ``choice_order``; the
+order is regenerated from the bank with ``presented_order``. Before a
+module's content or draw settings change, attempts drawn from the current
+version get their order written out (``materialise_attempts``) since it
+could no longer be regenerated afterwards.
+"""
+import random
+import secrets
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import Choice, Module, ModuleAttempt, Question
+
+BANK_TTL = 60 * 60
+# Module fields that change which questions/choices an attempt is served
+DRAW_FIELDS = ("question_pool_count", "shuffle_questions", "shuffle_choices")
+
+
+def bank_key(module_id, version) -> str:
+    return f"qbank:3:{module_id}:{version}"
+
+
+def bump_version(module_id) -> None:
+    """Invalidate the cached bank for a module after its content changed."""
+    Module.objects.filter(id=module_id).update(content_version=F("content_version") + 1)
+
+
+def build_bank(module: Module) -> Dict:
+    """Serialise a module's questions and choices (two queries)."""
+    questions = []
+    explanations = []
+    positions = {}
+    # A fixed order (ties broken by id): seeded draws, answer positions and choice
+    # bitmasks all index into the bank, and it's rebuilt per process and per eviction
+    rows = (
+        Question.objects.filter(module=module)
+        .order_by("order", "id")
+        .values("id", "qtype", "text", "points", "explanation")
+    )
+    for row in rows:
+        qid = str(row["id"])
+        positions[qid] = len(questions)
+        questions.append({"id": qid, "qtype": row["qtype"], "text": row["text"], "points": row["points"], "choices": []})
+        explanations.append(row["explanation"] or "")
+
+    correct: List[List[bool]] = [[] for _ in questions]
+    choices = (
+        Choice.objects.filter(question__module=module)
+        .order_by("question_id", "id")
+        .values_list("id", "question_id", "text", "is_correct")
+    )
+    for cid, question_id, text, is_correct in choices:
+        i = positions[str(question_id)]
+        questions[i]["choices"].append({"id": str(cid), "text": text})
+        correct[i].append(is_correct)
+
+    return {
+        "version": module.content_version,
+        "questions": questions,
+        "correct": correct,
+        "explanations": explanations,
+        "positions": positions,
+    }
+
+
+def get_bank(module: Module) -> Dict:
+    """The cached bank for ``module``'s current content version, built on a miss."""
+    key = bank_key(module.id, module.content_version)
+    bank = cache.get(key)
+    if bank is None:
+        bank = build_bank(module)
+        cache.set(key, bank, BANK_TTL)
+    return bank
+
+
+def get_bank_for(module_id, version) -> Dict:
+    """The bank an attempt was served from; falls back to the current one once evicted."""
+    bank = cache.get(bank_key(module_id, version))
+    if bank is None:
+        bank = get_bank(Module.objects.get(id=module_id))
+    return bank
+
+
+def draw(bank: Dict, module: Module, rng: Optional[random.Random] = None) -> List[Tuple[int, List[int]]]:
+    """
+    Pick the questions for one attempt: ``[(question index, choice order), ...]``.
+    Follows the module's pool size and shuffle settings.
+    """
+    rng = rng or random
+    indices = list(range(len(bank["questions"])))
+    if module.question_pool_count and module.question_pool_count < len(indices):
+        indices = rng.sample(indices, k=module.question_pool_count)
+    if module.shuffle_questions:
+        rng.shuffle(indices)
+
+    picks = []
+    for i in indices:
+        order = list(range(len(bank["questions"][i]["choices"])))
+        if module.shuffle_choices:
+            rng.shuffle(order)
+        picks.append((i, order))
+    return picks
+
+
+def public_question(bank: Dict, index: int, order: Optional[List[int]] = None) -> Dict:
+    """A question dict with its choices in ``order`` (bank order if omitted)."""
+    q = bank["questions"][index]
+    if order is None:
+        return q
+    choices = q["choices"]
+    return {**q, "choices": [choices[j] for j in order]}
+
+
+def score_answer(bank: Dict, index: int, chosen_ids, negative_marking: bool) -> Tuple[float, bool, str]:
+    """
+    ``(earned, correct, message)`` for one answer, using the same rules as the
+    per-question views: single/truefalse all-or-nothing, multi-select partial
+    credit with optional negative marking.
+    """
+    q = bank["questions"][index]
+    explanation = bank["explanations"][index]
+    max_pts = float(q["points"])
+    correct_ids = {c["id"] for c, ok in zip(q["choices"], bank["correct"][index]) if ok}
+    wrong_ids = {c["id"] for c, ok in zip(q["choices"], bank["correct"][index]) if not ok}
+    chosen = {str(cid) for cid in chosen_ids}
+
+    if q["qtype"] in ("single", "truefalse"):
+        correct = len(chosen) == 1 and next(iter(chosen)) in correct_ids
+        return (max_pts if correct else 0.0), correct, explanation or ("Correct." if correct else "Incorrect.")
+
+    if not correct_ids:
+        return 0.0, False, "No correct choices configured."
+    sel_correct = len(chosen & correct_ids)
+    sel_wrong = len(chosen & wrong_ids)
+    fraction = sel_correct / len(correct_ids)
+    if negative_marking:
+        fraction -= sel_wrong / max(1, len(wrong_ids))
+    fraction = max(0.0, min(1.0, fraction))
+
+    if sel_wrong and negative_marking:
+        msg = "Some incorrect choices selected."
+    elif sel_correct < len(correct_ids):
+        msg = "You missed some correct choices."
+    else:
+        msg = "Correct."
+    if explanation:
+        msg = f"{msg} {explanation}"
+    return round(max_pts * fraction, 2), fraction == 1.0 and sel_wrong == 0, msg
+
+
+def choice_order_from_ids(bank: Dict, index: int, choice_ids: List[str]) -> List[int]:
+    """Map a stored list of choice ids back to bank positions, skipping removed choices."""
+    pos = {c["id"]: j for j, c in enumerate(bank["questions"][index]["choices"])}
+    return [pos[cid] for cid in choice_ids if cid in pos]
+
+
+# ----------------------------------------------------------------------------
+# Seeded attempts
+# ----------------------------------------------------------------------------
+def seeded_attempts_enabled() -> bool:
+    return getattr(settings, "QUIZ_SEEDED_ATTEMPTS", True)
+
+
+def new_seed() -> int:
+    return secrets.randbits(63)
+
+
+def order_for_seed(bank: Dict, module: Module, seed: int) -> Tuple[List[str], Dict[str, List[str]]]:
+    """``(presented question ids, {question id: choice ids})`` for a seed."""
+    # Relies on random.Random(seed) sequences being stable across Python releases
+    presented, choice_order = [], {}
+    for i, order in draw(bank, module, random.Random(seed)):
+        q = bank["questions"][i]
+        presented.append(q["id"])
+        choice_order[q["id"]] = [q["choices"][j]["id"] for j in order]
+    return presented, choice_order
+
+
+def presented_order(attempt: ModuleAttempt) -> Tuple[List[str], Dict[str, List[str]]]:
+    """
+    The attempt's question ids and per-question choice ids, in served order.
+    Stored attempts return their JSON fields; seeded ones are regenerated
+    (cached on the instance and in the shared cache).
+    """
+    if attempt.seed is None:
+        return (
+            [str(x) for x in (attempt.presented_questions or [])],
+            {str(k): [str(c) for c in v] for k, v in (attempt.choice_order or {}).items()},
+        )
+
+    cached = getattr(attempt, "_presented_order", None)
+    if cached is not None:
+        return cached
+    key = f"attempt-order:{attempt.id}:{attempt.bank_version}"
+    cached = cache.get(key)
+    if cached is None:
+        module = attempt.module
+        if module.content_version != attempt.bank_version:
+            # Content changed without materialising this attempt first (e.g. bulk
+            # edits); pin whatever the current bank gives so it stops moving.
+            cached = order_for_seed(get_bank(module), module, attempt.seed)
+            attempt.presented_questions, attempt.choice_order = cached
+            attempt.seed = None
+            attempt.save(update_fields=["presented_questions", "choice_order", "seed"])
+            return cached
+        cached = order_for_seed(get_bank(module), module, attempt.seed)
+        cache.set(key, cached, BANK_TTL)
+    attempt._presented_order = cached
+    return cached
+
+
+def materialise_attempts(module: Module) -> int:
+    """
+    Write out the order of seeded attempts drawn from ``module``'s current
+    bank. ``module`` must hold the content/settings as they are before the
+    change. Returns the number of attempts updated.
+    """
+    attempts = list(
+        ModuleAttempt.objects.filter(module_id=module.id, seed__isnull=False, bank_version=module.content_version)
+        .only("id", "seed", "bank_version")
+    )
+    if not attempts:
+        return 0
+    bank = get_bank(module)
+    for attempt in attempts:
+        attempt.presented_questions, attempt.choice_order = order_for_seed(bank, module, attempt.seed)
+        attempt.seed = None
+    ModuleAttempt.objects.bulk_update(attempts, ["presented_questions", "choice_order", "seed"], batch_size=500)
+    return len(attempts)
@@ -0,0 +1,226 @@
+# learning/recerts.py
+"""
+Expiry-driven recertification.
+
+A pass -- a passed module attempt or a supervisor signoff -- certifies a
+user in a skill for ``Skill.valid_for_days``. ``SkillCertification`` keeps
+one row per user and skill for their latest pass, with its expiry; the
+expiry is fixed when the pass is recorded, like the date printed on a
+certificate.
+
+``sync`` folds the passes recorded since the last run into those rows, a
+batch per transaction. Each source keeps a high-water mark (RecertCursor)
+that moves with the batch, so a run reads only new passes and can be
+interrupted and rerun. Reading starts SYNC_OVERLAP before the mark to pick
+up passes whose transaction committed after a later one; rereading a pass
+changes nothing. A pass newer than the certification renews it and
+resolves the expiry recert raised for the old one.
+
+``schedule`` raises an "expiry" RecertRequirement for every certification
+that will run out within its skill's lead time (``RECERT_LEAD_DAYS`` by
+risk level) and hasn't got one yet. Those are exactly the rows in the
+partial ``expires_at`` index, so a run touches only what is newly due.
+
+``manage.py schedule_recerts`` runs both; run it daily from cron.
+
+Any open requirement -- expiry or SOP update -- is also resolved as soon
+as the learner passes a module for its skill or SOP (``resolve_on_pass``,
+one UPDATE from the ModuleAttempt post_save signal). ``backfill`` does the
+same for requirements that passes recorded before that already satisfy
+(``manage.py resolve_recerts``).
+"""
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import ModuleAttempt, RecertCursor, RecertRequirement, SkillCertification, SupervisorSignoff
+
+BATCH_SIZE = 1000
+SYNC_OVERLAP = timedelta(minutes=10)
+DEFAULT_LEAD_DAYS = {"low": 14, "med": 30, "high": 60}
+REASON = "expiry"
+
+# source: (passes, timestamp field, path to the skill)
+SOURCES = {
+    "attempt": (
+        ModuleAttempt.objects.filter(passed=True, completed_at__isnull=False), "completed_at", "module__skill"
+    ),
+    "signoff": (SupervisorSignoff.objects.all(), "created_at", "skill"),
+}
+
+
+def lead_days() -> Dict[str, int]:
+    """Days before expiry a recert is raised, by skill risk level."""
+    return {**DEFAULT_LEAD_DAYS, **getattr(settings, "RECERT_LEAD_DAYS", {})}
+
+
+# ----------------------------------------------------------------------------
+# Passes -> certifications
+# ----------------------------------------------------------------------------
+def sync(batch_size: int = BATCH_SIZE) -> Dict[str, int]:
+    """Fold passes recorded since the last run into SkillCertification."""
+    totals = {"passes": 0, "certified": 0, "resolved": 0}
+    for source in SOURCES:
+        for key, n in _sync_source(source, batch_size).items():
+            totals[key] += n
+    return totals
+
+
+def _sync_source(source: str, batch_size: int) -> Dict[str, int]:
+    passes, at, skill = SOURCES[source]
+    fields = (at, "id", "user_id", f"{skill}_id", f"{skill}__org_id", f"{skill}__valid_for_days")
+    cursor, _ = RecertCursor.objects.get_or_create(source=source)
+    if cursor.synced_to is not None:
+        passes = passes.filter(**{f"{at}__gte": cursor.synced_to - SYNC_OVERLAP})
+
+    totals = {"passes": 0, "certified": 0, "resolved": 0}
+    last = None
+    while True:
+        page = passes
+        if last is not None:
+            page = page.filter(Q(**{f"{at}__gt": last[0]}) | Q(**{at: last[0], "id__gt": last[1]}))
+        rows = list(page.order_by(at, "id").values_list(*fields)[:batch_size])
+        if not rows:
+            return totals
+        last = rows[-1][:2]
+        with transaction.atomic():
+            certified, resolved = _certify(source, rows)
+            if cursor.synced_to is None or last[0] > cursor.synced_to:
+                cursor.synced_to = last[0]
+                cursor.save(update_fields=["synced_to"])
+        totals["passes"] += len(rows)
+        totals["certified"] += certified
+        totals["resolved"] += resolved
+        if len(rows) < batch_size:
+            return totals
+
+
+def _certify(source: str, rows: List[Tuple]) -> Tuple[int, int]:
+    """Create or renew certifications for a batch of passes; returns (certified, resolved)."""
+    latest = {}
+    for certified_at, _, user_id, skill_id, org_id, valid_for_days in rows:
+        key = (user_id, skill_id)
+        if key not in latest or certified_at > latest[key][0]:
+            latest[key] = (certified_at, org_id, valid_for_days)
+
+    existing = {
+        (c.user_id, c.skill_id): c
+        for c in SkillCertification.objects.filter(
+            user_id__in={u for u, _ in latest}, skill_id__in={s for _, s in latest}
+        )
+    }
+    created, renewed, resolve = [], [], []
+    for (user_id, skill_id), (certified_at, org_id, valid_for_days) in latest.items():
+        expires_at = certified_at + timedelta(days=valid_for_days)
+        cert = existing.get((user_id, skill_id))
+        if cert is None:
+            created.append(
+                SkillCertification(
+                    org_id=org_id, user_id=user_id, skill_id=skill_id, source=source,
+                    certified_at=certified_at, expires_at=expires_at,
+                )
+            )
+        elif certified_at > cert.certified_at:
+            if cert.requirement_id is not None:
+                resolve.append(cert.requirement_id)
+                cert.requirement = None
+            cert.source, cert.certified_at, cert.expires_at = source, certified_at, expires_at
+            renewed.append(cert)
+
+    SkillCertification.objects.bulk_create(created)
+    SkillCertification.objects.bulk_update(renewed, ["source", "certified_at", "expires_at", "requirement"])
+    resolved = RecertRequirement.objects.filter(id__in=resolve, resolved=False).update(resolved=True)
+    return len(created) + len(renewed), resolved
+
+
+# ----------------------------------------------------------------------------
+# Certifications -> recert requirements
+# ----------------------------------------------------------------------------
+def due(now=None):
+    """Certifications running out within their lead time that have no recert yet."""
+    now = now or timezone.now()
+    window = Q()
+    for risk, days in lead_days().items():
+        window |= Q(skill__risk_level=risk, expires_at__lte=now + timedelta(days=days))
+    horizon = now + timedelta(days=max(lead_days().values()))
+    return SkillCertification.objects.filter(window, requirement__isnull=True, expires_at__lte=horizon).filter(
+        user__is_active=True
+    )
+
+
+def schedule(now=None, batch_size: int = BATCH_SIZE) -> int:
+    """Raise an expiry recert for each due certification; returns how many were raised."""
+    raised = 0
+    while True:
+        with transaction.atomic():
+            certs = list(due(now).select_for_update(of=("self",)).order_by("expires_at", "id")[:batch_size])
+            if not certs:
+                return raised
+            requirements = RecertRequirement.objects.bulk_create(
+                [
+                    RecertRequirement(
+                        org_id=c.org_id, user_id=c.user_id, skill_id=c.skill_id, reason=REASON,
+                        due_at=c.expires_at, due_date=timezone.localdate(c.expires_at),
+                        meta={"source": c.source, "certified_at": c.certified_at.isoformat()},
+                    )
+                    for c in certs
+                ]
+            )
+            for cert, requirement in zip(certs, requirements):
+                cert.requirement = requirement
+            SkillCertification.objects.bulk_update(certs, ["requirement"])
+        raised += len(certs)
+
+
+# ----------------------------------------------------------------------------
+# Resolution by passes
+# ----------------------------------------------------------------------------
+def resolve_on_pass(attempt: ModuleAttempt) -> int:
+    """Resolve the user's open requirements for the passed module's skill or SOP (one UPDATE)."""
+    module = attempt.module
+    match = Q(skill_id=module.skill_id)
+    if module.sop_id:
+        match |= Q(sop_id=module.sop_id)
+    return RecertRequirement.objects.filter(match, user_id=attempt.user_id, resolved=False).update(resolved=True)
+
+
+def satisfied():
+    """Open requirements that a recorded pass satisfies (passed after it was raised, if known)."""
+    passes = ModuleAttempt.objects.filter(
+        Q(module__skill_id=OuterRef("skill_id")) | Q(module__sop_id=OuterRef("sop_id")),
+        user_id=OuterRef("user_id"),
+        passed=True,
+        completed_at__isnull=False,
+    )
+    return RecertRequirement.objects.filter(resolved=False).filter(
+        (Q(created_at__isnull=True) & Exists(passes))
+        | Exists(passes.filter(completed_at__gte=OuterRef("created_at")))
+    )
+
+
+def backfill(
+    batch_size: int = BATCH_SIZE, on_batch: Optional[Callable[[int, int], None]] = None
+) -> Tuple[int, int]:
+    """
+    Resolve the open requirements already satisfied by recorded passes, one
+    UPDATE per batch of requirement ids. ``on_batch(scanned, resolved)`` is
+    called with running totals after each batch. Returns (scanned, resolved).
+    """
+    scanned = resolved = 0
+    last = 0
+    while True:
+        ids = list(
+            RecertRequirement.objects.filter(resolved=False, id__gt=last)
+            .order_by("id").values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return scanned, resolved
+        last = ids[-1]
+        resolved += satisfied().filter(id__gte=ids[0], id__lte=last).update(resolved=True)
+        scanned += len(ids)
+        if on_batch is not None:
+            on_batch(scanned, resolved)
@@ -1,17 +1,38 @@
 
 from learning.models import XPEvent, Skill
+from learning import xp_archive
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 
-def award_xp(user, org, skill, amount, source, meta=None):
+def award_xp(user, org, skill, amount, source, meta=None, idempotency_key=None):
+    """
+    Record an XP award. With an ``idempotency_key`` (unique per user, e.g.
+    "module_pass:<module id>") it is recorded at most once: the insert hits
+    the unique index and a replay returns None instead of a second event.
+    """
     meta = meta or {}
-    return XPEvent.objects.create(
+    event = XPEvent(
         user=user,
         org=org,
         skill=skill,
         amount=amount,
         source=source,
         meta=meta,
+        idempotency_key=idempotency_key,
     )
+    if idempotency_key is None:
+        event.save()
+        return event
+    if xp_archive.key_archived(event.user_id, idempotency_key):
+        return None
+    try:
+        # A plain save (not bulk_create) so the XP signals -- team totals,
+        # history buckets, badges -- see the new event
+        with transaction.atomic():
+            event.save(force_insert=True)
+    except IntegrityError:
+        return None
+    return event
 
 
 def score_attempt(attempt):
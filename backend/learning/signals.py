@@ -1,11 +1,13 @@
 # learning/signals.py
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 
-from .models import ModuleAttempt, SupervisorSignoff, XPEvent, ModuleAttemptQuestion
+from .models import Badge, Choice, LevelDef, Module, ModuleAttempt, SupervisorSignoff, XPEvent, ModuleAttemptQuestion, Question, Team, TeamMember, UserBadge
 from .badges import auto_award_badges_for_user
+from . import aggregates, batching, events, levels, question_bank, recerts, streaks, xp_history
+from .services import award_xp
 
 
 # ----------------------------------------------------
@@ -58,34 +60,35 @@ def calculate_score_and_pass(sender, instance: ModuleAttempt, created, **kwargs)
 
 # ----------------------------------------------------
 # EXISTING: XP awarded for module pass
-# (we do not change this)
 # ----------------------------------------------------
 @receiver(post_save, sender=ModuleAttempt)
 def award_xp_on_pass(sender, instance: ModuleAttempt, created, **kwargs):
     if instance.completed_at and instance.passed:
         m = instance.module
         
-        # Core awards: 100 for pass + 10*difficulty bonus
-        XPEvent.objects.get_or_create(
-            user=instance.user,
-            org=m.org,
-            skill=m.skill,
-            source="module_pass",
+        # Core awards: 100 for pass + 10*difficulty bonus (once per module)
+        award_xp(
+            instance.user,
+            m.org,
+            m.skill,
+            100 + 10 * m.difficulty,
+            "module_pass",
             meta={"module": str(m.id)},
-            defaults={"amount": 100 + 10 * m.difficulty},
+            idempotency_key=f"module_pass:{m.id}",
         )
 
-        # Extra XP for exceeding pass mark
+        # Extra XP for exceeding pass mark (once per attempt)
         if instance.score is not None:
             extra = max(0, (instance.score - m.passing_score) // 5) * 5
             if extra:
-                XPEvent.objects.create(
-                    user=instance.user,
-                    org=m.org,
-                    skill=m.skill,
-                    source="quiz",
-                    amount=extra,
+                award_xp(
+                    instance.user,
+                    m.org,
+                    m.skill,
+                    extra,
+                    "quiz",
                     meta={"score": instance.score},
+                    idempotency_key=f"quiz_bonus:{instance.id}",
                 )
 
 
@@ -95,15 +98,157 @@ def award_xp_on_pass(sender, instance: ModuleAttempt, created, **kwargs):
 @receiver(post_save, sender=SupervisorSignoff)
 def award_xp_on_signoff(sender, instance: SupervisorSignoff, created, **kwargs):
     if created:
-        XPEvent.objects.create(
-            user=instance.user,
-            org=instance.user.org,
-            skill=instance.skill,
-            source="supervisor_signoff",
-            amount=150,
+        award_xp(
+            instance.user,
+            instance.user.org,
+            instance.skill,
+            150,
+            "supervisor_signoff",
             meta={"supervisor": str(instance.supervisor_id)},
+            idempotency_key=f"signoff:{instance.id}",
         )
 
+# ----------------------------------------------------
+# Team / department XP counters (learning.aggregates)
+# Registered before evaluate_badges_after_xp so group
+# badge rules read the updated totals.
+# ----------------------------------------------------
+@receiver(post_save, sender=XPEvent)
+def update_group_xp_totals(sender, instance: XPEvent, created, **kwargs):
+    if created:
+        batching.add(aggregates.record_xp, (instance.user_id, instance.org_id), instance.amount)
+
+
+@receiver(post_delete, sender=XPEvent)
+def update_group_xp_totals_on_delete(sender, instance: XPEvent, **kwargs):
+    if not aggregates.xp_moving():
+        batching.add(aggregates.record_xp, (instance.user_id, instance.org_id), -instance.amount)
+
+
+@receiver(post_save, sender=XPEvent)
+def update_xp_history(sender, instance: XPEvent, created, **kwargs):
+    if created:
+        xp_history.record_event(instance)
+
+
+@receiver(post_delete, sender=XPEvent)
+def update_xp_history_on_delete(sender, instance: XPEvent, **kwargs):
+    if not aggregates.xp_moving():
+        xp_history.forget_event(instance)
+
+
+@receiver(pre_save, sender=TeamMember)
+def remember_membership_state(sender, instance: TeamMember, **kwargs):
+    instance._previous_membership = None
+    if not instance._state.adding:
+        instance._previous_membership = (
+            TeamMember.objects.filter(pk=instance.pk).values("team_id", "user_id", "active").first()
+        )
+
+
+@receiver(post_save, sender=TeamMember)
+def update_group_xp_on_membership(sender, instance: TeamMember, created, **kwargs):
+    prev = getattr(instance, "_previous_membership", None)
+    before = (prev["user_id"], prev["team_id"]) if prev and prev["active"] else None
+    after = (instance.user_id, instance.team_id) if instance.active else None
+    if before == after:
+        return
+    if before:
+        aggregates.membership_changed(*before, sign=-1, exclude_pk=instance.pk)
+    if after:
+        aggregates.membership_changed(*after, sign=1, exclude_pk=instance.pk)
+
+
+@receiver(post_delete, sender=TeamMember)
+def update_group_xp_on_membership_delete(sender, instance: TeamMember, **kwargs):
+    if instance.active:
+        aggregates.membership_changed(instance.user_id, instance.team_id, sign=-1, exclude_pk=instance.pk)
+
+
+@receiver(pre_save, sender=Team)
+def remember_team_department(sender, instance: Team, **kwargs):
+    instance._previous_department_id = None
+    if not instance._state.adding:
+        instance._previous_department_id = (
+            Team.objects.filter(pk=instance.pk).values_list("department_id", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Team)
+def update_group_xp_on_team_move(sender, instance: Team, created, **kwargs):
+    old = getattr(instance, "_previous_department_id", None)
+    if created or old == instance.department_id:
+        return
+    aggregates.rebuild_group_xp_totals(team_ids=(), dept_ids={d for d in (old, instance.department_id) if d})
+
+
+@receiver(post_save, sender=Badge)
+def prepare_threshold_counter(sender, instance: Badge, created, **kwargs):
+    """Seed the per-team counter a team_member_count_with_xp_at_least badge reads."""
+    if instance.rule_type == "team_member_count_with_xp_at_least" and instance.team_id:
+        aggregates.ensure_threshold_counter(instance.team_id, instance.value or 0)
+
+
+@receiver(pre_save, sender=Module)
+def keep_content_version(sender, instance: Module, **kwargs):
+    """
+    A stale Module instance must not roll content_version back to an old cached
+    bank. Changing how questions are drawn starts a new version, after pinning
+    seeded attempts drawn under the old settings.
+    """
+    if instance._state.adding:
+        return
+    current = Module.objects.filter(id=instance.id).first()
+    if current is None:
+        return
+    instance.content_version = current.content_version
+    if any(getattr(current, f) != getattr(instance, f) for f in question_bank.DRAW_FIELDS):
+        question_bank.materialise_attempts(current)
+        question_bank.bump_version(instance.id)
+        instance.content_version += 1
+
+
+def _pin_seeded_attempts(module_id):
+    module = Module.objects.filter(id=module_id).first()
+    if module is not None:
+        question_bank.materialise_attempts(module)
+
+
+@receiver(pre_save, sender=Question)
+@receiver(pre_delete, sender=Question)
+def question_bank_changing(sender, instance: Question, **kwargs):
+    _pin_seeded_attempts(instance.module_id)
+
+
+@receiver(pre_save, sender=Choice)
+@receiver(pre_delete, sender=Choice)
+def choice_bank_changing(sender, instance: Choice, **kwargs):
+    module_id = Question.objects.filter(id=instance.question_id).values_list("module_id", flat=True).first()
+    if module_id:
+        _pin_seeded_attempts(module_id)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_bank_changed(sender, instance: Question, **kwargs):
+    question_bank.bump_version(instance.module_id)
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def choice_bank_changed(sender, instance: Choice, **kwargs):
+    module_id = Question.objects.filter(id=instance.question_id).values_list("module_id", flat=True).first()
+    if module_id:
+        question_bank.bump_version(module_id)
+
+
+@receiver(post_save, sender=LevelDef)
+@receiver(post_delete, sender=LevelDef)
+def reset_level_table(sender, **kwargs):
+    """The level ladder is cached per process; rebuild it after an edit."""
+    levels.invalidate()
+
+
 @receiver(post_save, sender=XPEvent)
 def evaluate_badges_after_xp(sender, instance: XPEvent, created, **kwargs):
     """
@@ -113,8 +258,43 @@ def evaluate_badges_after_xp(sender, instance: XPEvent, created, **kwargs):
     if not created:
         return
 
-    user = instance.user
-    org = instance.org
+    # Once per user/org per request, however many events it recorded
+    batching.run_once(auto_award_badges_for_user, instance.user, instance.org)
 
-    auto_award_badges_for_user(user=user, org=org)
 
+# ----------------------------------------------------
+# Live updates for the event stream (learning.events)
+# ----------------------------------------------------
+@receiver(post_save, sender=XPEvent)
+def announce_xp(sender, instance: XPEvent, created, **kwargs):
+    if created:
+        events.record_xp(instance)
+
+
+@receiver(post_save, sender=UserBadge)
+def announce_badge(sender, instance: UserBadge, created, raw=False, **kwargs):
+    if created and not raw:
+        events.record_badges([instance])
+
+
+# ----------------------------------------------------
+# Recert requirements satisfied by the pass (learning.recerts)
+# ----------------------------------------------------
+@receiver(post_save, sender=ModuleAttempt)
+def resolve_recerts_on_pass(sender, instance: ModuleAttempt, created, update_fields=None, **kwargs):
+    # Partial saves that don't complete the attempt (e.g. analysed_at) change nothing here
+    if update_fields is not None and "completed_at" not in update_fields:
+        return
+    if instance.completed_at and instance.passed:
+        recerts.resolve_on_pass(instance)
+
+
+# ----------------------------------------------------
+# Activity streaks (learning.streaks)
+# ----------------------------------------------------
+@receiver(post_save, sender=ModuleAttempt)
+def record_streak_on_completion(sender, instance: ModuleAttempt, created, update_fields=None, **kwargs):
+    if update_fields is not None and "completed_at" not in update_fields:
+        return
+    if instance.completed_at:
+        batching.run_once(streaks.record_activity, instance.user_id, timezone.localdate(instance.completed_at))
@@ -0,0 +1,98 @@
+# learning/streaks.py
+"""
+Daily activity streaks.
+
+A day counts when the user completes a module attempt (passed or not) or a
+SOP. ``record_activity`` keeps one UserStreak row per user current as that
+happens, with a single conditional UPDATE -- yesterday active: +1, a gap:
+back to 1, already counted today: nothing -- so no history is rescanned.
+
+``sweep`` runs once a day (``manage.py sweep_streaks``):
+
+  - streaks that reached a milestone (``STREAK_XP``: days -> XP) get
+    "streak" XP, keyed on the streak's first day and the milestone, so
+    rerunning the sweep never awards twice
+  - streaks with no activity yesterday or today are closed in one UPDATE
+
+Milestones are awarded before streaks are closed, so one that was reached
+on a streak's last day still counts after a missed sweep.
+"""
+from datetime import date, timedelta
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import UserStreak
+from .services import award_xp
+
+BATCH_SIZE = 500
+DEFAULT_STREAK_XP = {3: 10, 7: 25, 14: 50, 30: 100, 60: 200, 100: 400}
+
+
+def milestones() -> Dict[int, int]:
+    """Streak length in days -> XP awarded on reaching it."""
+    return dict(sorted(getattr(settings, "STREAK_XP", DEFAULT_STREAK_XP).items()))
+
+
+def record_activity(user_id, day: Optional[date] = None) -> None:
+    """Count ``day`` (default today) as active for the user."""
+    day = day or timezone.localdate()
+    continued = Q(last_active=day - timedelta(days=1))
+    current = Case(When(continued, then=F("current") + 1), default=Value(1))
+    updated = UserStreak.objects.filter(
+        Q(last_active__lt=day) | Q(last_active__isnull=True), user_id=user_id
+    ).update(
+        current=current,
+        longest=Greatest("longest", current),
+        rewarded=Case(When(continued, then=F("rewarded")), default=Value(0)),
+        last_active=day,
+    )
+    if not updated:
+        UserStreak.objects.get_or_create(user_id=user_id, defaults={"current": 1, "longest": 1, "last_active": day})
+
+
+def sweep(today: Optional[date] = None, batch_size: int = BATCH_SIZE) -> Tuple[int, int]:
+    """Award milestone XP, then close broken streaks; returns (awards, closed)."""
+    today = today or timezone.localdate()
+    awards = _award_milestones(batch_size)
+    closed = UserStreak.objects.filter(current__gt=0, last_active__lt=today - timedelta(days=1)).update(
+        current=0, rewarded=0
+    )
+    return awards, closed
+
+
+def _award_milestones(batch_size: int) -> int:
+    xp = milestones()
+    if not xp:
+        return 0
+    due = Q()
+    for days in xp:
+        due |= Q(current__gte=days, rewarded__lt=days)
+
+    pending = UserStreak.objects.filter(due, user__org__isnull=False).select_related("user__org")
+    awards = 0
+    while True:
+        with transaction.atomic():
+            streaks = list(pending.select_for_update(of=("self",)).order_by("user_id")[:batch_size])
+            if not streaks:
+                return awards
+            for streak in streaks:
+                started_on = streak.last_active - timedelta(days=streak.current - 1)
+                for days, amount in xp.items():
+                    if streak.rewarded < days <= streak.current:
+                        event = award_xp(
+                            streak.user,
+                            streak.user.org,
+                            None,
+                            amount,
+                            "streak",
+                            meta={"days": days, "started_on": started_on.isoformat()},
+                            idempotency_key=f"streak:{started_on.isoformat()}:{days}",
+                        )
+                        awards += event is not None
+                        streak.rewarded = days
+            UserStreak.objects.bulk_update(streaks, ["rewarded"])
@@ -1 +1,586 @@
-# Create your tests here.
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import Org, User
+from learning import batching, levels, recerts, streaks, xp_history
+from learning.aggregates import rebuild_group_xp_totals
+from learning.services import award_xp
+from learning.models import (
+    Badge,
+    Department,
+    DepartmentXPTotal,
+    LevelDef,
+    Module,
+    ModuleAttempt,
+    RecertCursor,
+    RecertRequirement,
+    Skill,
+    SkillCertification,
+    SupervisorSignoff,
+    Team,
+    TeamMember,
+    TeamXPThresholdCount,
+    TeamXPTotal,
+    UserBadge,
+    UserStreak,
+    XPEvent,
+    XPEventArchive,
+    XPRollup,
+)
+from sops.models import SOP
+
+
+class SmokeTests(TestCase):
+    def test_smoke(self):
+        self.assertTrue(True)
+
+
+class AwardGroupBadgesCommandTests(TestCase):
+    """
+    Tests for the set-based `award_group_badges` management command.
+    """
+
+    def setUp(self):
+        self.org = Org.objects.create(name="Group Org")
+        self.other_org = Org.objects.create(name="Other Org")
+
+        self.dept = Department.objects.create(org=self.org, name="Warehouse")
+        self.team_a = Team.objects.create(org=self.org, department=self.dept, name="Team A")
+        self.team_b = Team.objects.create(org=self.org, department=self.dept, name="Team B")
+
+        self.alice = User.objects.create_user(username="alice", password="x", org=self.org)
+        self.bob = User.objects.create_user(username="bob", password="x", org=self.org)
+        self.carol = User.objects.create_user(username="carol", password="x", org=self.org)
+
+        TeamMember.objects.create(team=self.team_a, user=self.alice)
+        TeamMember.objects.create(team=self.team_a, user=self.bob)
+        TeamMember.objects.create(team=self.team_b, user=self.carol)
+
+        for user, amount in ((self.alice, 300), (self.bob, 50), (self.carol, 200)):
+            XPEvent.objects.create(user=user, org=self.org, source="quiz", amount=amount)
+
+        self.team_badge = Badge.objects.create(
+            org=self.org, code="TEAM350", name="Team 350", rule_type="team_total_xp_at_least",
+            value=350, team=self.team_a,
+        )
+        self.dept_badge = Badge.objects.create(
+            org=self.org, code="DEPT500", name="Dept 500", rule_type="department_total_xp_at_least",
+            value=500, department=self.dept,
+        )
+        self.count_badge = Badge.objects.create(
+            org=self.org, code="ALL100", name="Everyone 100", rule_type="team_member_count_with_xp_at_least",
+            value=100, team=self.team_a,
+        )
+        # Auto-awarding on XP may already have granted some of these; start clean
+        UserBadge.objects.all().delete()
+
+    def _run(self, *args):
+        out = StringIO()
+        call_command("award_group_badges", *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_reports_without_writing(self):
+        out = self._run("--dry-run")
+
+        self.assertIn("+ TEAM350 (Team 350): 2 new holders", out)
+        self.assertIn("+ DEPT500 (Dept 500): 3 new holders", out)
+        self.assertNotIn("ALL100", out)  # bob is below 100 XP
+        self.assertFalse(UserBadge.objects.exists())
+
+    def test_awards_missing_badges_and_is_idempotent(self):
+        out = self._run()
+        self.assertIn("Awarded 5 new", out)
+        self.assertEqual(
+            set(UserBadge.objects.filter(badge=self.team_badge).values_list("user_id", flat=True)),
+            {self.alice.id, self.bob.id},
+        )
+        self.assertEqual(UserBadge.objects.filter(badge=self.dept_badge).count(), 3)
+
+        out = self._run()
+        self.assertIn("Awarded 0 new", out)
+        self.assertEqual(UserBadge.objects.count(), 5)
+
+    def test_org_filter_limits_evaluation(self):
+        out = self._run("--dry-run", "--org", self.other_org.name)
+        self.assertIn("0 new awards", out)
+
+
+class GroupXPTotalsTests(TestCase):
+    """
+    Team/department XP counters are maintained by delta and match a full rebuild.
+    """
+
+    def setUp(self):
+        self.org = Org.objects.create(name="Counter Org")
+        self.dept = Department.objects.create(org=self.org, name="Dock")
+        self.team_a = Team.objects.create(org=self.org, department=self.dept, name="Dock A")
+        self.team_b = Team.objects.create(org=self.org, department=self.dept, name="Dock B")
+        self.alice = User.objects.create_user(username="alice", password="x", org=self.org)
+        self.bob = User.objects.create_user(username="bob", password="x", org=self.org)
+
+    def _team(self, team):
+        return TeamXPTotal.objects.get(team=team).total_xp
+
+    def _dept(self):
+        return DepartmentXPTotal.objects.get(department=self.dept).total_xp
+
+    def _xp(self, user, amount):
+        XPEvent.objects.create(user=user, org=self.org, source="quiz", amount=amount)
+
+    def _assert_matches_rebuild(self):
+        live_teams = dict(TeamXPTotal.objects.values_list("team_id", "total_xp"))
+        live_depts = dict(DepartmentXPTotal.objects.values_list("department_id", "total_xp"))
+        rebuild_group_xp_totals()
+        self.assertEqual(live_teams, dict(TeamXPTotal.objects.values_list("team_id", "total_xp")))
+        self.assertEqual(live_depts, dict(DepartmentXPTotal.objects.values_list("department_id", "total_xp")))
+
+    def test_xp_and_membership_changes_move_counters(self):
+        self._xp(self.alice, 100)  # before joining any team
+        membership = TeamMember.objects.create(team=self.team_a, user=self.alice)
+        self.assertEqual(self._team(self.team_a), 100)
+        self.assertEqual(self._dept(), 100)
+
+        # Second team in the same department doesn't double count the department
+        TeamMember.objects.create(team=self.team_b, user=self.alice)
+        self._xp(self.alice, 50)
+        self.assertEqual(self._team(self.team_a), 150)
+        self.assertEqual(self._team(self.team_b), 150)
+        self.assertEqual(self._dept(), 150)
+
+        TeamMember.objects.create(team=self.team_b, user=self.bob)
+        self._xp(self.bob, 20)
+        self.assertEqual(self._team(self.team_b), 170)
+        self.assertEqual(self._dept(), 170)
+
+        membership.active = False
+        membership.save()
+        self.assertEqual(self._team(self.team_a), 0)
+        self.assertEqual(self._dept(), 170)  # alice still in Dock B
+        self._assert_matches_rebuild()
+
+        TeamMember.objects.filter(team=self.team_b, user=self.alice).delete()
+        self.assertEqual(self._dept(), 20)
+        self._assert_matches_rebuild()
+
+    def test_membership_changes_in_a_batch_with_queued_xp(self):
+        bob_in_b = TeamMember.objects.create(team=self.team_b, user=self.bob)
+        Badge.objects.create(
+            org=self.org, code="B50", name="All 50", rule_type="team_member_count_with_xp_at_least",
+            value=50, team=self.team_a,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            with batching.batch():
+                self._xp(self.alice, 60)
+                TeamMember.objects.create(team=self.team_a, user=self.alice)
+                self._xp(self.bob, 30)
+                bob_in_b.active = False
+                bob_in_b.save()
+
+        self.assertEqual(self._team(self.team_a), 60)
+        self.assertEqual(self._team(self.team_b), 0)
+        self.assertEqual(self._dept(), 60)
+        counter = TeamXPThresholdCount.objects.get(team=self.team_a, threshold=50)
+        self.assertEqual(counter.members_at_or_above, 1)
+        self._assert_matches_rebuild()
+        counter.refresh_from_db()
+        self.assertEqual(counter.members_at_or_above, 1)
+
+    def test_deleted_xp_comes_off_counters_and_thresholds(self):
+        TeamMember.objects.create(team=self.team_a, user=self.alice)
+        TeamMember.objects.create(team=self.team_b, user=self.bob)
+        Badge.objects.create(
+            org=self.org, code="A100", name="All 100", rule_type="team_member_count_with_xp_at_least",
+            value=100, team=self.team_a,
+        )
+        self._xp(self.alice, 80)
+        self._xp(self.alice, 40)
+        self._xp(self.bob, 30)
+        counter = TeamXPThresholdCount.objects.get(team=self.team_a, threshold=100)
+        counter.refresh_from_db()
+        self.assertEqual(counter.members_at_or_above, 1)
+
+        XPEvent.objects.filter(user=self.alice, amount=40).delete()  # alice back under 100
+        self.assertEqual(self._team(self.team_a), 80)
+        self.assertEqual(self._dept(), 110)
+        counter.refresh_from_db()
+        self.assertEqual(counter.members_at_or_above, 0)
+        self._assert_matches_rebuild()
+
+    def test_team_badge_reads_counter(self):
+        TeamMember.objects.create(team=self.team_a, user=self.alice)
+        TeamMember.objects.create(team=self.team_a, user=self.bob)
+        badge = Badge.objects.create(
+            org=self.org, code="T200", name="Team 200", rule_type="team_total_xp_at_least",
+            value=200, team=self.team_a,
+        )
+        self._xp(self.alice, 150)
+        self.assertFalse(UserBadge.objects.filter(badge=badge).exists())
+
+        self._xp(self.bob, 60)
+        self.assertTrue(UserBadge.objects.filter(badge=badge, user=self.bob).exists())
+
+    def test_member_count_badge_awarded_when_last_member_crosses(self):
+        TeamMember.objects.create(team=self.team_a, user=self.alice)
+        TeamMember.objects.create(team=self.team_a, user=self.bob)
+        badge = Badge.objects.create(
+            org=self.org, code="ALL100", name="Everyone 100", rule_type="team_member_count_with_xp_at_least",
+            value=100, team=self.team_a,
+        )
+        counter = TeamXPThresholdCount.objects.get(team=self.team_a, threshold=100)
+        self.assertEqual(counter.members_at_or_above, 0)
+
+        self._xp(self.alice, 120)
+        self._xp(self.bob, 60)
+        counter.refresh_from_db()
+        self.assertEqual(counter.members_at_or_above, 1)
+        self.assertFalse(UserBadge.objects.filter(badge=badge).exists())
+
+        self._xp(self.bob, 40)  # bob crosses 100
+        counter.refresh_from_db()
+        self.assertEqual(counter.members_at_or_above, 2)
+        self.assertEqual(
+            set(UserBadge.objects.filter(badge=badge).values_list("user_id", flat=True)),
+            {self.alice.id, self.bob.id},
+        )
+
+        # Leaving the team takes the member out of the counter too
+        TeamMember.objects.filter(team=self.team_a, user=self.bob).update(active=False)
+        TeamMember.objects.get(team=self.team_a, user=self.alice).delete()
+        rebuild_group_xp_totals()
+        counter.refresh_from_db()
+        self.assertEqual(counter.members_at_or_above, 0)
+        self.assertEqual(TeamXPTotal.objects.get(team=self.team_a).member_count, 0)
+
+
+class LevelServiceTests(TestCase):
+    """
+    Level lookups use one cached threshold table, seeded from LevelDef when present.
+    """
+
+    def setUp(self):
+        levels.invalidate()
+
+    def test_curve_ladder(self):
+        # Level 1 needs 200 XP to finish, level 2 another 270
+        self.assertEqual(levels.levels_for([0, 199, 200, 469, 470, None]), [1, 1, 2, 2, 3, 1])
+        self.assertEqual(
+            levels.progress_for(250),
+            {"level": 2, "level_xp": 200, "next_level": 3, "next_level_xp": 470, "xp_to_next": 220},
+        )
+        self.assertGreater(levels.level_for(10**12), 30)
+
+    def test_level_defs_replace_curve_and_invalidate_cache(self):
+        self.assertEqual(levels.level_for(150), 1)
+
+        for lvl in range(1, 4):
+            LevelDef.objects.create(level=lvl, total_xp=lvl * 100)
+        # Below the first row is the level before it; past the last row the curve continues
+        self.assertEqual(levels.levels_for([50, 100, 299, 300]), [0, 1, 2, 3])
+        self.assertEqual(levels.progress_for(300)["next_level_xp"], 660)
+
+        LevelDef.objects.get(level=3).delete()
+        self.assertEqual(levels.level_for(300), 2)
+
+
+class XPArchiveTests(TestCase):
+    """
+    `archive_xp_events` moves old events to the archive without changing any XP total.
+    """
+
+    def setUp(self):
+        self.org = Org.objects.create(name="Archive Org")
+        self.user = User.objects.create_user(username="veteran", password="pw", org=self.org)
+        self.skill = Skill.objects.create(org=self.org, name="Picking")
+        team = Team.objects.create(org=self.org, name="Night shift")
+        TeamMember.objects.create(team=team, user=self.user)
+        self.team = team
+
+        self.module = Module.objects.create(org=self.org, skill=self.skill, title="Picking 101", require_viewed=False)
+        ModuleAttempt.objects.create(user=self.user, module=self.module, score=80, passed=True, completed_at=timezone.now())
+        for amount in (10, 20):
+            XPEvent.objects.create(user=self.user, org=self.org, skill=self.skill, source="quiz", amount=amount)
+        XPEvent.objects.create(user=self.user, org=self.org, source="streak", amount=7)
+        XPEvent.objects.update(created_at=timezone.now() - timedelta(days=400))
+        self.recent = XPEvent.objects.create(user=self.user, org=self.org, skill=self.skill, source="quiz", amount=5)
+
+    def _totals(self):
+        return dict(XPEvent.objects.values("skill_id").annotate(xp=Sum("amount")).values_list("skill_id", "xp"))
+
+    def test_archive_keeps_totals_and_folds_into_opening_balances(self):
+        before = self._totals()
+        old_ids = set(XPEvent.objects.exclude(id=self.recent.id).values_list("id", flat=True))
+        team_xp = TeamXPTotal.objects.get(team=self.team).total_xp
+        history_xp = XPRollup.objects.filter(period="day", user=self.user, skill=None).aggregate(xp=Sum("amount"))
+
+        call_command("archive_xp_events", stdout=StringIO())
+
+        self.assertEqual(self._totals(), before)
+        self.assertEqual(TeamXPTotal.objects.get(team=self.team).total_xp, team_xp)
+        self.assertEqual(
+            XPRollup.objects.filter(period="day", user=self.user, skill=None).aggregate(xp=Sum("amount")), history_xp
+        )
+        self.assertEqual(set(XPEventArchive.objects.values_list("id", flat=True)), old_ids)
+        self.assertEqual(
+            set(XPEvent.objects.exclude(id=self.recent.id).values_list("source", "skill_id")),
+            {("opening_balance", self.skill.id), ("opening_balance", None)},
+        )
+
+        # History rebuilds read the archived events, not the balances
+        xp_history.rebuild()
+        history = XPRollup.objects.filter(period="day", user=self.user, skill=None).aggregate(xp=Sum("amount"))
+        self.assertEqual(history["xp"], sum(before.values()))
+
+        # A later run folds into the same balances
+        XPEvent.objects.filter(id=self.recent.id).update(created_at=timezone.now() - timedelta(days=400))
+        call_command("archive_xp_events", stdout=StringIO())
+        self.assertEqual(self._totals(), before)
+        balance = XPEvent.objects.get(source="opening_balance", skill=self.skill)
+        self.assertEqual(balance.meta["archived_events"], 4)  # module pass + 3 quiz events
+
+    def test_export_writes_archived_events(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "xp.jsonl.gz")
+            call_command("archive_xp_events", export=path, stdout=StringIO())
+            with gzip.open(path, "rt", encoding="utf-8") as fh:
+                exported = [json.loads(line) for line in fh]
+        archived = {str(i) for i in XPEventArchive.objects.values_list("id", flat=True)}
+        self.assertEqual({row["id"] for row in exported}, archived)
+
+    def test_archived_pass_xp_is_not_awarded_again(self):
+        call_command("archive_xp_events", stdout=StringIO())
+        ModuleAttempt.objects.get(user=self.user).save()
+        self.assertFalse(XPEvent.objects.filter(source="module_pass").exists())
+
+
+class XPAwardIdempotencyTests(TestCase):
+    """
+    One-off awards carry an idempotency key, so replays don't award XP twice.
+    """
+
+    def setUp(self):
+        self.org = Org.objects.create(name="Award Org")
+        self.user = User.objects.create_user(username="passer", password="pw", org=self.org)
+        skill = Skill.objects.create(org=self.org, name="Loading")
+        self.module = Module.objects.create(org=self.org, skill=skill, title="Loading 101", require_viewed=False)
+
+    def test_resaving_a_passed_attempt_awards_once(self):
+        attempt = ModuleAttempt.objects.create(
+            user=self.user, module=self.module, score=100, passed=True, completed_at=timezone.now()
+        )
+        attempt.save()
+        ModuleAttempt.objects.create(user=self.user, module=self.module, score=100, passed=True, completed_at=timezone.now())
+
+        sources = sorted(XPEvent.objects.filter(user=self.user).values_list("source", flat=True))
+        self.assertEqual(sources, ["module_pass", "quiz", "quiz"])  # pass once, bonus per attempt
+
+    def test_replayed_key_returns_none(self):
+        first = award_xp(self.user, self.org, None, 50, "evidence", idempotency_key="evidence:1")
+        self.assertIsNotNone(first)
+        self.assertIsNone(award_xp(self.user, self.org, None, 50, "evidence", idempotency_key="evidence:1"))
+        self.assertEqual(XPEvent.objects.filter(user=self.user).aggregate(s=Sum("amount"))["s"], 50)
+
+
+class ScheduleRecertsTests(TestCase):
+    """
+    `schedule_recerts` raises expiry recerts from the latest pass per skill and
+    resolves them when a newer pass comes in, reading only new passes each run.
+    """
+
+    def setUp(self):
+        self.org = Org.objects.create(name="Recert Org")
+        self.user = User.objects.create_user(username="certified", password="pw", org=self.org)
+        self.boss = User.objects.create_user(username="boss", password="pw", org=self.org)
+        self.skill = Skill.objects.create(org=self.org, name="Forklift", valid_for_days=365, risk_level="high")
+        self.module = Module.objects.create(org=self.org, skill=self.skill, title="Forklift 101", require_viewed=False)
+
+    def _pass(self, days_ago, passed=True):
+        attempt = ModuleAttempt.objects.create(user=self.user, module=self.module, score=90, passed=passed)
+        ModuleAttempt.objects.filter(id=attempt.id).update(completed_at=timezone.now() - timedelta(days=days_ago))
+
+    def _run(self):
+        out = StringIO()
+        call_command("schedule_recerts", stdout=out)
+        return out.getvalue()
+
+    def test_raises_recert_within_lead_time(self):
+        self._pass(days_ago=400)
+        self._pass(days_ago=320)  # latest pass: expires in 45 days, inside the 60-day high-risk lead
+        self._pass(days_ago=10, passed=False)
+        self._run()
+
+        cert = SkillCertification.objects.get(user=self.user, skill=self.skill)
+        self.assertEqual((timezone.now() - cert.certified_at).days, 320)
+        req = RecertRequirement.objects.get(user=self.user, skill=self.skill)
+        self.assertEqual((req.reason, req.resolved, req.due_at), ("expiry", False, cert.expires_at))
+        self.assertEqual(cert.requirement, req)
+
+        # Nothing is raised twice
+        self.assertIn("raised 0 recerts", self._run())
+        self.assertEqual(RecertRequirement.objects.count(), 1)
+
+    def test_lead_time_follows_risk_level(self):
+        self._pass(days_ago=320)
+        Skill.objects.filter(id=self.skill.id).update(risk_level="low")
+        self._run()
+        self.assertFalse(RecertRequirement.objects.exists())
+
+    def test_newer_pass_renews_and_resolves(self):
+        self._pass(days_ago=320)
+        self._run()
+        req = RecertRequirement.objects.get()
+
+        SupervisorSignoff.objects.create(user=self.user, skill=self.skill, supervisor=self.boss)
+        self._run()
+        req.refresh_from_db()
+        self.assertTrue(req.resolved)
+        cert = SkillCertification.objects.get()
+        self.assertEqual((cert.source, cert.requirement), ("signoff", None))
+        self.assertEqual(RecertRequirement.objects.count(), 1)
+
+    def test_reads_only_passes_after_high_water_mark(self):
+        self._pass(days_ago=30)
+        self._run()
+        # A rerun rereads only the overlap window, and changes nothing
+        self.assertEqual(recerts.sync(), {"passes": 1, "certified": 0, "resolved": 0})
+        self.assertEqual(RecertCursor.objects.get(source="attempt").synced_to, ModuleAttempt.objects.get().completed_at)
+
+        # Passes older than the mark (less the overlap) aren't read again
+        ModuleAttempt.objects.update(completed_at=timezone.now() - timedelta(days=400))
+        self.assertEqual(recerts.sync()["passes"], 0)
+
+    def test_inactive_users_are_skipped(self):
+        self._pass(days_ago=320)
+        User.objects.filter(id=self.user.id).update(is_active=False)
+        self._run()
+        self.assertFalse(RecertRequirement.objects.exists())
+
+
+class RecertResolutionTests(TestCase):
+    """
+    Passing a module resolves the learner's open requirements for its skill or
+    SOP; `resolve_recerts` back-fills the ones earlier passes satisfy.
+    """
+
+    def setUp(self):
+        self.org = Org.objects.create(name="Resolve Org")
+        self.user = User.objects.create_user(username="learner", password="pw", org=self.org)
+        self.other = User.objects.create_user(username="other", password="pw", org=self.org)
+        self.skill = Skill.objects.create(org=self.org, name="Welding")
+        self.sop = SOP.objects.create(org=self.org, code="WLD-1", title="Welding SOP", status="draft")
+        self.module = Module.objects.create(org=self.org, skill=self.skill, title="Welding 101", require_viewed=False)
+        other_skill = Skill.objects.create(org=self.org, name="Other")
+        self.sop_module = Module.objects.create(
+            org=self.org, skill=other_skill, sop=self.sop, title="SOP module", require_viewed=False
+        )
+
+    def _require(self, user=None, **kwargs):
+        return RecertRequirement.objects.create(org=self.org, user=user or self.user, reason="test", **kwargs)
+
+    def _complete(self, module, passed=True):
+        attempt = ModuleAttempt.objects.create(user=self.user, module=module)
+        attempt.score, attempt.passed, attempt.completed_at = (90 if passed else 10), passed, timezone.now()
+        attempt.save(update_fields=["score", "passed", "completed_at"])
+        return attempt
+
+    def test_pass_resolves_matching_requirements(self):
+        by_skill = self._require(skill=self.skill)
+        by_sop = self._require(sop=self.sop)
+        other_skill = self._require(skill=self.sop_module.skill)
+        other_user = self._require(user=self.other, skill=self.skill)
+
+        self._complete(self.module, passed=False)
+        self.assertFalse(RecertRequirement.objects.filter(resolved=True).exists())
+
+        self._complete(self.sop_module)
+        resolved = set(RecertRequirement.objects.filter(resolved=True).values_list("id", flat=True))
+        self.assertEqual(resolved, {by_sop.id, other_skill.id})
+
+        with self.assertNumQueries(1):
+            recerts.resolve_on_pass(ModuleAttempt(user=self.user, module=self.module))
+        self.assertTrue(RecertRequirement.objects.get(id=by_skill.id).resolved)
+        self.assertFalse(RecertRequirement.objects.get(id=other_user.id).resolved)
+
+    def test_backfill_resolves_from_recorded_passes(self):
+        attempt = self._complete(self.module)
+        ModuleAttempt.objects.filter(id=attempt.id).update(completed_at=timezone.now() - timedelta(days=10))
+        legacy = self._require(skill=self.skill)
+        RecertRequirement.objects.filter(id=legacy.id).update(created_at=None)
+        raised_before = self._require(skill=self.skill)
+        RecertRequirement.objects.filter(id=raised_before.id).update(created_at=timezone.now() - timedelta(days=20))
+        raised_after = self._require(skill=self.skill)
+        unmatched = self._require(sop=self.sop)
+
+        out = StringIO()
+        call_command("resolve_recerts", "--batch-size", "2", stdout=out)
+        self.assertIn("Resolved 2 of 4", out.getvalue())
+        self.assertIn("4/4 scanned, 2 resolved", out.getvalue())
+        resolved = set(RecertRequirement.objects.filter(resolved=True).values_list("id", flat=True))
+        self.assertEqual(resolved, {legacy.id, raised_before.id})
+        self.assertFalse(RecertRequirement.objects.get(id=raised_after.id).resolved)
+        self.assertFalse(RecertRequirement.objects.get(id=unmatched.id).resolved)
+
+
+class StreakTests(TestCase):
+    """
+    Completed attempts and SOPs keep a per-user streak; `sweep_streaks` awards
+    milestone XP once and closes broken streaks.
+    """
+
+    def setUp(self):
+        self.org = Org.objects.create(name="Streak Org")
+        self.user = User.objects.create_user(username="daily", password="pw", org=self.org)
+        skill = Skill.objects.create(org=self.org, name="Daily skill")
+        self.module = Module.objects.create(org=self.org, skill=skill, title="Daily module", require_viewed=False)
+        self.today = timezone.localdate()
+
+    def _active(self, *days_ago):
+        for n in days_ago:
+            streaks.record_activity(self.user.id, self.today - timedelta(days=n))
+        return UserStreak.objects.get(user=self.user)
+
+    def test_consecutive_days_extend_and_gaps_restart(self):
+        streak = self._active(5, 4, 3, 3)
+        self.assertEqual((streak.current, streak.longest), (3, 3))
+        streak = self._active(1, 0)
+        self.assertEqual((streak.current, streak.longest, streak.last_active), (2, 3, self.today))
+
+    def test_completed_attempt_counts(self):
+        attempt = ModuleAttempt.objects.create(user=self.user, module=self.module)
+        self.assertFalse(UserStreak.objects.exists())
+        attempt.score, attempt.completed_at = 10, timezone.now()
+        attempt.save(update_fields=["score", "completed_at"])
+        streak = UserStreak.objects.get(user=self.user)
+        self.assertEqual((streak.current, streak.last_active), (1, self.today))
+
+    def test_sweep_awards_milestones_once_and_closes_broken(self):
+        self._active(*range(7, -1, -1))  # 8 days, through today
+        broken = User.objects.create_user(username="lapsed", password="pw", org=self.org)
+        streaks.record_activity(broken.id, self.today - timedelta(days=3))
+
+        out = StringIO()
+        call_command("sweep_streaks", stdout=out)
+        self.assertIn("Awarded 2 streak milestones, closed 1 streaks", out.getvalue())
+        self.assertEqual(
+            sorted(XPEvent.objects.filter(user=self.user, source="streak").values_list("meta__days", "amount")),
+            [(3, 10), (7, 25)],
+        )
+        self.assertEqual(UserStreak.objects.get(user=broken).current, 0)
+
+        # Rerunning, even with the progress marker lost, awards nothing new
+        UserStreak.objects.filter(user=self.user).update(rewarded=0)
+        self.assertEqual(streaks.sweep(), (0, 0))
+        self.assertEqual(XPEvent.objects.filter(source="streak").count(), 2)
+
+        # A new streak earns its milestones again
+        UserStreak.objects.filter(user=self.user).update(current=0, last_active=self.today - timedelta(days=5))
+        self._active(2, 1, 0)
+        self.assertEqual(streaks.sweep(), (1, 0))
@@ -0,0 +1,109 @@
+# learning/xp_archive.py
+"""
+Archival of old XP events.
+
+XPEvent is an append-only ledger and everything that reports XP sums it.
+``archive_before`` keeps it small: events older than a cutoff are moved, a
+batch per transaction, to ``XPEventArchive`` and their amounts are folded
+into one ``opening_balance`` XPEvent per (org, user, skill). Every sum over
+XPEvent -- totals, levels, leaderboards, badges, team counters -- therefore
+comes out the same before and after archiving.
+
+Opening balances are written with bulk operations so the XPEvent signals
+don't fire: they carry no new XP. Their ``created_at`` is the cutoff of the
+last run that touched them.
+
+Readers that need the individual old events go to the archive:
+
+  - one-off awards (``idempotency_key``) are checked against both tables
+  - ``xp_history.rebuild`` recomputes buckets from both tables
+"""
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import aggregates
+from .models import XPEvent, XPEventArchive
+
+OPENING_BALANCE = "opening_balance"
+BATCH_SIZE = 5000
+FIELDS = ("id", "user_id", "org_id", "skill_id", "source", "amount", "meta", "created_at", "idempotency_key")
+
+
+def default_cutoff():
+    """Now minus ``XP_ARCHIVE_AFTER_DAYS`` (default 365)."""
+    return timezone.now() - timedelta(days=getattr(settings, "XP_ARCHIVE_AFTER_DAYS", 365))
+
+
+def archivable(cutoff):
+    return XPEvent.objects.filter(created_at__lt=cutoff).exclude(source=OPENING_BALANCE)
+
+
+def archive_before(
+    cutoff, batch_size: int = BATCH_SIZE, on_batch: Optional[Callable[[List[Dict]], None]] = None
+) -> int:
+    """
+    Move events older than ``cutoff`` to the archive, updating opening
+    balances. ``on_batch`` is called with each batch's rows (dicts of FIELDS)
+    inside its transaction, e.g. to also write them to a file. Returns the
+    number of events archived.
+    """
+    total = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                archivable(cutoff).select_for_update().order_by("created_at").values(*FIELDS)[:batch_size]
+            )
+            if not rows:
+                return total
+            XPEventArchive.objects.bulk_create([XPEventArchive(**row) for row in rows], ignore_conflicts=True)
+            with aggregates.xp_moved():  # the amounts move to the opening balances
+                XPEvent.objects.filter(id__in=[row["id"] for row in rows]).delete()
+            _fold(rows, cutoff)
+            if on_batch:
+                on_batch(rows)
+        total += len(rows)
+
+
+def _fold(rows: List[Dict], cutoff) -> None:
+    """Add archived amounts to the (org, user, skill) opening balances."""
+    deltas: Dict = {}
+    for row in rows:
+        key = (row["org_id"], row["user_id"], row["skill_id"])
+        amount, count = deltas.get(key, (0, 0))
+        deltas[key] = (amount + row["amount"], count + 1)
+
+    balances = {
+        (b.org_id, b.user_id, b.skill_id): b
+        for b in XPEvent.objects.select_for_update().filter(
+            source=OPENING_BALANCE,
+            org_id__in={k[0] for k in deltas},
+            user_id__in={k[1] for k in deltas},
+        )
+    }
+    new, touched = [], []
+    for key, (amount, count) in deltas.items():
+        balance = balances.get(key)
+        if balance is None:
+            org_id, user_id, skill_id = key
+            balance = XPEvent(org_id=org_id, user_id=user_id, skill_id=skill_id, source=OPENING_BALANCE, amount=0)
+            new.append(balance)
+        balance.amount += amount
+        balance.meta = {
+            "archived_events": (balance.meta or {}).get("archived_events", 0) + count,
+            "through": cutoff.isoformat(),
+        }
+        touched.append(balance)
+
+    XPEvent.objects.bulk_create(new, batch_size=1000)
+    for balance in touched:
+        balance.created_at = cutoff  # after bulk_create, which applies auto_now_add
+    XPEvent.objects.bulk_update(touched, ["amount", "meta", "created_at"], batch_size=1000)
+
+
+def key_archived(user_id, idempotency_key) -> bool:
+    """Whether a one-off award with this key was already made and archived."""
+    return XPEventArchive.objects.filter(user_id=user_id, idempotency_key=idempotency_key).exists()
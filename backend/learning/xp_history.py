@@ -0,0 +1,171 @@
+# learning/xp_history.py
+"""
+Daily and weekly XP totals for progress charts.
+
+Each recorded XPEvent adds its amount to ``XPRollup`` rows for both
+periods and for every scope it belongs to:
+
+  - the user                     (user set, skill null)
+  - the user within the skill    (user and skill set)
+  - the org                      (both null)
+  - the org within the skill     (skill set)
+
+so a chart reads at most a few hundred rows instead of the whole ledger.
+Buckets are the local date (``TIME_ZONE``) the event happened on, or the
+Monday of that week.
+
+New events are added and deleted ones taken off again (except inside
+``aggregates.xp_moved``: archived events stay in the history). After editing
+XPEvent rows in place run ``manage.py rebuild_xp_history``, which also reads
+archived events (opening balances are never bucketed).
+"""
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from . import batching
+from .models import XPEvent, XPEventArchive, XPRollup
+
+PERIODS = ("day", "week")
+MAX_BUCKETS = 400
+
+
+def bucket_start(period: str, day: date) -> date:
+    return day - timedelta(days=day.weekday()) if period == "week" else day
+
+
+def step(period: str) -> timedelta:
+    return timedelta(days=7 if period == "week" else 1)
+
+
+def _scopes(user_id, skill_id) -> List:
+    scopes = [(user_id, None), (None, None)]
+    if skill_id:
+        scopes += [(user_id, skill_id), (None, skill_id)]
+    return scopes
+
+
+# ----------------------------------------------------------------------------
+# Incremental updates
+# ----------------------------------------------------------------------------
+def record_event(event: XPEvent) -> None:
+    """Add a newly recorded XPEvent to its day and week buckets (batched per request)."""
+    if not event.amount or event.source == "opening_balance":
+        return
+    day = timezone.localdate(event.created_at)
+    batching.add(record, (event.org_id, event.user_id, event.skill_id, day), event.amount, 1)
+
+
+def forget_event(event: XPEvent) -> None:
+    """Take a deleted XPEvent off its day and week buckets (batched per request)."""
+    if not event.amount or event.source == "opening_balance":
+        return
+    day = timezone.localdate(event.created_at)
+    batching.add(record, (event.org_id, event.user_id, event.skill_id, day), -event.amount, -1)
+
+
+def record(org_id, user_id, skill_id, day: date, amount: int, events: int = 1) -> None:
+    """Add ``amount`` XP over ``events`` events on ``day`` to every bucket and scope it belongs to."""
+    for period in PERIODS:
+        bucket = bucket_start(period, day)
+        for scope_user, scope_skill in _scopes(user_id, skill_id):
+            _add(
+                {"period": period, "bucket": bucket, "org_id": org_id, "user_id": scope_user, "skill_id": scope_skill},
+                amount,
+                events,
+            )
+
+
+def _add(key: Dict, amount: int, events: int) -> None:
+    bump = {"amount": F("amount") + amount, "events": F("events") + events}
+    if XPRollup.objects.filter(**key).update(**bump):
+        return
+    try:
+        with transaction.atomic():
+            XPRollup.objects.create(**key, amount=amount, events=events)
+    except IntegrityError:
+        # Created concurrently by another event in the same bucket
+        XPRollup.objects.filter(**key).update(**bump)
+
+
+# ----------------------------------------------------------------------------
+# Full recompute
+# ----------------------------------------------------------------------------
+def rebuild(org_id=None) -> int:
+    """
+    Recompute every rollup (or one org's) from XPEvent and the XP archive;
+    returns the number of rows written.
+    """
+    sources = [XPEvent.objects.exclude(source="opening_balance"), XPEventArchive.objects.all()]
+    rollups = XPRollup.objects.all()
+    if org_id:
+        sources = [qs.filter(org_id=org_id) for qs in sources]
+        rollups = rollups.filter(org_id=org_id)
+
+    rows = []
+    tz = timezone.get_current_timezone()
+    for period in PERIODS:
+        totals: Dict = {}
+        for qs in sources:
+            grouped = (
+                qs.annotate(b=Trunc("created_at", period, output_field=DateField(), tzinfo=tz))
+                .values("b", "org_id", "user_id", "skill_id")
+                .annotate(amount=Sum("amount"), events=Count("id"))
+                .order_by()
+            )
+            for row in grouped:
+                for user_id, skill_id in _scopes(row["user_id"], row["skill_id"]):
+                    key = (row["b"], row["org_id"], user_id, skill_id)
+                    amount, count = totals.get(key, (0, 0))
+                    totals[key] = (amount + (row["amount"] or 0), count + row["events"])
+        rows += [
+            XPRollup(period=period, bucket=b, org_id=org, user_id=user, skill_id=skill, amount=amount, events=count)
+            for (b, org, user, skill), (amount, count) in totals.items()
+            if amount
+        ]
+
+    with transaction.atomic():
+        rollups.delete()
+        XPRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+# ----------------------------------------------------------------------------
+# Reading
+# ----------------------------------------------------------------------------
+def history(
+    period: str, start: date, end: date, org_id, user_id=None, skill_id=None
+) -> List[Dict]:
+    """
+    Dense series of ``{"start", "xp", "events"}`` buckets covering
+    ``start``..``end`` for one scope (``user_id`` None = whole org).
+    """
+    first, last = bucket_start(period, start), bucket_start(period, end)
+    found = dict(
+        (b, (amount, events))
+        for b, amount, events in XPRollup.objects.filter(
+            period=period,
+            org_id=org_id,
+            user_id=user_id,
+            skill_id=skill_id,
+            bucket__gte=first,
+            bucket__lte=last,
+        ).values_list("bucket", "amount", "events")
+    )
+    series = []
+    bucket = first
+    while bucket <= last:
+        amount, events = found.get(bucket, (0, 0))
+        series.append({"start": bucket, "xp": amount, "events": events})
+        bucket += step(period)
+    return series
+
+
+def default_range(period: str, today: Optional[date] = None):
+    """Last 30 days, or the last 12 weeks."""
+    today = today or timezone.localdate()
+    return today - (timedelta(weeks=11) if period == "week" else timedelta(days=29)), today
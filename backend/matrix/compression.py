@@ -0,0 +1,175 @@
+# matrix/compression.py
+"""
+Negotiated response compression.
+
+Like Django's ``GZipMiddleware`` (whose gzip helpers it uses), but:
+
+  - brotli is preferred when the client accepts it and the ``brotli``
+    package is installed; otherwise gzip
+  - responses smaller than ``COMPRESS_MIN_SIZE`` bytes (default 1024),
+    already-compressed media types and event streams are sent as they are
+  - compressed bodies of at least ``COMPRESS_CACHE_MIN_SIZE`` bytes
+    (default 16 KB) are cached under a hash of the uncompressed body, so a
+    module list or leaderboard that many kiosks fetch is compressed once
+    and then served from the cache (``COMPRESS_CACHE``, default "default",
+    for ``COMPRESS_CACHE_TIMEOUT`` seconds)
+  - streaming responses are compressed chunk by chunk and never cached
+
+Hashing a body is far cheaper than compressing it, and identical bodies
+compress to the same bytes, so nothing user-specific can leak between
+requests through the cache.
+"""
+import hashlib
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+
+BROTLI_QUALITY = 5  # fast enough for dynamic responses, still well ahead of gzip -6
+MAX_RANDOM_BYTES = 100  # gzip length randomisation, as GZipMiddleware (BREACH)
+COMPRESSIBLE = re.compile(r"^(text/(?!event-stream)|application/(json|javascript|xml|[\w.+-]+\+(json|xml))|image/svg\+xml)")
+
+
+def accepted_encodings(header: str) -> dict:
+    """``{coding: q}`` from an Accept-Encoding header (codings with q=0 left out)."""
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        match = re.search(r"q\s*=\s*([0-9.]+)", params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                continue
+        if q > 0:
+            accepted[coding] = q
+    return accepted
+
+
+def choose_encoding(header: str):
+    accepted = accepted_encodings(header)
+    wildcard = accepted.get("*", 0)
+    options = [("br", accepted.get("br", wildcard))] if brotli is not None else []
+    options.append(("gzip", accepted.get("gzip", wildcard)))
+    coding, q = max(options, key=lambda option: option[1])  # br first on a tie
+    return coding if q > 0 else None
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return compress_string(body, max_random_bytes=MAX_RANDOM_BYTES)
+
+
+def cached_compress(body: bytes, coding: str) -> bytes:
+    """``compress``, reusing the result for identical bodies."""
+    if len(body) < getattr(settings, "COMPRESS_CACHE_MIN_SIZE", 16 * 1024):
+        return compress(body, coding)
+    cache = caches[getattr(settings, "COMPRESS_CACHE", "default")]
+    key = f"compressed:{coding}:{hashlib.blake2b(body, digest_size=20).hexdigest()}"
+    compressed = cache.get(key)
+    if compressed is None:
+        compressed = compress(body, coding)
+        cache.set(key, compressed, getattr(settings, "COMPRESS_CACHE_TIMEOUT", 600))
+    return compressed
+
+
+def _brotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    for chunk in sequence:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def _brotli_async_sequence(sequence):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+    async for chunk in sequence:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def _gzip_async_sequence(sequence):
+    async for chunk in sequence:
+        yield compress_string(chunk, max_random_bytes=MAX_RANDOM_BYTES)
+
+
+class CompressionMiddleware:
+    """Compresses responses the client accepts compressed (see module docstring)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if not response.streaming and len(response.content) >= getattr(settings, "COMPRESS_CACHE_MIN_SIZE", 16 * 1024):
+            # Keep hashing/compressing big bodies and the cache round trip off the event loop
+            return await sync_to_async(self.process_response, thread_sensitive=False)(request, response)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        if response.has_header("Content-Encoding"):
+            return response
+        if not COMPRESSIBLE.match(response.get("Content-Type", "")):
+            return response
+        if not response.streaming and len(response.content) < getattr(settings, "COMPRESS_MIN_SIZE", 1024):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        coding = choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if coding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                stream = response.streaming_content
+                response.streaming_content = (
+                    _brotli_async_sequence(stream) if coding == "br" else _gzip_async_sequence(stream)
+                )
+            elif coding == "br":
+                response.streaming_content = _brotli_sequence(response.streaming_content)
+            else:
+                response.streaming_content = compress_sequence(
+                    response.streaming_content, max_random_bytes=MAX_RANDOM_BYTES
+                )
+            # The compressed length isn't known until it's streamed
+            del response.headers["Content-Length"]
+        else:
+            compressed = cached_compress(response.content, coding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        # A strong ETag no longer matches the bytes sent (RFC 9110 8.8.1)
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = coding
+        return response
@@ -20,12 +20,22 @@ ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "127.0.0.1,localhost").split(",")
 
 
 REST_FRAMEWORK = {
-    "DEFAULT_AUTHENTICATION_CLASSES": ["rest_framework_simplejwt.authentication.JWTAuthentication",
+    "DEFAULT_AUTHENTICATION_CLASSES": ["accounts.authentication.ClaimsJWTAuthentication",
     "rest_framework.authentication.SessionAuthentication",
     "rest_framework.authentication.BasicAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    # orjson-backed JSON; falls back to DRF's encoder when orjson isn't installed (see api.renderers)
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "api.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 25,
     "DEFAULT_FILTER_BACKENDS": [
@@ -60,12 +70,16 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    # gzip/brotli; before anything else that reads or changes the response body
+    "matrix.compression.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # Run XP/badge signal side effects once per request, after commit
+    "learning.batching.SignalBatchMiddleware",
 ]
 
 ROOT_URLCONF = "matrix.urls"
@@ -86,6 +100,9 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "matrix.wsgi.application"
+# Serve with e.g. `uvicorn matrix.asgi:application`; heartbeat, whoami, dashboard,
+# leaderboard and next-question are async views (api.async_views)
+ASGI_APPLICATION = "matrix.asgi.application"
 
 
 # Database
@@ -162,3 +179,51 @@ CORS_ALLOWED_ORIGINS = [
 CORS_ALLOW_CREDENTIALS = True
 
 
+
+# Store a PRNG seed + question bank version on new attempts instead of the full
+# presented question / choice order (regenerated on demand, see learning.question_bank)
+QUIZ_SEEDED_ATTEMPTS = True
+
+# Cache alias for in-progress quiz attempt state (learning.attempt_session).
+# Must be shared between worker processes in production (Redis/Memcached).
+QUIZ_SESSION_CACHE = "default"
+
+# XP events older than this are moved to the XP archive and folded into
+# per-user/skill opening balances by `manage.py archive_xp_events` (learning.xp_archive)
+XP_ARCHIVE_AFTER_DAYS = 365
+
+# Response compression (matrix.compression): bodies under COMPRESS_MIN_SIZE bytes are
+# sent as they are; compressed bodies of at least COMPRESS_CACHE_MIN_SIZE bytes are
+# cached by content hash in COMPRESS_CACHE and reused for identical responses.
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_CACHE_MIN_SIZE = 16 * 1024
+COMPRESS_CACHE = "default"
+COMPRESS_CACHE_TIMEOUT = 600
+
+# Access tokens carry the user's org, role and flags (accounts.authentication), so
+# authenticating a request doesn't load the user row. Token versions are cached in
+# AUTH_CLAIMS_CACHE for AUTH_CLAIMS_CACHE_TTL seconds.
+SIMPLE_JWT = {
+    "TOKEN_OBTAIN_SERIALIZER": "accounts.authentication.ClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "accounts.authentication.ClaimsTokenRefreshSerializer",
+}
+AUTH_CLAIMS_CACHE = "default"
+AUTH_CLAIMS_CACHE_TTL = 60
+
+# Live event stream (learning.events, /api/events/stream/). The in-process broker only
+# reaches clients of the same process: run one ASGI worker or plug in a shared broker.
+# Streams close after LIVE_EVENTS_MAX_AGE seconds and clients resume with Last-Event-ID
+# from the last LIVE_EVENTS_BUFFER events per channel.
+LIVE_EVENTS_BROKER = "learning.events.InProcessBroker"
+LIVE_EVENTS_BUFFER = 200
+LIVE_EVENTS_KEEPALIVE = 15
+LIVE_EVENTS_MAX_AGE = 300
+LIVE_EVENTS_RETRY = 5
+
+# Expiry recerts (`manage.py schedule_recerts`, learning.recerts): a pass certifies a user
+# in a skill for Skill.valid_for_days; the recert is raised this many days before expiry.
+RECERT_LEAD_DAYS = {"low": 14, "med": 30, "high": 60}
+
+# Streak XP (`manage.py sweep_streaks`, learning.streaks): XP awarded once per streak
+# on reaching each length in days.
+STREAK_XP = {3: 10, 7: 25, 14: 50, 30: 100, 60: 200, 100: 400}
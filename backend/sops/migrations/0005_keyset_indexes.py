@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sops', '0004_sop_active'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sopview',
+            index=models.Index(fields=['user', '-last_heartbeat', '-id'], name='sopview_user_heartbeat_idx'),
+        ),
+    ]
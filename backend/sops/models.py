@@ -60,3 +60,4 @@ class SOPView(models.Model):
 
     class Meta:
         unique_together = ("sop", "user")
+        indexes = [models.Index(fields=["user", "-last_heartbeat", "-id"], name="sopview_user_heartbeat_idx")]
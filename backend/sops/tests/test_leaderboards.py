@@ -18,8 +18,8 @@ def test_org_leaderboard_json(db):
     XPEvent.objects.create(org=org, user=u, skill=skill, amount=50, source="test")
     resp = c.get("/api/leaderboard/")
     assert resp.status_code == 200
-    assert isinstance(resp.data, list)
-    assert any(r["username"] == u.username for r in resp.data)
+    assert resp.data["next"] is None
+    assert any(r["username"] == u.username for r in resp.data["results"])
 
 def test_leaderboard_csv(db):
     c, org, u = _auth_client()
@@ -31,10 +31,34 @@ export function useApi() {
     })
   }
 
+  // One page of a list endpoint: its rows and the `next` link of a paginated
+  // response ({ next, results }); a plain array is a single page.
+  async function getPage<T = any>(url: string, opts?: any): Promise<{ rows: T[], next: string | null }> {
+    const data: any = await request('GET', url, undefined, opts)
+    if (Array.isArray(data)) return { rows: data, next: null }
+    return { rows: data?.results || [], next: data?.next || null }
+  }
+
+  // Every row of a list endpoint, following `next` until the last page. Only
+  // for lists that are needed whole; long ones (leaderboards) page with getPage.
+  async function getAll<T = any>(url: string, opts: any = {}): Promise<T[]> {
+    const rows: T[] = []
+    let next: string | null = url
+    while (next) {
+      const page: { rows: T[], next: string | null } = await getPage<T>(next, opts)
+      rows.push(...page.rows)
+      next = page.next
+      opts = { ...opts, query: undefined } // the next link carries the query
+    }
+    return rows
+  }
+
   return {
     get<T = any>(url: string, opts?: any) {
       return request<T>('GET', url, undefined, opts)
     },
+    getPage,
+    getAll,
     post<T = any>(url: string, body?: any, opts?: any) {
       return request<T>('POST', url, body, opts)
     },
@@ -0,0 +1,98 @@
+// composables/useLiveEvents.ts
+//
+// Live XP / rank / badge updates from /api/events/stream/ (Server-Sent Events).
+// EventSource can't send the Authorization header, so the stream is read with
+// fetch. The server ends each connection after a few minutes (immediately
+// under WSGI); we reconnect with Last-Event-ID and get whatever was missed.
+// A `resync` event means the missed events are gone: re-fetch the page data.
+
+type LiveEvent = { id: number, type: string, data: any }
+type Handler = (data: any, event: LiveEvent) => void
+
+export function useLiveEvents () {
+  const config = useRuntimeConfig()
+  const auth = useAuth()
+
+  const handlers: Record<string, Handler[]> = {}
+  const connected = ref(false)
+  let lastEventId: number | null = null
+  let retryMs = 5000
+  let controller: AbortController | null = null
+  let stopped = false
+
+  function on (type: string, handler: Handler) {
+    (handlers[type] ||= []).push(handler)
+  }
+
+  function dispatch (block: string) {
+    let type = 'message'
+    let id: number | null = null
+    const data: string[] = []
+    for (const line of block.split('\n')) {
+      if (!line || line.startsWith(':')) continue
+      const i = line.indexOf(':')
+      const field = i < 0 ? line : line.slice(0, i)
+      const value = i < 0 ? '' : line.slice(i + 1).replace(/^ /, '')
+      if (field === 'event') type = value
+      else if (field === 'data') data.push(value)
+      else if (field === 'id') id = Number(value)
+      else if (field === 'retry') retryMs = Number(value) || retryMs
+    }
+    if (id !== null) lastEventId = id
+    if (!data.length) return
+    const event = { id: id ?? 0, type, data: JSON.parse(data.join('\n')) }
+    for (const handler of handlers[type] || []) handler(event.data, event)
+  }
+
+  async function read () {
+    const headers: Record<string, string> = { Accept: 'text/event-stream' }
+    const token = auth.token?.value
+    if (token) headers['Authorization'] = `Bearer ${token}`
+    if (lastEventId !== null) headers['Last-Event-ID'] = String(lastEventId)
+
+    controller = new AbortController()
+    const resp = await fetch(`${config.public.apiBase}/events/stream/`, {
+      headers,
+      signal: controller.signal,
+    })
+    if (!resp.ok || !resp.body) throw new Error(`event stream: HTTP ${resp.status}`)
+
+    connected.value = true
+    const reader = resp.body.pipeThrough(new TextDecoderStream()).getReader()
+    let buffer = ''
+    while (true) {
+      const { value, done } = await reader.read()
+      if (done) break
+      buffer += value.replace(/\r\n?/g, '\n')
+      let end
+      while ((end = buffer.indexOf('\n\n')) >= 0) {
+        dispatch(buffer.slice(0, end))
+        buffer = buffer.slice(end + 2)
+      }
+    }
+  }
+
+  async function start () {
+    if (!process.client) return
+    stopped = false
+    while (!stopped) {
+      try {
+        await read()
+      } catch (e: any) {
+        if (e?.name !== 'AbortError') console.warn('Live events', e)
+      }
+      connected.value = false
+      if (!stopped) await new Promise(resolve => setTimeout(resolve, retryMs))
+    }
+  }
+
+  function stop () {
+    stopped = true
+    controller?.abort()
+  }
+
+  onMounted(start)
+  onBeforeUnmount(stop)
+
+  return { on, connected, stop }
+}